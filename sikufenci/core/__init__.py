@@ -2,7 +2,7 @@ from .wordsegall_txt import TCfenci_all
 
 class wordsegall_txt:
     @staticmethod
-    def TCfenci_all(raw_path, resultpath, max_seq_length=128, eval_batch_size=3):
-        return TCfenci_all(raw_path, resultpath, max_seq_length, eval_batch_size)
+    def TCfenci_all(raw_path, resultpath, max_seq_length=128, eval_batch_size=3, **kwargs):
+        return TCfenci_all(raw_path, resultpath, max_seq_length, eval_batch_size, **kwargs)
 
 __all__ = ['wordsegall_txt']
\ No newline at end of file
@@ -0,0 +1,622 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from typing import List, Dict, Tuple
+import numpy as np
+import torch
+from pytorch_pretrained_bert import BertConfig, BertForTokenClassification
+from pytorch_pretrained_bert.modeling import CONFIG_NAME, WEIGHTS_NAME
+
+try:
+    import resource
+except ImportError:
+    # Windows没有resource模块
+    resource = None
+
+# Linux 4.0及以上可以通过clear_refs重置峰值常驻内存（VmHWM），按测量项分别报告峰值
+_PEAK_RESETTABLE = os.access('/proc/self/clear_refs', os.W_OK) and os.path.exists('/proc/self/status')
+
+# 添加项目根目录到path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_utils import list_txt_files, iter_file_lines, write_lines
+from utils.text_utils import preprocess_text
+from utils.device_utils import get_available_cores, configure_threads
+from models.tokenizer import SikuTokenizer
+from models.model_loader import ModelLoader
+from models.predictor import Predictor
+from version import __version__
+
+
+# 没有模型配置文件时使用的SikuRoBERTa结构
+DEFAULT_CONFIG = {
+    'vocab_size': 29791,
+    'hidden_size': 768,
+    'num_hidden_layers': 12,
+    'num_attention_heads': 12,
+    'intermediate_size': 3072,
+    'hidden_act': 'gelu',
+    'hidden_dropout_prob': 0.1,
+    'attention_probs_dropout_prob': 0.1,
+    'max_position_embeddings': 512,
+    'type_vocab_size': 2,
+    'initializer_range': 0.02
+}
+
+# 样例古籍语料
+SAMPLE_LINES = [
+    '魏帝召而謂之曰："卿風度峻整，姿貌秀異，後當升進，何以處官？"琡曰："宗廟之禮，不敢不敬，朝廷之事，不敢不忠，自此以外，非庸臣所及。',
+    '正光中，行洛陽令，部內肅然。',
+    '有犯法者，未加拷掠，直以辭理窮核，多得其情。',
+    '天地玄黃，宇宙洪荒。日月盈昃，辰宿列張。寒來暑往，秋收冬藏。閏餘成歲，律呂調陽。',
+    '子曰：學而時習之，不亦說乎？有朋自遠方來，不亦樂乎？人不知而不慍，不亦君子乎？',
+    '道可道，非常道；名可名，非常名。無名天地之始，有名萬物之母。',
+    '大學之道，在明明德，在親民，在止於至善。知止而後有定，定而後能靜，靜而後能安，安而後能慮，慮而後能得。',
+    '元年春，王正月。三月，公及邾儀父盟于蔑。夏五月，鄭伯克段于鄢。',
+]
+
+PUNCTUATION = '，。、；：！？'
+
+# 没有词汇表时生成的特殊token
+SPECIAL_TOKENS = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+
+
+def build_sample_corpus(num_lines: int, seed: int = 0) -> List[str]:
+    """
+    由样例古籍语料生成指定行数的语料，每行循环移位以避免重复行被去重
+    
+    Args:
+        num_lines: 行数
+        seed: 随机种子
+        
+    Returns:
+        List[str]: 文本行
+    """
+    rng = random.Random(seed)
+    lines = []
+    
+    while len(lines) < num_lines:
+        line = rng.choice(SAMPLE_LINES)
+        shift = rng.randrange(len(line))
+        lines.append(line[shift:] + line[:shift])
+    
+    return lines
+
+
+def build_synthetic_corpus(chars: List[str], num_lines: int, seed: int = 0, 
+                           mean_length: int = 48) -> List[str]:
+    """
+    生成合成语料：字频服从Zipf分布，每隔几个字插入标点，行长服从对数正态分布
+    
+    Args:
+        chars: 可用的汉字
+        num_lines: 行数
+        seed: 随机种子
+        mean_length: 平均行长
+        
+    Returns:
+        List[str]: 文本行
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(chars) + 1)
+    weights /= weights.sum()
+    
+    lengths = np.clip(rng.lognormal(np.log(mean_length), 0.6, num_lines), 4, 400).astype(int)
+    lines = []
+    
+    for length in lengths:
+        picked = rng.choice(len(chars), size=length, p=weights)
+        line = []
+        next_punct = rng.integers(3, 9)
+        for i, idx in enumerate(picked):
+            line.append(chars[idx])
+            if i + 1 == next_punct and i + 1 < length:
+                line.append(PUNCTUATION[rng.integers(len(PUNCTUATION))])
+                next_punct += rng.integers(3, 9)
+        line.append('。')
+        lines.append(''.join(line))
+    
+    return lines
+
+
+def load_corpus(corpus_path: str) -> List[str]:
+    """
+    读取真实语料，可以是txt文件或包含txt文件的文件夹
+    
+    Args:
+        corpus_path: 语料路径
+        
+    Returns:
+        List[str]: 非空文本行
+    """
+    paths = list_txt_files(corpus_path) if os.path.isdir(corpus_path) else [corpus_path]
+    return [line.strip() for path in paths for line in iter_file_lines(path) if line.strip()]
+
+
+def _write_random_vocab(vocab_dir: str, vocab_size: int) -> None:
+    """
+    为随机初始化的模型生成词汇表：特殊token、标点和从U+4E00开始的汉字
+    
+    Args:
+        vocab_dir: 输出目录
+        vocab_size: 词汇表大小
+    """
+    tokens = SPECIAL_TOKENS + list(PUNCTUATION) + ['"']
+    code = 0x4E00
+    while len(tokens) < vocab_size:
+        tokens.append(chr(code))
+        code += 1
+    
+    with open(os.path.join(vocab_dir, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(tokens[:vocab_size]) + '\n')
+
+
+def prepare_model(model_path: str = None, random_model: bool = False, 
+                  work_dir: str = None) -> Tuple[SikuTokenizer, ModelLoader, Dict]:
+    """
+    准备分词器和模型；没有模型权重或指定random_model时使用同结构的随机初始化模型
+    
+    Args:
+        model_path: 模型目录，None表示使用默认目录
+        random_model: 是否强制使用随机初始化模型
+        work_dir: 存放生成的词汇表的临时目录
+        
+    Returns:
+        Tuple[SikuTokenizer, ModelLoader, Dict]: 分词器、已加载模型的模型加载器和模型信息
+    """
+    model_loader = ModelLoader(model_path)
+    model_path = model_loader.model_path
+    
+    if not random_model and os.path.exists(os.path.join(model_path, WEIGHTS_NAME)):
+        tokenizer = SikuTokenizer(model_path)
+        model = model_loader.load_model()
+        return tokenizer, model_loader, {'model': 'checkpoint', 'model_path': os.path.abspath(model_path)}
+    
+    config_file = os.path.join(model_path, CONFIG_NAME)
+    if os.path.exists(config_file):
+        config = BertConfig.from_json_file(config_file)
+    else:
+        config = BertConfig.from_dict(DEFAULT_CONFIG)
+    
+    # 默认目录中的词汇表不完整时生成一个与模型大小一致的词汇表
+    vocab_file = os.path.join(model_path, 'vocab.txt')
+    with open(vocab_file, encoding='utf-8') as f:
+        vocab_size = sum(1 for _ in f)
+    if vocab_size < 1000:
+        _write_random_vocab(work_dir, config.vocab_size)
+        vocab_file = work_dir
+    
+    tokenizer = SikuTokenizer(vocab_file)
+    config.vocab_size = max(config.vocab_size, tokenizer.vocab_size)
+    
+    torch.manual_seed(0)
+    model = BertForTokenClassification(config, num_labels=9)
+    model.to(model_loader.device)
+    model.eval()
+    
+    # 直接交给模型加载器，Predictor不会再从磁盘加载
+    model_loader.model = model
+    
+    info = {
+        'model': 'random',
+        'hidden_size': config.hidden_size,
+        'num_hidden_layers': config.num_hidden_layers,
+        'vocab_size': config.vocab_size
+    }
+    
+    return tokenizer, model_loader, info
+
+
+def _process_peak_rss_mb() -> float:
+    """
+    获取本进程整个生命周期的峰值常驻内存（MB）
+    
+    Returns:
+        float: 峰值常驻内存，无法获取时为-1
+    """
+    if resource is None:
+        return -1.0
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，Linux以KB为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _reset_peak_rss() -> None:
+    """
+    重置本进程的峰值常驻内存，之后读取的峰值只包含重置之后的部分
+    """
+    if not _PEAK_RESETTABLE:
+        return
+    
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    """
+    获取上次_reset_peak_rss之后本进程的峰值常驻内存（MB）
+    
+    Returns:
+        float: 峰值常驻内存，不支持重置峰值的平台上为None
+    """
+    if not _PEAK_RESETTABLE:
+        return None
+    
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _record(stage: str, latencies: List[float], sequences: int, chars: int, **params) -> Dict:
+    """
+    汇总一个测量项的吞吐量、延迟分位数和峰值内存
+    
+    峰值内存为测量函数开始时重置之后的峰值，只反映这一测量项；不支持重置时为None，
+    整个进程的峰值见结果中的process_peak_rss_mb。
+    
+    Args:
+        stage: 阶段名称
+        latencies: 每次调用的耗时（秒）
+        sequences: 处理的序列数
+        chars: 处理的字符数
+        **params: 批大小、最大序列长度、线程数等参数
+        
+    Returns:
+        Dict: 测量结果
+    """
+    seconds = sum(latencies)
+    latencies_ms = np.array(latencies) * 1000
+    peak = _peak_rss_mb()
+    
+    result = {'stage': stage}
+    result.update(params)
+    result.update({
+        'sequences': sequences,
+        'chars': chars,
+        'seconds': round(seconds, 6),
+        'chars_per_sec': round(chars / seconds, 2) if seconds else None,
+        'seqs_per_sec': round(sequences / seconds, 2) if seconds else None,
+        'latency_p50_ms': round(float(np.percentile(latencies_ms, 50)), 3) if latencies else None,
+        'latency_p99_ms': round(float(np.percentile(latencies_ms, 99)), 3) if latencies else None,
+        'peak_rss_mb': round(peak, 1) if peak is not None else None
+    })
+    
+    return result
+
+
+def _kept_chars(encoded_batches: List[List[Dict]]) -> int:
+    """
+    编码时实际保留的字符数，超出最大长度被截断的部分不计
+    
+    Args:
+        encoded_batches: 每批encode_with_offsets的编码结果
+        
+    Returns:
+        int: 字符数
+    """
+    return sum(encoded['offsets'][-2][1] for encoded_list in encoded_batches for encoded in encoded_list 
+               if len(encoded['offsets']) > 2)
+
+
+def _timed(func, *args):
+    """
+    调用函数并返回 (结果, 耗时秒数)
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_io(lines: List[str], work_dir: str, repeats: int = 5) -> List[Dict]:
+    """
+    测量读取语料文件和写入分词结果的速度
+    
+    Args:
+        lines: 文本行
+        work_dir: 临时目录
+        repeats: 重复次数
+        
+    Returns:
+        List[Dict]: 读取和写入的测量结果
+    """
+    _reset_peak_rss()
+    
+    corpus_file = os.path.join(work_dir, 'corpus.txt')
+    with open(corpus_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    
+    chars = sum(len(line) for line in lines)
+    # 模拟每两个字一个词的分词结果
+    segmented = ['/'.join(line[i:i + 2] for i in range(0, len(line), 2)) for line in lines]
+    
+    read_latencies = []
+    write_latencies = []
+    for _ in range(repeats):
+        _, seconds = _timed(lambda: sum(1 for _ in iter_file_lines(corpus_file)))
+        read_latencies.append(seconds)
+        _, seconds = _timed(write_lines, work_dir, 'segmented.txt', segmented)
+        write_latencies.append(seconds)
+    
+    return [
+        _record('io_read', read_latencies, len(lines) * repeats, chars * repeats),
+        _record('io_write', write_latencies, len(lines) * repeats, chars * repeats)
+    ]
+
+
+def bench_tokenize(tokenizer: SikuTokenizer, sequences: List[str], max_seq_length: int) -> Dict:
+    """
+    测量BertTokenizer分词（基础分词+WordPiece）的速度，每个序列一次计时
+    
+    Args:
+        tokenizer: 分词器
+        sequences: 序列列表
+        max_seq_length: 最大序列长度（只用于标记结果）
+        
+    Returns:
+        Dict: 测量结果
+    """
+    _reset_peak_rss()
+    
+    latencies = [_timed(tokenizer.tokenize, sequence)[1] for sequence in sequences]
+    return _record('tokenize', latencies, len(sequences), sum(map(len, sequences)), 
+                   max_seq_length=max_seq_length)
+
+
+def bench_encode(tokenizer: SikuTokenizer, batches: List[List[str]], max_seq_length: int, 
+                 batch_size: int) -> Tuple[Dict, List[List[Dict]]]:
+    """
+    测量编码（查表编码、字符偏移、填充为矩阵）的速度，每批一次计时
+    
+    Args:
+        tokenizer: 分词器
+        batches: 按批划分的序列
+        max_seq_length: 最大序列长度
+        batch_size: 批大小
+        
+    Returns:
+        Tuple[Dict, List[List[Dict]]]: 测量结果和每批的编码结果
+    """
+    _reset_peak_rss()
+    
+    latencies = []
+    encoded_batches = []
+    
+    for batch in batches:
+        start = time.perf_counter()
+        encoded_list = [tokenizer.encode_with_offsets(text, max_seq_length) for text in batch]
+        tokenizer.pad_batch_array(encoded_list)
+        latencies.append(time.perf_counter() - start)
+        encoded_batches.append(encoded_list)
+    
+    result = _record('encode', latencies, sum(map(len, batches)), _kept_chars(encoded_batches), 
+                     batch_size=batch_size, max_seq_length=max_seq_length)
+    
+    return result, encoded_batches
+
+
+def bench_forward(predictor: Predictor, batches: List[List[str]], encoded_batches: List[List[Dict]], 
+                  max_seq_length: int, batch_size: int, num_threads: int) -> Tuple[Dict, List[np.ndarray]]:
+    """
+    测量模型前向计算的速度，每批一次计时
+    
+    Args:
+        predictor: 预测器
+        batches: 按批划分的序列
+        encoded_batches: 每批的编码结果
+        max_seq_length: 最大序列长度
+        batch_size: 批大小
+        num_threads: 线程数
+        
+    Returns:
+        Tuple[Dict, List[np.ndarray]]: 测量结果和每批的预测标签
+    """
+    _reset_peak_rss()
+    
+    # 预热一次，排除首次调用的内存分配
+    predictor._forward_encoded(encoded_batches[0])
+    
+    latencies = []
+    labels = []
+    for encoded_list in encoded_batches:
+        predicted_labels, seconds = _timed(predictor._forward_encoded, encoded_list)
+        latencies.append(seconds)
+        labels.append(predicted_labels)
+    
+    result = _record('forward', latencies, sum(map(len, batches)), _kept_chars(encoded_batches), 
+                     batch_size=batch_size, max_seq_length=max_seq_length, num_threads=num_threads)
+    
+    return result, labels
+
+
+def bench_decode(predictor: Predictor, batches: List[List[str]], encoded_batches: List[List[Dict]], 
+                 labels: List[np.ndarray], max_seq_length: int, batch_size: int) -> Dict:
+    """
+    测量由预测标签切分原文的速度，每批一次计时
+    
+    Args:
+        predictor: 预测器
+        batches: 按批划分的序列
+        encoded_batches: 每批的编码结果
+        labels: 每批的预测标签
+        max_seq_length: 最大序列长度
+        batch_size: 批大小
+        
+    Returns:
+        Dict: 测量结果
+    """
+    _reset_peak_rss()
+    
+    latencies = []
+    for batch, encoded_list, predicted_labels in zip(batches, encoded_batches, labels):
+        rows = [[idx] for idx in range(len(batch))]
+        latencies.append(_timed(predictor.decode_segments, batch, encoded_list, rows, predicted_labels)[1])
+    
+    return _record('decode', latencies, sum(map(len, batches)), _kept_chars(encoded_batches), 
+                   batch_size=batch_size, max_seq_length=max_seq_length)
+
+
+def bench_end_to_end(predictor: Predictor, batches: List[List[str]], encoded_batches: List[List[Dict]], 
+                     max_seq_length: int, batch_size: int, num_threads: int) -> Dict:
+    """
+    测量process_text_batch的端到端速度，每个请求为一批序列
+    
+    Args:
+        predictor: 预测器（不使用缓存和跨批去重）
+        batches: 按批划分的序列
+        encoded_batches: 每批的编码结果，只用于统计实际处理的字符数
+        max_seq_length: 最大序列长度
+        batch_size: 批大小
+        num_threads: 线程数
+        
+    Returns:
+        Dict: 测量结果
+    """
+    _reset_peak_rss()
+    
+    latencies = [
+        _timed(lambda batch: predictor.process_text_batch(batch, max_seq_length, batch_size, 
+                                                          show_progress=False), batch)[1]
+        for batch in batches
+    ]
+    
+    return _record('end_to_end', latencies, sum(map(len, batches)), _kept_chars(encoded_batches), 
+                   batch_size=batch_size, max_seq_length=max_seq_length, num_threads=num_threads)
+
+
+def run_benchmark(corpus: str = 'synthetic', corpus_path: str = None, num_lines: int = 256, 
+                  batch_sizes: List[int] = (1, 8, 32), max_seq_lengths: List[int] = (64, 128), 
+                  thread_counts: List[int] = None, model_path: str = None, 
+                  random_model: bool = False, seed: int = 0) -> Dict:
+    """
+    运行基准测试，分别测量I/O、分词、编码、前向计算、解码和端到端的速度
+    
+    Args:
+        corpus: 语料类型，synthetic（合成）、sample（样例古籍）或file（corpus_path指定的文件）
+        corpus_path: 真实语料的文件或文件夹路径
+        num_lines: 合成和样例语料的行数
+        batch_sizes: 测量的批大小
+        max_seq_lengths: 测量的最大序列长度
+        thread_counts: 测量的线程数，None表示1和全部可用核心
+        model_path: 模型目录，None表示使用默认目录
+        random_model: 是否强制使用随机初始化模型
+        seed: 随机种子
+        
+    Returns:
+        Dict: 环境信息和全部测量结果
+    """
+    if thread_counts is None:
+        thread_counts = sorted({1, get_available_cores()})
+    
+    results = []
+    
+    with tempfile.TemporaryDirectory(prefix='sikufenci_bench_') as work_dir:
+        tokenizer, model_loader, model_info = prepare_model(model_path, random_model, work_dir)
+        predictor = Predictor(model_loader, tokenizer, dedup_memory=0)
+        predictor.load_model()
+        
+        if corpus == 'file':
+            lines = load_corpus(corpus_path)
+        elif corpus == 'sample':
+            lines = build_sample_corpus(num_lines, seed)
+        else:
+            chars = [token for token in tokenizer.tokenizer.vocab if len(token) == 1 and '\u4e00' <= token <= '\u9fff']
+            lines = build_synthetic_corpus(chars, num_lines, seed)
+        
+        print(f"语料: {corpus}，{len(lines)} 行，{sum(map(len, lines))} 字", file=sys.stderr)
+        
+        results.extend(bench_io(lines, work_dir))
+        
+        for max_seq_length in max_seq_lengths:
+            sequences = preprocess_text('\n'.join(lines), max_seq_length)
+            results.append(bench_tokenize(tokenizer, sequences, max_seq_length))
+            
+            for batch_size in batch_sizes:
+                batches = [sequences[i:i + batch_size] for i in range(0, len(sequences), batch_size)]
+                encode_result, encoded_batches = bench_encode(tokenizer, batches, max_seq_length, batch_size)
+                results.append(encode_result)
+                
+                for num_threads in thread_counts:
+                    configure_threads(num_threads)
+                    print(f"batch_size={batch_size} max_seq_length={max_seq_length} "
+                          f"num_threads={num_threads}", file=sys.stderr)
+                    
+                    forward_result, labels = bench_forward(predictor, batches, encoded_batches, 
+                                                           max_seq_length, batch_size, num_threads)
+                    results.append(forward_result)
+                    results.append(bench_end_to_end(predictor, batches, encoded_batches, max_seq_length, 
+                                                    batch_size, num_threads))
+                
+                results.append(bench_decode(predictor, batches, encoded_batches, labels, 
+                                            max_seq_length, batch_size))
+    
+    return {
+        'environment': {
+            'sikufenci_version': __version__,
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'available_cores': get_available_cores(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'model': model_info,
+        'corpus': {
+            'type': corpus,
+            'lines': len(lines),
+            'chars': sum(map(len, lines))
+        },
+        'results': results,
+        # 整个进程生命周期的峰值，包括模型加载
+        'process_peak_rss_mb': round(_process_peak_rss_mb(), 1)
+    }
+
+
+def main():
+    """
+    主函数，用于命令行调用
+    """
+    parser = argparse.ArgumentParser(description="sikufenci分词流程基准测试")
+    parser.add_argument('--corpus', choices=['synthetic', 'sample', 'file'], default='synthetic', 
+                        help="语料类型")
+    parser.add_argument('--corpus-path', default=None, help="真实语料的txt文件或文件夹（--corpus file）")
+    parser.add_argument('--num-lines', type=int, default=256, help="合成和样例语料的行数")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32], help="批大小")
+    parser.add_argument('--max-seq-lengths', type=int, nargs='+', default=[64, 128], help="最大序列长度")
+    parser.add_argument('--threads', type=int, nargs='+', default=None, help="线程数，默认1和全部可用核心")
+    parser.add_argument('--model-path', default=None, help="模型目录")
+    parser.add_argument('--random-model', action='store_true', help="使用同结构的随机初始化模型")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--output', default=None, help="结果JSON文件，默认输出到标准输出")
+    args = parser.parse_args()
+    
+    if args.corpus == 'file' and not args.corpus_path:
+        parser.error("--corpus file 需要指定 --corpus-path")
+    
+    report = run_benchmark(args.corpus, args.corpus_path, args.num_lines, args.batch_sizes, 
+                           args.max_seq_lengths, args.threads, args.model_path, 
+                           args.random_model, args.seed)
+    
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 import os
 import sys
-from typing import List
+from typing import List, Optional
 from tqdm import tqdm
 
 # 添加项目根目录到path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.file_utils import read_files, write_files, validate_file_structure
+from utils.file_utils import list_txt_files, read_file, write_files, validate_file_structure
 from utils.text_utils import preprocess_text, postprocess_text
+from utils.metrics import PipelineMetrics, measure, report_metrics
+from utils.run_report import RunReport, QUARANTINE_NAME
 from models.simple_tokenizer import SimpleTokenizer
 
 try:
@@ -22,7 +24,8 @@ except ImportError:
 
 
 def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128, 
-                eval_batch_size: int = 3) -> None:
+                eval_batch_size: int = 3, metrics: PipelineMetrics = None, 
+                metrics_path: str = None) -> None:
     """
     增强版繁体中文分词主函数
     
@@ -31,9 +34,14 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
         resultpath: 分词结果的存储路径
         max_seq_length: 最大序列长度，默认128
         eval_batch_size: 批处理大小，默认3
+        metrics: 计时器，记录各阶段耗时，可通过add_hook注册回调
+        metrics_path: 处理结束后写入统计的文件路径，.prom为Prometheus文本格式，其他为JSON
     """
     print("开始初始化分词系统...")
     
+    if metrics is None and metrics_path:
+        metrics = PipelineMetrics()
+    
     # 验证输入路径
     if not validate_file_structure(raw_path):
         raise ValueError(f"输入路径 {raw_path} 不存在或不包含txt文件")
@@ -63,7 +71,7 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
             model_loader = ModelLoader(device=device)
             
             print("正在初始化预测器...")
-            predictor = Predictor(model_loader, tokenizer)
+            predictor = Predictor(model_loader, tokenizer, metrics=metrics)
             
             use_advanced = True
             
@@ -78,43 +86,45 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
         print("使用简化版分词器...")
         tokenizer = SimpleTokenizer()
     
+    # 单个文件失败时记录到隔离清单，继续处理其余文件
+    report = RunReport(os.path.join(resultpath, QUARANTINE_NAME))
+    
     # 处理文件
     print("开始处理文件...")
     processed_files = 0
     
     try:
-        for filename, content in read_files(raw_path):
+        for file_path in list_txt_files(raw_path):
+            filename = os.path.basename(file_path)
             print(f"正在处理文件: {filename}")
             
-            # 预处理文本
-            sequences = preprocess_text(content, max_seq_length)
-            
-            if not sequences:
-                print(f"文件 {filename} 为空，跳过处理")
+            try:
+                with measure(metrics, 'read', 1):
+                    content = read_file(file_path)
+                
+                final_result = _segment_content(content, max_seq_length, eval_batch_size, 
+                                                predictor if use_advanced else None, tokenizer, metrics)
+                
+                if final_result is None:
+                    print(f"文件 {filename} 为空，跳过处理")
+                    continue
+                
+                # 写入结果
+                with measure(metrics, 'write', 1):
+                    write_files(resultpath, filename, final_result)
+            except UnicodeDecodeError as e:
+                print(f"警告: 文件 {file_path} 编码不是UTF-8，跳过处理")
+                report.fail(file_path, e)
+                continue
+            except Exception as e:
+                print(f"处理文件 {filename} 时发生错误: {e}")
+                report.fail(file_path, e)
                 continue
-            
-            # 分词处理
-            if use_advanced:
-                # 使用高级分词器
-                segmented_results = predictor.process_text_batch(
-                    sequences, 
-                    max_seq_length, 
-                    eval_batch_size
-                )
-            else:
-                # 使用简化分词器
-                segmented_results = []
-                for sequence in tqdm(sequences, desc="分词处理"):
-                    segmented_text = tokenizer.segment_text(sequence)
-                    segmented_results.append(segmented_text)
-            
-            # 后处理
-            final_result = postprocess_text(segmented_results)
-            
-            # 写入结果
-            write_files(resultpath, filename, final_result)
             
             processed_files += 1
+            if metrics is not None:
+                metrics.increment('files')
+                metrics.increment('chars', len(content))
             print(f"文件 {filename} 处理完成")
     
     except Exception as e:
@@ -126,10 +136,62 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
         if use_advanced and 'predictor' in locals():
             predictor.model_loader.unload_model()
     
+    if use_advanced:
+        dedup_stats = predictor.get_dedup_stats()
+        print(f"去重: 共 {dedup_stats['sequences']} 个序列，实际推理 {dedup_stats['inferred']} 个，"
+              f"减少 {dedup_stats['dedup_ratio']:.1%}")
+    
+    report_metrics(metrics, metrics_path)
+    report.print_summary()
+    
     print(f"分词完成！共处理了 {processed_files} 个文件")
     print(f"结果已保存到: {resultpath}")
 
 
+def _segment_content(content: str, max_seq_length: int, eval_batch_size: int, 
+                     predictor, tokenizer, metrics: PipelineMetrics = None) -> Optional[str]:
+    """
+    对单个文件内容进行分词
+    
+    Args:
+        content: 文件内容
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        predictor: 高级分词的预测器，None表示使用简化分词器
+        tokenizer: 简化分词器
+        metrics: 计时器
+        
+    Returns:
+        Optional[str]: 分词结果，内容为空时返回None
+    """
+    # 预处理文本
+    with measure(metrics, 'preprocess'):
+        sequences = preprocess_text(content, max_seq_length)
+    
+    if not sequences:
+        return None
+    
+    # 分词处理
+    if predictor is not None:
+        # 使用高级分词器
+        segmented_results = predictor.process_text_batch(
+            sequences, 
+            max_seq_length, 
+            eval_batch_size
+        )
+    else:
+        # 使用简化分词器
+        segmented_results = []
+        with measure(metrics, 'infer', len(sequences)):
+            for sequence in tqdm(sequences, desc="分词处理"):
+                segmented_text = tokenizer.segment_text(sequence)
+                segmented_results.append(segmented_text)
+    
+    # 后处理
+    with measure(metrics, 'postprocess', len(segmented_results)):
+        return postprocess_text(segmented_results)
+
+
 if __name__ == "__main__":
     # 测试用例
     TCfenci_all("../../datatest", "../../resulttest", 128, 3)
\ No newline at end of file
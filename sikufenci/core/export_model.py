@@ -0,0 +1,63 @@
+import os
+import sys
+import argparse
+import torch
+
+# 添加项目根目录到path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.model_loader import ModelLoader
+from models.export import export_torchscript, export_onnx, ONNX_NAME
+
+
+def export_model(model_path: str = None, lengths=(128,), output_dir: str = None, 
+                 quantize: bool = False, export_format: str = 'torchscript') -> list:
+    """
+    导出模型：TorchScript模型可用ModelLoader(torchscript=True)直接加载，
+    ONNX模型可用ModelLoader(backend='onnxruntime')加载
+    
+    Args:
+        model_path: 模型目录，None表示使用默认目录
+        lengths: TorchScript导出的序列长度，多个长度时推理按长度分桶；ONNX为动态长度，只用于检验
+        output_dir: 输出目录，None表示模型目录
+        quantize: 是否导出动态int8量化模型（仅TorchScript）
+        export_format: 导出格式，torchscript或onnx
+        
+    Returns:
+        list: 导出的文件路径
+    """
+    model_loader = ModelLoader(model_path, device=torch.device('cpu'), quantize=quantize)
+    
+    if export_format == 'onnx':
+        print("正在导出ONNX模型...")
+        output_file = os.path.join(output_dir, ONNX_NAME) if output_dir else None
+        paths = [export_onnx(model_loader, output_file, lengths)]
+    else:
+        print("正在导出TorchScript模型...")
+        paths = export_torchscript(model_loader, lengths, output_dir)
+    
+    for path in paths:
+        print(f"已保存: {path}")
+    
+    return paths
+
+
+def main():
+    """
+    主函数，用于命令行调用
+    """
+    parser = argparse.ArgumentParser(description="导出sikufenci的TorchScript或ONNX模型")
+    parser.add_argument('--format', dest='export_format', choices=['torchscript', 'onnx'], 
+                        default='torchscript', help="导出格式")
+    parser.add_argument('--model-path', default=None, help="模型目录")
+    parser.add_argument('--lengths', type=int, nargs='+', default=[128],
+                        help="导出的序列长度，例如 --lengths 32 64 128")
+    parser.add_argument('--output-dir', default=None, help="输出目录，默认为模型目录")
+    parser.add_argument('--quantize', action='store_true', help="导出动态int8量化模型（仅TorchScript）")
+    args = parser.parse_args()
+    
+    export_model(args.model_path, args.lengths, args.output_dir, args.quantize, args.export_format)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,12 @@ from tqdm import tqdm
 # 添加项目根目录到path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.json_utils import read_json_file, extract_text_from_json, get_json_stats
+from utils.json_utils import iter_json_items, collect_json_stats, extract_text_from_json
 from utils.file_utils import write_files
 from utils.text_utils import preprocess_text, postprocess_text
+from utils.metrics import PipelineMetrics, measure, measure_iter, report_metrics
+from utils.run_report import RunReport, QUARANTINE_NAME
+from utils.pipeline import prefetch_iter
 from models.simple_tokenizer import SimpleTokenizer
 
 try:
@@ -22,9 +25,15 @@ except ImportError:
     USE_ADVANCED_MODEL = False
     print("高级模型依赖未安装，使用简化版分词器")
 
+# 流水线模式下预先读取的JSON条目数
+_JSON_PREFETCH = 8
+
 
 def TCfenci_json(json_path: str, resultpath: str, max_seq_length: int = 128, 
-                 eval_batch_size: int = 3, max_files: int = None) -> None:
+                 eval_batch_size: int = 3, max_files: int = None, 
+                 show_stats: bool = True, pack_sequences: bool = False, 
+                 metrics: PipelineMetrics = None, metrics_path: str = None, 
+                 pipeline: bool = False) -> None:
     """
     JSON文件分词主函数
     
@@ -34,20 +43,21 @@ def TCfenci_json(json_path: str, resultpath: str, max_seq_length: int = 128,
         max_seq_length: 最大序列长度，默认128
         eval_batch_size: 批处理大小，默认3
         max_files: 最大处理文件数量，None为全部处理
+        show_stats: 是否统计并输出JSON文件信息，统计在处理的同一遍读取中完成
+        pack_sequences: 是否将多个短诗句以[SEP]分隔拼接为一个模型序列推理
+        metrics: 计时器，记录各阶段耗时，可通过add_hook注册回调
+        metrics_path: 处理结束后写入统计的文件路径，.prom为Prometheus文本格式，其他为JSON
+        pipeline: 是否在后台线程中提前读取和解析后续条目，与推理重叠
     """
     print("开始初始化JSON分词系统...")
     
+    if metrics is None and metrics_path:
+        metrics = PipelineMetrics()
+    
     # 验证JSON文件
     if not os.path.exists(json_path):
         raise FileNotFoundError(f"JSON文件不存在: {json_path}")
     
-    # 获取JSON统计信息
-    stats = get_json_stats(json_path)
-    print(f"JSON文件统计信息:")
-    print(f"  - 总计条目: {stats['total_items']}")
-    print(f"  - 唯一作者: {stats['unique_authors']}")
-    print(f"  - 总字符数: {stats['total_chars']}")
-    
     # 创建结果目录
     if not os.path.exists(resultpath):
         os.makedirs(resultpath)
@@ -73,7 +83,8 @@ def TCfenci_json(json_path: str, resultpath: str, max_seq_length: int = 128,
             model_loader = ModelLoader(device=device)
             
             print("正在初始化预测器...")
-            predictor = Predictor(model_loader, tokenizer)
+            predictor = Predictor(model_loader, tokenizer, pack_sequences=pack_sequences, 
+                                  metrics=metrics)
             
             use_advanced = True
             
@@ -88,63 +99,102 @@ def TCfenci_json(json_path: str, resultpath: str, max_seq_length: int = 128,
         print("使用简化版分词器...")
         tokenizer = SimpleTokenizer()
     
-    # 读取JSON数据
-    json_data = read_json_file(json_path)
+    # 逐条读取JSON数据，统计信息在同一遍读取中累计
+    json_data = iter_json_items(json_path)
+    stats = {}
+    if show_stats:
+        json_data = collect_json_stats(json_data, stats)
+    
+    # 单个条目失败时记录到隔离清单，继续处理其余条目
+    report = RunReport(os.path.join(resultpath, QUARANTINE_NAME))
     
     # 处理文件
     print("开始处理JSON数据...")
     processed_files = 0
     
     try:
-        for filename, content in extract_text_from_json(json_data, 'paragraphs'):
+        # JSON条目在迭代时才读取和解析，计入读取阶段
+        items = measure_iter(metrics, 'read', extract_text_from_json(json_data, 'paragraphs'))
+        if pipeline:
+            items = prefetch_iter(items, _JSON_PREFETCH)
+        for filename, content in items:
             if max_files and processed_files >= max_files:
                 break
                 
             print(f"正在处理: {filename}")
             
-            # 预处理文本
-            sequences = preprocess_text(content, max_seq_length)
-            
-            if not sequences:
-                print(f"文件 {filename} 为空，跳过处理")
+            try:
+                # 预处理文本
+                with measure(metrics, 'preprocess'):
+                    sequences = preprocess_text(content, max_seq_length)
+                
+                if not sequences:
+                    print(f"文件 {filename} 为空，跳过处理")
+                    continue
+                
+                # 分词处理
+                if use_advanced:
+                    # 使用高级分词器
+                    segmented_results = predictor.process_text_batch(
+                        sequences, 
+                        max_seq_length, 
+                        eval_batch_size
+                    )
+                else:
+                    # 使用简化分词器
+                    segmented_results = []
+                    with measure(metrics, 'infer', len(sequences)):
+                        for sequence in tqdm(sequences, desc="分词处理", leave=False):
+                            segmented_text = tokenizer.segment_text(sequence)
+                            segmented_results.append(segmented_text)
+                
+                # 后处理
+                with measure(metrics, 'postprocess', len(segmented_results)):
+                    final_result = postprocess_text(segmented_results)
+                
+                # 写入结果
+                with measure(metrics, 'write', 1):
+                    write_files(resultpath, filename, final_result)
+            except Exception as e:
+                print(f"处理 {filename} 时发生错误: {e}")
+                report.fail(filename, e)
                 continue
             
-            # 分词处理
-            if use_advanced:
-                # 使用高级分词器
-                segmented_results = predictor.process_text_batch(
-                    sequences, 
-                    max_seq_length, 
-                    eval_batch_size
-                )
-            else:
-                # 使用简化分词器
-                segmented_results = []
-                for sequence in tqdm(sequences, desc="分词处理", leave=False):
-                    segmented_text = tokenizer.segment_text(sequence)
-                    segmented_results.append(segmented_text)
-            
-            # 后处理
-            final_result = postprocess_text(segmented_results)
-            
-            # 写入结果
-            write_files(resultpath, filename, final_result)
-            
             processed_files += 1
+            if metrics is not None:
+                metrics.increment('files')
+                metrics.increment('chars', len(content))
             
             # 显示进度
             if processed_files % 10 == 0:
                 print(f"已处理 {processed_files} 个文件")
     
     except Exception as e:
-        print(f"处理文件时发生错误: {e}")
-        return
+        # JSON数据本身损坏时无法继续读取后续条目，已完成的结果保留
+        print(f"读取JSON数据时发生错误: {e}")
+        report.fail(json_path, e)
     
     finally:
         # 清理资源
         if use_advanced and 'predictor' in locals():
             predictor.model_loader.unload_model()
     
+    if show_stats and stats:
+        # 提前结束时统计只覆盖已读取的条目
+        complete = 'unique_authors' in stats
+        print(f"JSON文件统计信息{'' if complete else '（已读取部分）'}:")
+        print(f"  - 总计条目: {stats['total_items']}")
+        print(f"  - 唯一作者: {len(stats['authors'])}")
+        print(f"  - 总字符数: {stats['total_chars']}")
+    
+    if use_advanced:
+        dedup_stats = predictor.get_dedup_stats()
+        print(f"去重: 共 {dedup_stats['sequences']} 个序列，实际推理 {dedup_stats['inferred']} 个，"
+              f"减少 {dedup_stats['dedup_ratio']:.1%}")
+    
+    report_metrics(metrics, metrics_path)
+    report.print_summary()
+    
     print(f"分词完成！共处理了 {processed_files} 个文件")
     print(f"结果已保存到: {resultpath}")
 
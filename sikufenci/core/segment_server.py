@@ -0,0 +1,419 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import socketserver
+from concurrent.futures import Future
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import List, Tuple
+
+# 添加项目根目录到path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text_utils import preprocess_text, postprocess_text
+from utils.device_utils import get_device
+from models.tokenizer import SikuTokenizer
+from models.model_loader import ModelLoader
+from models.predictor import Predictor
+
+
+# 单个请求的最大字节数，HTTP超过时返回413，Unix socket超过时返回错误并断开连接
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class MicroBatcher:
+    """
+    微批处理器：在一个很短的时间窗口内收集并发请求，合并为一次批量预测
+    """
+    
+    def __init__(self, predictor: Predictor, max_seq_length: int = 128,
+                 eval_batch_size: int = 32, batch_window: float = 0.005,
+                 max_batch_sequences: int = 256):
+        """
+        初始化微批处理器
+        
+        Args:
+            predictor: 已加载模型的预测器
+            max_seq_length: 最大序列长度
+            eval_batch_size: 模型一次处理的序列数量
+            batch_window: 收集并发请求的时间窗口（秒）
+            max_batch_sequences: 一个微批最多包含的序列数，达到后立即处理
+        """
+        self.predictor = predictor
+        self.max_seq_length = max_seq_length
+        self.eval_batch_size = eval_batch_size
+        self.batch_window = batch_window
+        self.max_batch_sequences = max_batch_sequences
+        
+        self._queue = queue.Queue()
+        self._thread = None
+    
+    def start(self) -> None:
+        """
+        启动后台批处理线程
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sikufenci-batcher", daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """
+        停止后台批处理线程
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+    
+    def submit(self, sequences: List[str], timeout: float = None) -> List[str]:
+        """
+        提交一组序列并等待分词结果
+        
+        Args:
+            sequences: 预处理后的序列列表
+            timeout: 等待超时时间（秒），None表示一直等待
+            
+        Returns:
+            List[str]: 与输入顺序一致的分词结果
+        """
+        if not sequences:
+            return []
+        
+        future = Future()
+        self._queue.put((sequences, future))
+        
+        return future.result(timeout)
+    
+    def _run(self) -> None:
+        """
+        批处理线程主循环
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            
+            pending = [item]
+            num_sequences = len(item[0])
+            deadline = time.monotonic() + self.batch_window
+            stopping = False
+            
+            # 在时间窗口内继续收集请求
+            while num_sequences < self.max_batch_sequences:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                pending.append(item)
+                num_sequences += len(item[0])
+            
+            self._process(pending)
+            
+            if stopping:
+                break
+    
+    def _process(self, pending: List[Tuple[List[str], Future]]) -> None:
+        """
+        合并一个微批内的全部序列进行预测，并把结果分发回各个请求
+        
+        Args:
+            pending: (序列列表, Future) 列表
+        """
+        sequences = [sequence for request_sequences, _ in pending for sequence in request_sequences]
+        
+        try:
+            results = self.predictor.process_text_batch(
+                sequences,
+                self.max_seq_length,
+                self.eval_batch_size,
+                show_progress=False
+            )
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        
+        offset = 0
+        for request_sequences, future in pending:
+            future.set_result(results[offset:offset + len(request_sequences)])
+            offset += len(request_sequences)
+
+
+class SegmentService:
+    """
+    常驻分词服务：保持一个已加载模型的预测器，对外提供文本分词
+    """
+    
+    def __init__(self, max_seq_length: int = 128, eval_batch_size: int = 32,
+                 batch_window: float = 0.005, quantize: bool = False,
+                 model_path: str = None, vocab_file: str = None, torchscript: bool = False, 
+                 backend: str = 'torch'):
+        """
+        初始化分词服务并预热模型
+        
+        Args:
+            max_seq_length: 最大序列长度
+            eval_batch_size: 模型一次处理的序列数量
+            batch_window: 微批收集时间窗口（秒）
+            quantize: 是否使用动态int8量化模型
+            model_path: 模型目录，None表示使用默认目录
+            vocab_file: 词汇表路径，None表示使用默认目录
+            torchscript: 是否加载export_model.py导出的TorchScript模型，冷启动更快
+            backend: 推理后端，torch或onnxruntime
+        """
+        device, num_cores = get_device()
+        
+        print("正在加载分词器...")
+        tokenizer = SikuTokenizer(vocab_file)
+        
+        print("正在加载模型...")
+        model_loader = ModelLoader(model_path, device=device, quantize=quantize, 
+                                   torchscript=torchscript, backend=backend)
+        
+        self.max_seq_length = max_seq_length
+        self.predictor = Predictor(model_loader, tokenizer)
+        self.predictor.load_model()
+        
+        self.batcher = MicroBatcher(self.predictor, max_seq_length, eval_batch_size, batch_window)
+        self.batcher.start()
+    
+    def segment(self, text: str) -> str:
+        """
+        对一段文本分词，多行文本按行处理
+        
+        Args:
+            text: 输入文本
+            
+        Returns:
+            str: 以/分隔词语、以换行分隔行的分词结果
+        """
+        sequences = preprocess_text(text, self.max_seq_length)
+        return postprocess_text(self.batcher.submit(sequences))
+    
+    def segment_many(self, texts: List[str]) -> List[str]:
+        """
+        对多段文本分词，所有文本合并为一次提交
+        
+        Args:
+            texts: 文本列表
+            
+        Returns:
+            List[str]: 每段文本的分词结果
+        """
+        per_text = [preprocess_text(text, self.max_seq_length) for text in texts]
+        results = self.batcher.submit([sequence for sequences in per_text for sequence in sequences])
+        
+        outputs = []
+        offset = 0
+        for sequences in per_text:
+            outputs.append(postprocess_text(results[offset:offset + len(sequences)]))
+            offset += len(sequences)
+        
+        return outputs
+    
+    def handle_request(self, request: dict) -> dict:
+        """
+        处理一个JSON请求：{"text": "..."} 或 {"texts": ["...", ...]}
+        
+        Args:
+            request: 请求内容
+            
+        Returns:
+            dict: 响应内容
+        """
+        if not isinstance(request, dict):
+            raise ValueError("请求应为JSON对象")
+        if 'texts' in request:
+            texts = request['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("texts字段应为字符串列表")
+            return {'results': self.segment_many(texts)}
+        if 'text' in request:
+            if not isinstance(request['text'], str):
+                raise ValueError("text字段应为字符串")
+            return {'result': self.segment(request['text'])}
+        raise ValueError("请求中需要包含text或texts字段")
+    
+    def close(self) -> None:
+        """
+        停止批处理线程并卸载模型
+        """
+        self.batcher.stop()
+        self.predictor.model_loader.unload_model()
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    """
+    HTTP接口：POST /segment 提交JSON请求，GET /health 检查服务状态
+    """
+    
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+    
+    def do_POST(self):
+        if self.path != '/segment':
+            self._send_json(404, {'error': 'not found'})
+            return
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self._send_json(400, {'error': "Content-Length无效"})
+            return
+        
+        if length > self.server.max_request_bytes:
+            # 不读取请求体，发送响应后关闭连接
+            self.close_connection = True
+            self._send_json(413, {'error': f"请求超过 {self.server.max_request_bytes} 字节"})
+            return
+        
+        try:
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            response = self.server.service.handle_request(request)
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        
+        self._send_json(200, response)
+    
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        # 短请求量很大，不逐条打印访问日志
+        pass
+
+
+class _UnixSocketHandler(socketserver.StreamRequestHandler):
+    """
+    Unix socket接口：每行一个JSON请求，每行返回一个JSON响应
+    """
+    
+    def handle(self):
+        limit = self.server.max_request_bytes
+        
+        while True:
+            line = self.rfile.readline(limit + 1)
+            if not line:
+                break
+            if len(line) > limit and not line.endswith(b'\n'):
+                # 剩余部分无法与下一个请求区分，返回错误后断开连接
+                self.wfile.write(json.dumps({'error': f"请求超过 {limit} 字节"}, 
+                                            ensure_ascii=False).encode('utf-8') + b'\n')
+                break
+            
+            line = line.strip()
+            if not line:
+                continue
+            
+            try:
+                response = self.server.service.handle_request(json.loads(line.decode('utf-8')))
+            except Exception as e:
+                response = {'error': str(e)}
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+# http.server.ThreadingHTTPServer需要Python 3.7
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def serve(host: str = '127.0.0.1', port: int = 8765, unix_socket: str = None,
+          max_seq_length: int = 128, eval_batch_size: int = 32,
+          batch_window: float = 0.005, quantize: bool = False, 
+          torchscript: bool = False, backend: str = 'torch', 
+          max_request_bytes: int = MAX_REQUEST_BYTES) -> None:
+    """
+    启动常驻分词服务，模型只加载一次
+    
+    Args:
+        host: HTTP监听地址
+        port: HTTP监听端口
+        unix_socket: Unix socket路径，指定时使用Unix socket而不是HTTP
+        max_seq_length: 最大序列长度
+        eval_batch_size: 模型一次处理的序列数量
+        batch_window: 微批收集时间窗口（秒）
+        quantize: 是否使用动态int8量化模型
+        torchscript: 是否加载TorchScript模型
+        backend: 推理后端，torch或onnxruntime
+        max_request_bytes: 单个请求的最大字节数
+    """
+    print("开始初始化分词服务...")
+    service = SegmentService(max_seq_length, eval_batch_size, batch_window, quantize, 
+                             torchscript=torchscript, backend=backend)
+    
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = _ThreadingUnixServer(unix_socket, _UnixSocketHandler)
+        print(f"分词服务已启动: unix://{unix_socket}")
+    else:
+        server = _ThreadingHTTPServer((host, port), _HTTPHandler)
+        print(f"分词服务已启动: http://{host}:{port}/segment")
+    
+    server.service = service
+    server.max_request_bytes = max_request_bytes
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+def main():
+    """
+    主函数，用于命令行调用
+    """
+    parser = argparse.ArgumentParser(description="sikufenci常驻分词服务")
+    parser.add_argument('--host', default='127.0.0.1', help="HTTP监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="HTTP监听端口")
+    parser.add_argument('--unix-socket', default=None, help="Unix socket路径")
+    parser.add_argument('--max-seq-length', type=int, default=128, help="最大序列长度")
+    parser.add_argument('--eval-batch-size', type=int, default=32, help="批处理大小")
+    parser.add_argument('--batch-window', type=float, default=0.005, help="微批收集时间窗口（秒）")
+    parser.add_argument('--quantize', action='store_true', help="使用动态int8量化模型")
+    parser.add_argument('--torchscript', action='store_true', help="加载export_model.py导出的TorchScript模型")
+    parser.add_argument('--backend', choices=['torch', 'onnxruntime'], default='torch', help="推理后端")
+    parser.add_argument('--max-request-bytes', type=int, default=MAX_REQUEST_BYTES, help="单个请求的最大字节数")
+    args = parser.parse_args()
+    
+    serve(args.host, args.port, args.unix_socket, args.max_seq_length,
+          args.eval_batch_size, args.batch_window, args.quantize, args.torchscript, args.backend, 
+          args.max_request_bytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,9 @@ from tqdm import tqdm
 # 添加项目根目录到path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.file_utils import read_files, write_files, validate_file_structure
+from utils.file_utils import list_txt_files, read_file, write_files, validate_file_structure
 from utils.text_utils import preprocess_text, postprocess_text
+from utils.run_report import RunReport, QUARANTINE_NAME
 from models.simple_tokenizer import SimpleTokenizer
 
 
@@ -29,32 +30,47 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
     # 初始化简单分词器
     tokenizer = SimpleTokenizer()
     
+    # 单个文件失败时记录到隔离清单，继续处理其余文件
+    report = RunReport(os.path.join(resultpath, QUARANTINE_NAME))
+    
     # 处理文件
     print("开始处理文件...")
     processed_files = 0
     
     try:
-        for filename, content in read_files(raw_path):
+        for file_path in list_txt_files(raw_path):
+            filename = os.path.basename(file_path)
             print(f"正在处理文件: {filename}")
             
-            # 预处理文本
-            sequences = preprocess_text(content, max_seq_length)
-            
-            if not sequences:
-                print(f"文件 {filename} 为空，跳过处理")
+            try:
+                content = read_file(file_path)
+                
+                # 预处理文本
+                sequences = preprocess_text(content, max_seq_length)
+                
+                if not sequences:
+                    print(f"文件 {filename} 为空，跳过处理")
+                    continue
+                
+                # 分词处理
+                segmented_results = []
+                for sequence in tqdm(sequences, desc="分词处理"):
+                    segmented_text = tokenizer.segment_text(sequence)
+                    segmented_results.append(segmented_text)
+                
+                # 后处理
+                final_result = postprocess_text(segmented_results)
+                
+                # 写入结果
+                write_files(resultpath, filename, final_result)
+            except UnicodeDecodeError as e:
+                print(f"警告: 文件 {file_path} 编码不是UTF-8，跳过处理")
+                report.fail(file_path, e)
+                continue
+            except Exception as e:
+                print(f"处理文件 {filename} 时发生错误: {e}")
+                report.fail(file_path, e)
                 continue
-            
-            # 分词处理
-            segmented_results = []
-            for sequence in tqdm(sequences, desc="分词处理"):
-                segmented_text = tokenizer.segment_text(sequence)
-                segmented_results.append(segmented_text)
-            
-            # 后处理
-            final_result = postprocess_text(segmented_results)
-            
-            # 写入结果
-            write_files(resultpath, filename, final_result)
             
             processed_files += 1
             print(f"文件 {filename} 处理完成")
@@ -63,6 +79,8 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
         print(f"处理文件时发生错误: {e}")
         return
     
+    report.print_summary()
+    
     print(f"分词完成！共处理了 {processed_files} 个文件")
     print(f"结果已保存到: {resultpath}")
 
@@ -1,21 +1,51 @@
 import os
 import sys
-from typing import List
+import argparse
+import multiprocessing
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 from tqdm import tqdm
+import torch
 
 # 添加项目根目录到path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.file_utils import read_files, write_files, validate_file_structure
-from utils.text_utils import preprocess_text, postprocess_text
-from utils.device_utils import get_device, get_device_info
+from utils.file_utils import (
+    write_files, list_txt_files, parse_shard, result_dir_for, read_file, iter_file_lines, write_lines
+)
+from utils.text_utils import preprocess_text, postprocess_text, iter_sequences
+from utils.device_utils import get_device, get_device_info, get_thread_budget
+from utils.metrics import PipelineMetrics, measure, measure_iter, report_metrics
+from utils.manifest import RunManifest
+from utils.run_report import RunReport, quarantine_name
+from utils.pipeline import PipelineExecutor, prefetch_iter
+from utils.mmap_reader import iter_mmap_sequences
+from utils.segment_store import write_segmented
 from models.tokenizer import SikuTokenizer
 from models.model_loader import ModelLoader
 from models.predictor import Predictor
+from models.result_cache import SegmentationCache
+from version import __version__
+
+
+# 流式处理时预先读取的序列数
+_STREAM_PREFETCH = 1024
+
+# 工作进程内常驻的预测器，每个进程只加载一次模型
+_worker_predictor = None
+_worker_error = None
 
 
 def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128, 
-                eval_batch_size: int = 3) -> None:
+                eval_batch_size: int = 3, num_workers: int = 1, 
+                threads_per_worker: int = None, quantize: bool = False, 
+                streaming: bool = False, cache_path: str = None, 
+                overlap: int = None, pack_sequences: bool = False, 
+                torchscript: bool = False, backend: str = 'torch', 
+                mmap_weights: bool = False, metrics: PipelineMetrics = None, 
+                metrics_path: str = None, resume: bool = False, pipeline: bool = False, 
+                recursive: bool = False, include: List[str] = None, exclude: List[str] = None, 
+                shard: Union[str, Tuple[int, int]] = None, mmap_input: bool = False, 
+                output_format: str = 'text') -> None:
     """
     繁体中文分词主函数
     
@@ -24,12 +54,56 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
         resultpath: 分词结果的存储路径
         max_seq_length: 最大序列长度，默认128
         eval_batch_size: 批处理大小，默认3
+        num_workers: 工作进程数，默认1（单进程）；大于1时按文件分发到进程池
+        threads_per_worker: 每个工作进程的torch线程数，None表示按核心数平均分配
+        quantize: 是否使用动态int8量化模型
+        streaming: 是否逐行流式读取、分词并写入，内存占用与文件大小无关
+        cache_path: 分词结果缓存文件路径，None表示不使用缓存；重复运行时只对新增或修改的行推理
+        overlap: 超长行滑动窗口的重叠字符数，None表示按最大序列长度直接切分（旧行为）；
+            指定时优先在标点处切分，窗口结果拼接回一行输出
+        pack_sequences: 是否将多个短序列以[SEP]分隔拼接为一个模型序列推理，适合诗句等短行语料
+        torchscript: 是否加载export_model.py导出的TorchScript模型
+        backend: 推理后端，torch或onnxruntime（加载export_model.py导出的ONNX模型）
+        mmap_weights: 是否以内存映射方式加载平铺权重，多进程时各工作进程共享权重内存
+        metrics: 计时器，记录读取、预处理、编码、推理、解码、后处理和写入各阶段的耗时，
+            可通过add_hook注册回调；多进程时汇总各工作进程的统计
+        metrics_path: 处理结束后写入统计的文件路径，.prom为Prometheus文本格式，其他为JSON；
+            指定时未传入metrics也会计时
+        resume: 是否断点续跑：在结果目录中维护清单，跳过上次已完成且未修改的文件；
+            模型或影响结果的设置变化时重新处理所有文件
+        pipeline: 是否以后台线程读取、预处理和写入，与推理重叠；单进程时有效，
+            结果与不开启时相同，文件按完成顺序报告
+        recursive: 是否递归处理子文件夹，结果路径下保持与输入相同的目录结构
+        include: 文件匹配模式，按相对于raw_path的路径（以/分隔）匹配，默认为*.txt
+        exclude: 排除模式，匹配的文件不处理，匹配的子文件夹整个跳过
+        shard: 分片，格式为"i/N"或 (i, N)，只处理相对路径的哈希值除以N余i的文件，
+            增删文件不会改变其他文件所在的分片；多台机器分别指定不同的i即可分担同一语料，
+            各分片的清单和隔离清单分别保存，可以写入同一结果目录
+        mmap_input: 是否以内存映射方式读取输入文件并逐行切分，单行很长的大文件内存占用也有上限；
+            开启时按流式处理
+        output_format: 输出格式，text为以/分隔的文本（默认）；compact只写原文，
+            词边界以整数数组写入同名的.seg文件，可用utils.segment_store.SegmentedText读取
     """
     print("开始初始化分词系统...")
     
-    # 验证输入路径
-    if not validate_file_structure(raw_path):
+    if metrics is None and metrics_path:
+        metrics = PipelineMetrics()
+    
+    if output_format not in ('text', 'compact'):
+        raise ValueError(f"不支持的输出格式: {output_format}")
+    
+    if mmap_input:
+        streaming = True
+    
+    # 验证输入路径并列出文件，整个目录树只遍历一次
+    if shard is not None:
+        shard = parse_shard(shard)
+    try:
+        file_paths = list_txt_files(raw_path, recursive, include, exclude, shard)
+    except (FileNotFoundError, ValueError):
         raise ValueError(f"输入路径 {raw_path} 不存在或不包含txt文件")
+    if shard is not None:
+        print(f"分片 {shard[0]}/{shard[1]}: 共 {len(file_paths)} 个文件")
     
     # 创建结果目录
     if not os.path.exists(resultpath):
@@ -45,51 +119,92 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
     else:
         print(f"CPU核心数: {num_cores}")
     
+    if num_workers > 1:
+        if threads_per_worker is None:
+            threads_per_worker = get_thread_budget(num_workers)
+        _TCfenci_all_parallel(raw_path, file_paths, resultpath, max_seq_length, eval_batch_size, 
+                              num_workers, threads_per_worker, quantize, streaming, cache_path, 
+                              overlap, pack_sequences, torchscript, backend, mmap_weights, metrics, 
+                              resume, mmap_input, output_format, shard)
+        report_metrics(metrics, metrics_path)
+        return
+    
     # 初始化组件
     try:
         print("正在加载分词器...")
         tokenizer = SikuTokenizer()
         
         print("正在加载模型...")
-        model_loader = ModelLoader(device=device)
+        model_loader = ModelLoader(device=device, quantize=quantize, torchscript=torchscript, 
+                                   backend=backend, mmap_weights=mmap_weights)
         
         print("正在初始化预测器...")
-        predictor = Predictor(model_loader, tokenizer)
+        cache = SegmentationCache(cache_path) if cache_path else None
+        predictor = Predictor(model_loader, tokenizer, cache, pack_sequences=pack_sequences, 
+                              metrics=metrics)
         
     except Exception as e:
         print(f"初始化组件时发生错误: {e}")
         print("请确保已正确安装pytorch_model.bin文件")
         return
     
+    manifest = None
+    if resume:
+        manifest = RunManifest(resultpath, _run_settings(model_loader, max_seq_length, overlap, 
+                                                         pack_sequences, output_format), shard)
+    
+    # 单个文件失败时记录到隔离清单，继续处理其余文件
+    report = RunReport(os.path.join(resultpath, quarantine_name(shard)))
+    
     # 处理文件
     print("开始处理文件...")
     processed_files = 0
+    skipped_files = 0
     
     try:
-        for filename, content in read_files(raw_path):
-            print(f"正在处理文件: {filename}")
+        pending = []
+        for file_path in file_paths:
+            key = os.path.relpath(file_path, raw_path)
+            output_file = os.path.join(result_dir_for(raw_path, file_path, resultpath), 
+                                       os.path.basename(file_path))
+            if manifest is not None and manifest.is_done(key, file_path, output_file):
+                skipped_files += 1
+                continue
+            pending.append(file_path)
+        
+        if pipeline and not streaming:
+            outcomes = _iter_pipelined(predictor, raw_path, pending, resultpath, max_seq_length, 
+                                       eval_batch_size, overlap, output_format)
+        else:
+            outcomes = _iter_sequential(predictor, raw_path, pending, resultpath, max_seq_length, 
+                                        eval_batch_size, streaming, overlap, pipeline, mmap_input, 
+                                        output_format)
+        
+        for file_path, written, error in outcomes:
+            key = os.path.relpath(file_path, raw_path)
+            filename = key
             
-            # 预处理文本
-            sequences = preprocess_text(content, max_seq_length)
+            if isinstance(error, UnicodeDecodeError):
+                print(f"警告: 文件 {file_path} 编码不是UTF-8，跳过处理")
+                report.fail(file_path, error)
+                continue
+            if error is not None:
+                print(f"处理文件 {filename} 时发生错误: {error}")
+                report.fail(file_path, error)
+                continue
             
-            if not sequences:
+            if not written:
                 print(f"文件 {filename} 为空，跳过处理")
+                if manifest is not None:
+                    manifest.mark_done(key, file_path, 'empty')
                 continue
             
-            # 分词处理
-            segmented_results = predictor.process_text_batch(
-                sequences, 
-                max_seq_length, 
-                eval_batch_size
-            )
-            
-            # 后处理
-            final_result = postprocess_text(segmented_results)
-            
-            # 写入结果
-            write_files(resultpath, filename, final_result)
-            
             processed_files += 1
+            if manifest is not None:
+                manifest.mark_done(key, file_path)
+            if metrics is not None:
+                metrics.increment('files')
+                metrics.increment('bytes', os.path.getsize(file_path))
             print(f"文件 {filename} 处理完成")
     
     except Exception as e:
@@ -100,7 +215,438 @@ def TCfenci_all(raw_path: str, resultpath: str, max_seq_length: int = 128,
         # 清理资源
         if 'predictor' in locals():
             predictor.model_loader.unload_model()
+            if predictor.cache is not None:
+                predictor.cache.close()
+    
+    dedup_stats = predictor.get_dedup_stats()
+    print(f"去重: 共 {dedup_stats['sequences']} 个序列，实际推理 {dedup_stats['inferred']} 个，"
+          f"减少 {dedup_stats['dedup_ratio']:.1%}")
+    
+    if cache_path:
+        cache_stats = predictor.cache.get_stats()
+        print(f"缓存命中: {cache_stats['hits']}，未命中: {cache_stats['misses']}，"
+              f"命中率: {cache_stats['hit_rate']:.1%}")
+    
+    if predictor.oom_retries:
+        print(f"内存不足时拆分重试了 {predictor.oom_retries} 次")
+    
+    report_metrics(metrics, metrics_path)
+    report.print_summary()
+    
+    if skipped_files:
+        print(f"跳过上次已完成的 {skipped_files} 个文件")
+    print(f"分词完成！共处理了 {processed_files} 个文件")
+    print(f"结果已保存到: {resultpath}")
+
+
+def _run_settings(model_loader: ModelLoader, max_seq_length: int, overlap: Optional[int], 
+                  pack_sequences: bool, output_format: str = 'text') -> dict:
+    """
+    断点续跑清单中记录的设置，任何一项变化都需要重新分词
+    
+    Args:
+        model_loader: 模型加载器，只用于取得模型标识，不需要已加载模型
+        max_seq_length: 最大序列长度
+        overlap: 超长行滑动窗口的重叠字符数
+        pack_sequences: 是否拼接短序列推理
+        output_format: 输出格式
+        
+    Returns:
+        dict: 设置
+    """
+    return {
+        'version': __version__,
+        'model': model_loader.get_model_identity(),
+        'max_seq_length': max_seq_length,
+        'overlap': overlap,
+        'pack_sequences': pack_sequences,
+        'output_format': output_format
+    }
+
+
+def _preprocess_content(content: str, max_seq_length: int, overlap: int = None, 
+                        metrics: PipelineMetrics = None) -> List[str]:
+    """
+    将文件内容切分为待推理的序列
+    
+    Args:
+        content: 文件内容
+        max_seq_length: 最大序列长度
+        overlap: 超长行滑动窗口的重叠字符数，指定时保留整行，超长行由预测器按窗口切分后拼接
+        metrics: 计时器，可以为None
+        
+    Returns:
+        List[str]: 序列（指定overlap时为整行）
+    """
+    with measure(metrics, 'preprocess'):
+        return preprocess_text(content, None if overlap is not None else max_seq_length)
+
+
+def _infer_sequences(predictor: Predictor, sequences: List[str], max_seq_length: int, 
+                     eval_batch_size: int, overlap: int = None, 
+                     output_format: str = 'text') -> List[str]:
+    """
+    对_preprocess_content切分出的序列分词
+    
+    Args:
+        predictor: 预测器
+        sequences: 序列
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        overlap: 超长行滑动窗口的重叠字符数
+        output_format: compact时返回 (原文, 词结束字符偏移)，不拼接为字符串
+        
+    Returns:
+        List[str]: 每个序列的分词结果
+    """
+    if output_format == 'compact':
+        return predictor.segment_offsets(sequences, max_seq_length, eval_batch_size, overlap)
+    if overlap is not None:
+        return predictor.process_lines(sequences, max_seq_length, eval_batch_size, overlap)
+    return predictor.process_text_batch(sequences, max_seq_length, eval_batch_size)
+
+
+def _write_results(resultpath: str, filename: str, segmented_results: Iterable[str], 
+                   output_format: str = 'text', metrics: PipelineMetrics = None) -> bool:
+    """
+    写入一个文件的分词结果
+    
+    Args:
+        resultpath: 分词结果的存储路径
+        filename: 文件名
+        segmented_results: 每个序列的分词结果，可以是流式处理的生成器；
+            compact时为 (原文, 词结束字符偏移)
+        output_format: text写入以/分隔的文本，compact写入原文和同名的.seg边界文件
+        metrics: 计时器，可以为None
+        
+    Returns:
+        bool: 是否写入了结果，没有任何结果时返回False
+    """
+    if output_format == 'compact':
+        with measure(metrics, 'write'):
+            return write_segmented(resultpath, filename, segmented_results) > 0
+    
+    if isinstance(segmented_results, list):
+        with measure(metrics, 'postprocess', len(segmented_results)):
+            final_result = postprocess_text(segmented_results)
+        with measure(metrics, 'write', 1):
+            write_files(resultpath, filename, final_result)
+        return True
+    
+    # 编码错误在读到文件中途才会出现，write_lines会丢弃已写入的临时文件
+    with measure(metrics, 'write'):
+        return write_lines(resultpath, filename, segmented_results) > 0
+
+
+def _iter_sequential(predictor: Predictor, raw_path: str, file_paths: List[str], resultpath: str, 
+                     max_seq_length: int, eval_batch_size: int, streaming: bool = False, 
+                     overlap: int = None, prefetch: bool = False, mmap_input: bool = False, 
+                     output_format: str = 'text') -> Iterator[Tuple[str, Optional[bool], Optional[Exception]]]:
+    """
+    逐个文件读取、分词并写入
+    
+    Args:
+        predictor: 预测器
+        raw_path: 待分词语料的文件夹路径
+        file_paths: 输入文件路径
+        resultpath: 分词结果的存储路径，按输入的目录结构写入
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        streaming: 是否逐行流式处理
+        overlap: 超长行滑动窗口的重叠字符数
+        prefetch: 流式处理时是否在后台线程中提前读取和预处理
+        mmap_input: 流式处理时是否以内存映射方式读取
+        output_format: 输出格式，text或compact
+        
+    Yields:
+        Tuple[str, Optional[bool], Optional[Exception]]: (文件路径, 是否写入了结果, 异常)
+    """
+    for file_path in file_paths:
+        print(f"正在处理文件: {os.path.relpath(file_path, raw_path)}")
+        try:
+            written = _segment_file_path(predictor, file_path, 
+                                         result_dir_for(raw_path, file_path, resultpath), 
+                                         max_seq_length, eval_batch_size, streaming, overlap, 
+                                         prefetch, mmap_input, output_format)
+        except Exception as e:
+            yield file_path, None, e
+            continue
+        yield file_path, written, None
+
+
+def _iter_pipelined(predictor: Predictor, raw_path: str, file_paths: List[str], resultpath: str, 
+                    max_seq_length: int, eval_batch_size: int, overlap: int = None, 
+                    output_format: str = 'text') -> Iterator[Tuple[str, Optional[bool], Optional[Exception]]]:
+    """
+    流水线处理：读取线程提前读取并预处理后续文件，写入线程后处理并写入已完成的文件，
+    本线程只做推理
+    
+    Args:
+        predictor: 预测器
+        raw_path: 待分词语料的文件夹路径
+        file_paths: 输入文件路径
+        resultpath: 分词结果的存储路径，按输入的目录结构写入
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        overlap: 超长行滑动窗口的重叠字符数
+        output_format: 输出格式，text或compact
+        
+    Yields:
+        Tuple[str, Optional[bool], Optional[Exception]]: (文件路径, 是否写入了结果, 异常)，按完成顺序产生
+    """
+    metrics = predictor.metrics
+    
+    def load(file_path: str) -> List[str]:
+        with measure(metrics, 'read', 1):
+            content = read_file(file_path)
+        return _preprocess_content(content, max_seq_length, overlap, metrics)
     
+    def process(file_path: str, sequences: List[str]) -> Optional[List[str]]:
+        print(f"正在处理文件: {os.path.relpath(file_path, raw_path)}")
+        if not sequences:
+            return None
+        return _infer_sequences(predictor, sequences, max_seq_length, eval_batch_size, overlap, 
+                                output_format)
+    
+    def store(file_path: str, segmented_results: Optional[List[str]]) -> bool:
+        if segmented_results is None:
+            return False
+        return _write_results(result_dir_for(raw_path, file_path, resultpath), os.path.basename(file_path), 
+                              segmented_results, output_format, metrics)
+    
+    executor = PipelineExecutor(load, process, store)
+    for file_path, written, error in executor.run(file_paths):
+        yield file_path, written, error
+
+
+def _segment_file_path(predictor: Predictor, file_path: str, resultpath: str, 
+                       max_seq_length: int, eval_batch_size: int, 
+                       streaming: bool = False, overlap: int = None, 
+                       prefetch: bool = False, mmap_input: bool = False, 
+                       output_format: str = 'text') -> bool:
+    """
+    读取、分词并写入单个文件
+    
+    Args:
+        predictor: 预测器
+        file_path: 输入文件路径
+        resultpath: 分词结果的存储路径
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        streaming: 是否逐行流式处理
+        overlap: 超长行滑动窗口的重叠字符数，None表示按最大序列长度直接切分
+        prefetch: 流式处理时是否在后台线程中提前读取和预处理，与推理重叠
+        mmap_input: 流式处理时是否以内存映射方式读取，读取和切分合并计入读取阶段
+        output_format: 输出格式，text或compact
+        
+    Returns:
+        bool: 是否写入了结果，文件为空时返回False
+    """
+    filename = os.path.basename(file_path)
+    metrics = predictor.metrics
+    
+    if not streaming:
+        with measure(metrics, 'read', 1):
+            content = read_file(file_path)
+        
+        sequences = _preprocess_content(content, max_seq_length, overlap, metrics)
+        if not sequences:
+            return False
+        
+        segmented_results = _infer_sequences(predictor, sequences, max_seq_length, eval_batch_size, 
+                                             overlap, output_format)
+        return _write_results(resultpath, filename, segmented_results, output_format, metrics)
+    
+    # 读取 -> 预处理 -> 分批预测 -> 写入，全程为生成器；各阶段按独占时间计时
+    if mmap_input:
+        # 读取和切分在同一个生成器中完成，合并计入读取阶段
+        located = iter_mmap_sequences(file_path, None if overlap is not None else max_seq_length)
+        sequences = (sequence for _, sequence in measure_iter(metrics, 'read', located))
+    else:
+        lines = measure_iter(metrics, 'read', iter_file_lines(file_path))
+        sequences = measure_iter(metrics, 'preprocess', 
+                                 iter_sequences(lines, None if overlap is not None else max_seq_length))
+    if prefetch:
+        sequences = prefetch_iter(sequences, _STREAM_PREFETCH)
+    results = predictor.process_text_stream(sequences, max_seq_length, eval_batch_size, overlap=overlap, 
+                                            with_offsets=output_format == 'compact')
+    
+    return _write_results(resultpath, filename, results, output_format, metrics)
+
+
+def _init_worker(threads_per_worker: int, quantize: bool = False, cache_path: str = None, 
+                 pack_sequences: bool = False, torchscript: bool = False, 
+                 backend: str = 'torch', mmap_weights: bool = False, 
+                 collect_metrics: bool = False) -> None:
+    """
+    工作进程初始化：限制线程数并加载一次模型
+    
+    Args:
+        threads_per_worker: 本进程的torch线程数
+        quantize: 是否使用动态int8量化模型
+        cache_path: 分词结果缓存文件路径，各进程共享同一个缓存文件
+        pack_sequences: 是否拼接短序列推理
+        torchscript: 是否加载TorchScript模型
+        backend: 推理后端
+        mmap_weights: 是否以内存映射方式加载平铺权重
+        collect_metrics: 是否对每个文件计时，统计随任务结果返回主进程
+    """
+    global _worker_predictor, _worker_error
+    
+    try:
+        tokenizer = SikuTokenizer()
+        model_loader = ModelLoader(device=torch.device("cpu"), num_threads=threads_per_worker, 
+                                   quantize=quantize, torchscript=torchscript, backend=backend, 
+                                   mmap_weights=mmap_weights)
+        cache = SegmentationCache(cache_path) if cache_path else None
+        metrics = PipelineMetrics() if collect_metrics else None
+        _worker_predictor = Predictor(model_loader, tokenizer, cache, pack_sequences=pack_sequences, 
+                                      metrics=metrics)
+        _worker_predictor.load_model()
+    except Exception as e:
+        # 初始化失败时不抛出，否则进程池会不断重建工作进程
+        _worker_error = str(e)
+
+
+def _segment_file(task: Tuple[str, str, int, int, bool, Optional[int], bool, str]
+                  ) -> Tuple[str, str, str, Optional[dict]]:
+    """
+    工作进程任务：读取、分词并写入单个文件
+    
+    Args:
+        task: (文件路径, 结果路径, 最大序列长度, 批处理大小, 是否流式处理, 窗口重叠字符数, 
+            是否以内存映射方式读取, 输出格式)
+        
+    Returns:
+        Tuple[str, str, str, Optional[dict]]: (文件路径, 状态, 信息, 本文件的计时快照)，
+            状态为done/empty/failed/error，failed时信息为 (异常类型, 异常信息)，
+            error表示工作进程不可用；未计时时快照为None
+    """
+    file_path, resultpath, max_seq_length, eval_batch_size, streaming, overlap, mmap_input, output_format = task
+    filename = os.path.basename(file_path)
+    
+    if _worker_predictor is None:
+        return file_path, 'error', f"工作进程初始化失败: {_worker_error}", None
+    
+    metrics = _worker_predictor.metrics
+    if metrics is not None:
+        # 每个文件单独计时，由主进程汇总
+        metrics.reset()
+    
+    try:
+        written = _segment_file_path(_worker_predictor, file_path, resultpath, 
+                                     max_seq_length, eval_batch_size, streaming, overlap, 
+                                     mmap_input=mmap_input, output_format=output_format)
+        
+        if not written:
+            status, message = 'empty', f"文件 {filename} 为空，跳过处理"
+        else:
+            status, message = 'done', f"文件 {filename} 处理完成"
+            if metrics is not None:
+                metrics.increment('files')
+                metrics.increment('bytes', os.path.getsize(file_path))
+    except Exception as e:
+        # 异常对象不一定能跨进程传递，只返回类型和信息
+        status, message = 'failed', (type(e).__name__, str(e))
+    
+    return file_path, status, message, metrics.snapshot() if metrics is not None else None
+
+
+def _TCfenci_all_parallel(raw_path: str, file_paths: List[str], resultpath: str, max_seq_length: int, 
+                          eval_batch_size: int, num_workers: int, 
+                          threads_per_worker: int, quantize: bool = False, 
+                          streaming: bool = False, cache_path: str = None, 
+                          overlap: int = None, pack_sequences: bool = False, 
+                          torchscript: bool = False, backend: str = 'torch', 
+                          mmap_weights: bool = False, metrics: PipelineMetrics = None, 
+                          resume: bool = False, mmap_input: bool = False, 
+                          output_format: str = 'text', 
+                          shard: Tuple[int, int] = None) -> None:
+    """
+    多进程分词：每个工作进程加载一次模型，文件通过进程池任务队列分发，
+    每个文件完成后立即写入结果
+    
+    Args:
+        raw_path: 待分词语料的文件夹路径
+        file_paths: 待处理的输入文件路径
+        resultpath: 分词结果的存储路径，按输入的目录结构写入
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        num_workers: 工作进程数
+        threads_per_worker: 每个工作进程的torch线程数
+        quantize: 是否使用动态int8量化模型
+        streaming: 是否逐行流式处理
+        cache_path: 分词结果缓存文件路径
+        overlap: 超长行滑动窗口的重叠字符数
+        pack_sequences: 是否拼接短序列推理
+        torchscript: 是否加载TorchScript模型
+        backend: 推理后端
+        mmap_weights: 是否以内存映射方式加载平铺权重
+        metrics: 计时器，汇总各工作进程每个文件的统计
+        resume: 是否断点续跑，清单只由主进程读写
+        mmap_input: 流式处理时是否以内存映射方式读取
+        output_format: 输出格式，text或compact
+        shard: (分片序号, 分片数)，决定清单和隔离清单的文件名
+    """
+    # 在主进程中检查加载设置，工作进程初始化失败时进程池会不断重启工作进程
+    model_loader = ModelLoader(quantize=quantize, torchscript=torchscript, backend=backend, 
+                               mmap_weights=mmap_weights)
+    
+    manifest = None
+    skipped_files = 0
+    if resume:
+        manifest = RunManifest(resultpath, _run_settings(model_loader, max_seq_length, overlap, 
+                                                         pack_sequences, output_format), shard)
+        pending = [file_path for file_path in file_paths 
+                   if not manifest.is_done(os.path.relpath(file_path, raw_path), file_path, 
+                                           os.path.join(result_dir_for(raw_path, file_path, resultpath), 
+                                                        os.path.basename(file_path)))]
+        skipped_files = len(file_paths) - len(pending)
+        file_paths = pending
+    
+    tasks = [(file_path, result_dir_for(raw_path, file_path, resultpath), max_seq_length, 
+              eval_batch_size, streaming, overlap, mmap_input, output_format) 
+             for file_path in file_paths]
+    
+    print(f"启动 {num_workers} 个工作进程，每个进程 {threads_per_worker} 个线程...")
+    processed_files = 0
+    report = RunReport(os.path.join(resultpath, quarantine_name(shard)))
+    
+    with multiprocessing.Pool(processes=num_workers, initializer=_init_worker, 
+                              initargs=(threads_per_worker, quantize, cache_path, pack_sequences, 
+                                        torchscript, backend, mmap_weights, 
+                                        metrics is not None)) as pool:
+        for file_path, status, message, snapshot in tqdm(pool.imap_unordered(_segment_file, tasks), 
+                                                         total=len(tasks), desc="文件处理"):
+            if snapshot is not None:
+                metrics.merge(snapshot)
+            
+            if status == 'error':
+                print(message)
+                report.print_summary()
+                return
+            
+            if status == 'failed':
+                error_type, error_message = message
+                if error_type == 'UnicodeDecodeError':
+                    print(f"警告: 文件 {file_path} 编码不是UTF-8，跳过处理")
+                else:
+                    print(f"处理文件 {os.path.relpath(file_path, raw_path)} 时发生错误: {error_message}")
+                report.fail(file_path, error_message, error_type)
+                continue
+            
+            if manifest is not None and status in ('done', 'empty'):
+                manifest.mark_done(os.path.relpath(file_path, raw_path), file_path, status)
+            
+            if status == 'done':
+                processed_files += 1
+            else:
+                print(message)
+    
+    report.print_summary()
+    
+    if skipped_files:
+        print(f"跳过上次已完成的 {skipped_files} 个文件")
     print(f"分词完成！共处理了 {processed_files} 个文件")
     print(f"结果已保存到: {resultpath}")
 
@@ -109,16 +655,28 @@ def main():
     """
     主函数，用于命令行调用
     """
-    if len(sys.argv) < 3:
-        print("使用方法: python wordsegall_txt.py <输入路径> <输出路径> [最大序列长度] [批处理大小]")
-        sys.exit(1)
-    
-    raw_path = sys.argv[1]
-    resultpath = sys.argv[2]
-    max_seq_length = int(sys.argv[3]) if len(sys.argv) > 3 else 128
-    eval_batch_size = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+    parser = argparse.ArgumentParser(description="sikufenci繁体中文批量分词")
+    parser.add_argument('raw_path', help="待分词语料的文件夹路径")
+    parser.add_argument('resultpath', help="分词结果的存储路径")
+    parser.add_argument('max_seq_length', type=int, nargs='?', default=128, help="最大序列长度")
+    parser.add_argument('eval_batch_size', type=int, nargs='?', default=3, help="批处理大小")
+    parser.add_argument('num_workers', type=int, nargs='?', default=1, help="工作进程数")
+    parser.add_argument('threads_per_worker', type=int, nargs='?', default=None, help="每个工作进程的线程数")
+    parser.add_argument('--recursive', action='store_true', help="递归处理子文件夹，结果保持相同的目录结构")
+    parser.add_argument('--include', action='append', default=None, 
+                        help="文件匹配模式，按相对路径匹配，可重复指定，默认为*.txt")
+    parser.add_argument('--exclude', action='append', default=None, 
+                        help="排除模式，匹配的文件或子文件夹不处理，可重复指定")
+    parser.add_argument('--shard', default=None, help="只处理第i片，格式为i/N（i从0开始）")
+    parser.add_argument('--resume', action='store_true', help="跳过上次已完成且未修改的文件")
+    parser.add_argument('--output-format', choices=['text', 'compact'], default='text', 
+                        help="输出格式：以/分隔的文本，或原文加.seg边界文件")
+    args = parser.parse_args()
     
-    TCfenci_all(raw_path, resultpath, max_seq_length, eval_batch_size)
+    TCfenci_all(args.raw_path, args.resultpath, args.max_seq_length, args.eval_batch_size, 
+                args.num_workers, args.threads_per_worker, resume=args.resume, 
+                recursive=args.recursive, include=args.include, exclude=args.exclude, shard=args.shard, 
+                output_format=args.output_format)
 
 
 if __name__ == "__main__":
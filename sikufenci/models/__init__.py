@@ -2,5 +2,10 @@ from .simple_tokenizer import SimpleTokenizer
 from .tokenizer import SikuTokenizer
 from .model_loader import ModelLoader
 from .predictor import Predictor
+from .quantization import quantize_model, compare_segmentations, check_quantized_accuracy
+from .result_cache import SegmentationCache
 
-__all__ = ['SimpleTokenizer', 'SikuTokenizer', 'ModelLoader', 'Predictor']
\ No newline at end of file
+__all__ = [
+    'SimpleTokenizer', 'SikuTokenizer', 'ModelLoader', 'Predictor', 'SegmentationCache',
+    'quantize_model', 'compare_segmentations', 'check_quantized_accuracy'
+]
\ No newline at end of file
@@ -0,0 +1,433 @@
+import os
+import re
+import glob
+import torch
+import numpy as np
+import torch.nn.functional as F
+from typing import Dict, List, Sequence
+from pytorch_pretrained_bert.modeling import WEIGHTS_NAME
+
+try:
+    from ..utils.file_utils import replace_file
+except ImportError:
+    # 通过core模块的sys.path方式导入时models是顶层包
+    from utils.file_utils import replace_file
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+# TorchScript模型文件名，每个序列长度一个文件，与pytorch_model.bin放在同一目录
+TORCHSCRIPT_NAME = 'pytorch_model.L{length}.pt'
+QUANTIZED_TORCHSCRIPT_NAME = 'pytorch_model.int8.L{length}.pt'
+
+# ONNX模型文件名，批大小和序列长度均为动态维度
+ONNX_NAME = 'pytorch_model.onnx'
+
+
+class _LogitsWrapper(torch.nn.Module):
+    """
+    将模型包装为 (input_ids, attention_mask) -> logits 的固定签名，便于trace
+    """
+    
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+    
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        outputs = self.model(input_ids, attention_mask=attention_mask)
+        # pytorch_pretrained_bert直接返回logits，其他实现可能返回tuple
+        return outputs[0] if isinstance(outputs, (tuple, list)) else outputs
+
+
+class TorchScriptModel(torch.nn.Module):
+    """
+    按序列长度分桶的TorchScript模型
+    
+    每个桶是在固定序列长度下trace得到的模型，输入填充到不小于本批长度的最短桶，
+    输出再截回原长度，调用方式与BertForTokenClassification相同。
+    """
+    
+    def __init__(self, buckets: Dict[int, torch.nn.Module]):
+        """
+        初始化分桶模型
+        
+        Args:
+            buckets: 序列长度到TorchScript模型的映射
+        """
+        super().__init__()
+        self.lengths = sorted(buckets)
+        self.buckets = torch.nn.ModuleDict({str(length): module for length, module in buckets.items()})
+    
+    def forward(self, input_ids: torch.Tensor, token_type_ids: torch.Tensor = None, 
+                attention_mask: torch.Tensor = None) -> torch.Tensor:
+        length = input_ids.size(1)
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        
+        bucket = next((bucket for bucket in self.lengths if bucket >= length), None)
+        if bucket is None:
+            raise ValueError(f"序列长度 {length} 超过已导出的最大长度 {self.lengths[-1]}")
+        
+        if bucket > length:
+            # 填充位置的attention_mask为0，不影响有效位置的输出
+            input_ids = F.pad(input_ids, (0, bucket - length))
+            attention_mask = F.pad(attention_mask, (0, bucket - length))
+        
+        logits = self.buckets[str(bucket)](input_ids, attention_mask)
+        
+        return logits[:, :length]
+
+
+class OnnxRuntimeModel:
+    """
+    ONNX Runtime CPU推理后端，直接接收和返回NumPy矩阵
+    """
+    
+    def __init__(self, onnx_file: str, num_threads: int = None):
+        """
+        创建推理会话，开启全部图优化
+        
+        Args:
+            onnx_file: ONNX模型文件路径
+            num_threads: 算子内线程数，None表示由onnxruntime决定
+        """
+        if onnxruntime is None:
+            raise ImportError("使用onnxruntime后端需要先安装: pip install onnxruntime")
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        
+        self.onnx_file = onnx_file
+        self.session = onnxruntime.InferenceSession(onnx_file, options, 
+                                                    providers=['CPUExecutionProvider'])
+    
+    def __call__(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        前向计算
+        
+        Args:
+            input_ids: [B, L] 的输入ID
+            attention_mask: [B, L] 的注意力掩码
+            
+        Returns:
+            np.ndarray: [B, L, num_labels] 的logits
+        """
+        return self.session.run(['logits'], {
+            'input_ids': input_ids.astype(np.int64, copy=False),
+            'attention_mask': attention_mask.astype(np.int64, copy=False)
+        })[0]
+    
+    def predict_labels(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """
+        前向计算并取得每个位置的标签
+        
+        Args:
+            input_ids: [B, L] 的输入ID
+            attention_mask: [B, L] 的注意力掩码
+            
+        Returns:
+            np.ndarray: [B, L] 的预测标签
+        """
+        return self(input_ids, attention_mask).argmax(axis=-1)
+
+
+def torchscript_file(model_dir: str, length: int, quantize: bool = False) -> str:
+    """
+    获取指定序列长度的TorchScript模型文件路径
+    
+    Args:
+        model_dir: 模型目录
+        length: 序列长度
+        quantize: 是否为int8量化模型
+        
+    Returns:
+        str: 文件路径
+    """
+    name = QUANTIZED_TORCHSCRIPT_NAME if quantize else TORCHSCRIPT_NAME
+    return os.path.join(model_dir, name.format(length=length))
+
+
+def _example_inputs(model: torch.nn.Module, batch_size: int, length: int, 
+                    seed: int = 0) -> List[torch.Tensor]:
+    """
+    生成随机的输入ID和长短不一的attention_mask
+    
+    Args:
+        model: BertForTokenClassification模型
+        batch_size: 批大小
+        length: 序列长度
+        seed: 随机种子
+        
+    Returns:
+        List[torch.Tensor]: [input_ids, attention_mask]
+    """
+    generator = torch.Generator().manual_seed(seed)
+    vocab_size = model.bert.embeddings.word_embeddings.num_embeddings
+    
+    input_ids = torch.randint(0, vocab_size, (batch_size, length), generator=generator)
+    lengths = torch.randint(1, length + 1, (batch_size,), generator=generator)
+    lengths[0] = length
+    attention_mask = (torch.arange(length).unsqueeze(0) < lengths.unsqueeze(1)).long()
+    
+    return [input_ids, attention_mask]
+
+
+def trace_model(model: torch.nn.Module, length: int, batch_size: int = 2) -> torch.jit.ScriptModule:
+    """
+    在固定序列长度下trace模型
+    
+    Args:
+        model: 评估模式的BertForTokenClassification模型（可以是量化模型）
+        length: 序列长度
+        batch_size: trace时使用的批大小，批大小在trace结果中不固定
+        
+    Returns:
+        torch.jit.ScriptModule: trace得到的模型
+    """
+    wrapper = _LogitsWrapper(model).eval()
+    
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, _example_inputs(model, batch_size, length), check_trace=False)
+    
+    try:
+        # 冻结后参数成为常量，减少推理时的属性查找
+        return torch.jit.freeze(traced)
+    except RuntimeError:
+        return traced
+
+
+def validate_traced_model(model: torch.nn.Module, traced: torch.nn.Module, length: int, 
+                          batch_sizes: Sequence[int] = (1, 3, 8)) -> Dict:
+    """
+    在随机输入上比较trace模型与eager模型的输出
+    
+    Args:
+        model: eager模型
+        traced: trace得到的模型
+        length: 序列长度
+        batch_sizes: 检查的批大小
+        
+    Returns:
+        Dict: 有效位置logits的最大绝对误差和预测标签一致率
+    """
+    wrapper = _LogitsWrapper(model).eval()
+    max_abs_diff = 0.0
+    matched = 0
+    total = 0
+    
+    with torch.no_grad():
+        for seed, batch_size in enumerate(batch_sizes):
+            input_ids, attention_mask = _example_inputs(model, batch_size, length, seed + 1)
+            expected = wrapper(input_ids, attention_mask)
+            actual = traced(input_ids, attention_mask)
+            
+            valid = attention_mask.bool()
+            max_abs_diff = max(max_abs_diff, (expected - actual).abs()[valid].max().item())
+            matched += (expected.argmax(-1) == actual.argmax(-1))[valid].sum().item()
+            total += valid.sum().item()
+    
+    return {
+        'max_abs_diff': max_abs_diff,
+        'label_agreement': matched / total if total else 1.0
+    }
+
+
+def export_torchscript(model_loader, lengths: Sequence[int] = (128,), output_dir: str = None, 
+                       atol: float = 1e-3) -> List[str]:
+    """
+    将模型trace为TorchScript并按序列长度分别保存，保存前与eager模型的输出比较
+    
+    Args:
+        model_loader: ModelLoader，按其quantize设置加载eager模型
+        lengths: 导出的序列长度，只给一个长度时为固定长度，多个长度时推理按长度分桶
+        output_dir: 输出目录，None表示模型目录
+        atol: logits允许的最大绝对误差
+        
+    Returns:
+        List[str]: 导出的文件路径
+    """
+    model = model_loader.load_model()
+    model.to(torch.device('cpu'))
+    output_dir = output_dir or model_loader.model_path
+    paths = []
+    
+    for length in sorted(set(lengths)):
+        traced = trace_model(model, length)
+        result = validate_traced_model(model, traced, length)
+        
+        print(f"序列长度 {length}: logits最大误差 {result['max_abs_diff']:.2e}，"
+              f"标签一致率 {result['label_agreement']:.2%}")
+        if result['max_abs_diff'] > atol or result['label_agreement'] < 1.0:
+            raise ValueError(f"序列长度 {length} 的TorchScript模型与eager模型输出不一致")
+        
+        path = torchscript_file(output_dir, length, model_loader.quantize)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        torch.jit.save(traced, tmp_file)
+        replace_file(tmp_file, path)
+        paths.append(path)
+    
+    model_loader.unload_model()
+    
+    return paths
+
+
+def _check_not_stale(path: str, model_dir: str) -> None:
+    """
+    比原始权重旧的导出文件视为失效
+    
+    Args:
+        path: 导出文件路径
+        model_dir: 模型目录
+    """
+    weights_file = os.path.join(model_dir, WEIGHTS_NAME)
+    if os.path.exists(weights_file) and os.path.getmtime(path) < os.path.getmtime(weights_file):
+        raise ValueError(f"导出的模型 {path} 早于 {WEIGHTS_NAME}，请重新导出")
+
+
+def validate_onnx_model(model: torch.nn.Module, onnx_model: OnnxRuntimeModel, 
+                        shapes: Sequence = ((1, 8), (3, 32), (8, 128))) -> Dict:
+    """
+    在不同批大小和序列长度的随机输入上比较ONNX模型与eager模型的输出
+    
+    Args:
+        model: eager模型
+        onnx_model: ONNX Runtime模型
+        shapes: 检查的 (批大小, 序列长度)
+        
+    Returns:
+        Dict: 有效位置logits的最大绝对误差和预测标签一致率
+    """
+    wrapper = _LogitsWrapper(model).eval()
+    max_abs_diff = 0.0
+    matched = 0
+    total = 0
+    
+    with torch.no_grad():
+        for seed, (batch_size, length) in enumerate(shapes):
+            input_ids, attention_mask = _example_inputs(model, batch_size, length, seed + 1)
+            expected = wrapper(input_ids, attention_mask).numpy()
+            actual = onnx_model(input_ids.numpy(), attention_mask.numpy())
+            
+            valid = attention_mask.numpy().astype(bool)
+            max_abs_diff = max(max_abs_diff, float(np.abs(expected - actual)[valid].max()))
+            matched += int((expected.argmax(-1) == actual.argmax(-1))[valid].sum())
+            total += int(valid.sum())
+    
+    return {
+        'max_abs_diff': max_abs_diff,
+        'label_agreement': matched / total if total else 1.0
+    }
+
+
+def export_onnx(model_loader, output_file: str = None, lengths: Sequence[int] = (8, 32, 128), 
+                opset_version: int = 14, atol: float = 1e-3) -> str:
+    """
+    将模型导出为批大小和序列长度均为动态维度的ONNX模型，保存前与eager模型的输出比较
+    
+    Args:
+        model_loader: ModelLoader，只支持未量化的fp32模型
+        output_file: 输出文件路径，None表示模型目录下的pytorch_model.onnx
+        lengths: 检验时使用的序列长度
+        opset_version: ONNX算子集版本
+        atol: logits允许的最大绝对误差
+        
+    Returns:
+        str: 导出的文件路径
+    """
+    if model_loader.quantize:
+        raise ValueError("动态int8量化模型不能导出为ONNX，请导出fp32模型")
+    
+    model = model_loader.load_model()
+    model.to(torch.device('cpu'))
+    wrapper = _LogitsWrapper(model).eval()
+    
+    output_file = output_file or os.path.join(model_loader.model_path, ONNX_NAME)
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} 
+                    for name in ('input_ids', 'attention_mask', 'logits')}
+    export_args = dict(input_names=['input_ids', 'attention_mask'], output_names=['logits'], 
+                       dynamic_axes=dynamic_axes, opset_version=opset_version)
+    
+    with torch.no_grad():
+        example = tuple(_example_inputs(model, 2, 16))
+        try:
+            # 新版torch默认使用dynamo导出，这里沿用基于trace的导出
+            torch.onnx.export(wrapper, example, tmp_file, dynamo=False, **export_args)
+        except TypeError:
+            torch.onnx.export(wrapper, example, tmp_file, **export_args)
+    
+    try:
+        shapes = [(batch_size, length) for length in sorted(set(lengths)) for batch_size in (1, 5)]
+        result = validate_onnx_model(model, OnnxRuntimeModel(tmp_file), shapes)
+        
+        print(f"ONNX模型: logits最大误差 {result['max_abs_diff']:.2e}，"
+              f"标签一致率 {result['label_agreement']:.2%}")
+        if result['max_abs_diff'] > atol or result['label_agreement'] < 1.0:
+            raise ValueError("ONNX模型与eager模型输出不一致")
+        
+        replace_file(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    
+    model_loader.unload_model()
+    
+    return output_file
+
+
+def load_onnx_model(model_dir: str, num_threads: int = None) -> OnnxRuntimeModel:
+    """
+    加载模型目录中导出的ONNX模型
+    
+    Args:
+        model_dir: 模型目录
+        num_threads: 算子内线程数
+        
+    Returns:
+        OnnxRuntimeModel: ONNX Runtime模型
+    """
+    onnx_file = os.path.join(model_dir, ONNX_NAME)
+    if not os.path.exists(onnx_file):
+        raise FileNotFoundError(f"模型目录中没有导出的ONNX模型: {onnx_file}")
+    
+    _check_not_stale(onnx_file, model_dir)
+    
+    return OnnxRuntimeModel(onnx_file, num_threads)
+
+
+def load_torchscript_model(model_dir: str, quantize: bool = False, 
+                           device: torch.device = None) -> TorchScriptModel:
+    """
+    加载目录中导出的全部序列长度的TorchScript模型
+    
+    Args:
+        model_dir: 模型目录
+        quantize: 是否加载int8量化模型
+        device: 设备
+        
+    Returns:
+        TorchScriptModel: 分桶模型
+    """
+    name = QUANTIZED_TORCHSCRIPT_NAME if quantize else TORCHSCRIPT_NAME
+    pattern = re.compile(re.escape(name).replace(re.escape('{length}'), r'(\d+)') + '$')
+    buckets = {}
+    
+    for path in glob.glob(os.path.join(model_dir, name.format(length='*'))):
+        match = pattern.match(os.path.basename(path))
+        if not match:
+            continue
+        
+        _check_not_stale(path, model_dir)
+        
+        buckets[int(match.group(1))] = torch.jit.load(path, map_location=device)
+    
+    if not buckets:
+        raise FileNotFoundError(f"模型目录中没有导出的TorchScript模型: {model_dir}")
+    
+    return TorchScriptModel(buckets)
@@ -0,0 +1,139 @@
+import os
+import json
+import struct
+import numpy as np
+import torch
+from typing import Dict
+
+try:
+    from ..utils.file_utils import replace_file
+except ImportError:
+    # 通过core模块的sys.path方式导入时models是顶层包
+    from utils.file_utils import replace_file
+
+
+# 平铺权重文件名，与pytorch_model.bin放在同一目录
+FLAT_WEIGHTS_NAME = 'pytorch_model.flat'
+
+# 文件格式：8字节小端头部长度 + JSON头部 + 按_ALIGNMENT对齐的原始tensor数据
+_MAGIC = b'SKFLAT01'
+_ALIGNMENT = 64
+
+_DTYPES = {
+    torch.float32: 'float32',
+    torch.float16: 'float16',
+    torch.float64: 'float64',
+    torch.int64: 'int64',
+    torch.int32: 'int32',
+    torch.uint8: 'uint8',
+    torch.int8: 'int8',
+}
+
+
+def save_flat_state_dict(state_dict: Dict[str, torch.Tensor], path: str) -> None:
+    """
+    将state dict保存为平铺的tensor文件，先写临时文件再重命名
+    
+    Args:
+        state_dict: 模型参数
+        path: 输出文件路径
+    """
+    header = {}
+    offset = 0
+    
+    for name, tensor in state_dict.items():
+        if tensor.dtype not in _DTYPES:
+            raise ValueError(f"不支持的参数类型: {name} {tensor.dtype}")
+        
+        offset = (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            'dtype': _DTYPES[tensor.dtype],
+            'shape': list(tensor.shape),
+            'offset': offset
+        }
+        offset += nbytes
+    
+    header_bytes = json.dumps(header).encode('utf-8')
+    # 数据区的起始位置同样对齐
+    prefix_length = len(_MAGIC) + 8 + len(header_bytes)
+    data_start = (prefix_length + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+    
+    # 多个工作进程可能同时转换，临时文件名带上进程号
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (data_start - prefix_length))
+        
+        for name, tensor in state_dict.items():
+            f.seek(data_start + header[name]['offset'])
+            f.write(tensor.detach().cpu().contiguous().numpy().tobytes())
+    
+    replace_file(tmp_file, path)
+
+
+def load_flat_state_dict(path: str) -> Dict[str, torch.Tensor]:
+    """
+    以内存映射的方式加载平铺的tensor文件，不复制数据
+    
+    映射为写时复制，推理过程中不会修改参数，多个进程共享同一份页缓存。
+    
+    Args:
+        path: 平铺权重文件路径
+        
+    Returns:
+        Dict[str, torch.Tensor]: 指向映射内存的参数
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"不是平铺权重文件: {path}")
+        header_length = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    
+    prefix_length = len(_MAGIC) + 8 + header_length
+    data_start = (prefix_length + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+    
+    data = np.memmap(path, dtype=np.uint8, mode='c')
+    state_dict = {}
+    
+    for name, info in header.items():
+        dtype = np.dtype(info['dtype'])
+        count = int(np.prod(info['shape'], dtype=np.int64))
+        start = data_start + info['offset']
+        array = data[start:start + count * dtype.itemsize].view(dtype).reshape(info['shape'])
+        state_dict[name] = torch.from_numpy(array)
+    
+    return state_dict
+
+
+def build_model_from_state_dict(model_class, config, state_dict: Dict[str, torch.Tensor], 
+                                **kwargs) -> torch.nn.Module:
+    """
+    构建模型并直接使用给定的参数tensor，不随机初始化也不复制权重
+    
+    Args:
+        model_class: 模型类，例如BertForTokenClassification
+        config: 模型配置
+        state_dict: 参数
+        **kwargs: 传给模型构造函数的其他参数
+        
+    Returns:
+        torch.nn.Module: 参数指向state_dict中tensor的模型
+    """
+    try:
+        # 在meta设备上构建只生成参数形状，随后直接替换为映射的tensor
+        with torch.device('meta'):
+            model = model_class(config, **kwargs)
+        model.load_state_dict(state_dict, assign=True)
+    except (AttributeError, TypeError):
+        # 旧版torch不支持meta设备构建或assign参数，逐个替换参数数据
+        model = model_class(config, **kwargs)
+        missing = [name for name, _ in model.named_parameters() if name not in state_dict]
+        if missing:
+            raise KeyError(f"平铺权重文件缺少参数: {missing[:5]}")
+        for name, param in model.named_parameters():
+            param.data = state_dict[name]
+    
+    return model
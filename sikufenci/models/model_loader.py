@@ -1,7 +1,25 @@
 import os
 import torch
 from typing import Optional
-from pytorch_pretrained_bert import BertForTokenClassification
+from pytorch_pretrained_bert import BertForTokenClassification, BertConfig
+from pytorch_pretrained_bert.modeling import CONFIG_NAME, WEIGHTS_NAME
+from .quantization import (
+    QUANTIZED_WEIGHTS_NAME, quantize_model, save_quantized_state_dict, load_quantized_state_dict
+)
+from .export import load_torchscript_model, load_onnx_model
+from .mmap_weights import (
+    FLAT_WEIGHTS_NAME, save_flat_state_dict, load_flat_state_dict, build_model_from_state_dict
+)
+
+
+# 可选的推理后端
+BACKENDS = ('torch', 'onnxruntime')
+
+try:
+    from ..utils.device_utils import configure_threads
+except ImportError:
+    # 通过core模块的sys.path方式导入时models是顶层包
+    from utils.device_utils import configure_threads
 
 
 class ModelLoader:
@@ -9,14 +27,34 @@ class ModelLoader:
     模型加载器
     """
     
-    def __init__(self, model_path: str = None, device: torch.device = None):
+    def __init__(self, model_path: str = None, device: torch.device = None, 
+                 num_threads: int = None, quantize: bool = False, 
+                 cache_quantized: bool = True, torchscript: bool = False, 
+                 backend: str = 'torch', mmap_weights: bool = False):
         """
         初始化模型加载器
         
         Args:
             model_path: 模型文件路径
             device: 设备
+            num_threads: torch线程数，None表示使用可用核心的线程预算
+            quantize: 是否对Linear层做动态int8量化（仅CPU）
+            cache_quantized: 是否在模型目录中缓存量化后的权重
+            torchscript: 是否直接加载export_model导出的TorchScript模型
+            backend: 推理后端，torch或onnxruntime（加载export_model导出的ONNX模型，仅CPU）
+            mmap_weights: 是否以内存映射方式加载平铺权重文件，首次使用时由pytorch_model.bin转换；
+                启动时不读取整个权重文件，同一主机上的多个进程共享权重内存
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}，可选: {', '.join(BACKENDS)}")
+        
+        if backend == 'onnxruntime':
+            # onnxruntime后端直接加载导出的ONNX模型，这些加载方式都不起作用
+            ignored = [name for name, enabled in (('quantize', quantize), ('torchscript', torchscript), 
+                                                  ('mmap_weights', mmap_weights)) if enabled]
+            if ignored:
+                raise ValueError(f"onnxruntime后端不支持: {', '.join(ignored)}")
+        
         if model_path is None:
             # 使用默认的模型目录
             current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -28,6 +66,12 @@ class ModelLoader:
         
         self.model_path = model_path
         self.device = device or torch.device('cpu')
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.cache_quantized = cache_quantized
+        self.torchscript = torchscript
+        self.backend = backend
+        self.mmap_weights = mmap_weights
         self.model = None
     
     def load_model(self, num_labels: int = 9) -> BertForTokenClassification:
@@ -43,11 +87,32 @@ class ModelLoader:
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"模型目录不存在: {self.model_path}")
         
-        # 加载模型
-        self.model = BertForTokenClassification.from_pretrained(
-            self.model_path,
-            num_labels=num_labels
-        )
+        # 在第一次前向计算之前配置线程数
+        self.num_threads = configure_threads(self.num_threads)
+        
+        if self.backend == 'onnxruntime':
+            # onnxruntime后端只使用CPU，接收NumPy矩阵
+            self.device = torch.device('cpu')
+            self.model = load_onnx_model(self.model_path, self.num_threads)
+            return self.model
+        
+        if self.quantize:
+            # 量化模型只能在CPU上运行
+            self.device = torch.device('cpu')
+        
+        if self.torchscript:
+            # 不构建Python模型，直接加载trace后的模型
+            self.model = load_torchscript_model(self.model_path, self.quantize, self.device)
+        elif self.quantize:
+            self.model = self._load_quantized_model(num_labels)
+        elif self.mmap_weights:
+            self.model = self._load_mmap_model(num_labels)
+        else:
+            # 加载模型
+            self.model = BertForTokenClassification.from_pretrained(
+                self.model_path,
+                num_labels=num_labels
+            )
         
         # 移动到指定设备
         self.model.to(self.device)
@@ -57,6 +122,105 @@ class ModelLoader:
         
         return self.model
     
+    def _load_quantized_model(self, num_labels: int) -> torch.nn.Module:
+        """
+        加载动态int8量化模型，有可用缓存时直接加载缓存而不重新量化
+        
+        Args:
+            num_labels: 标签数量
+            
+        Returns:
+            torch.nn.Module: 量化后的模型
+        """
+        cache_file = os.path.join(self.model_path, QUANTIZED_WEIGHTS_NAME)
+        weights_file = os.path.join(self.model_path, WEIGHTS_NAME)
+        
+        # 缓存比原始权重旧时视为失效
+        cache_valid = (
+            os.path.exists(cache_file) and 
+            (not os.path.exists(weights_file) or 
+             os.path.getmtime(cache_file) >= os.path.getmtime(weights_file))
+        )
+        
+        if cache_valid:
+            # 只构建模型结构，跳过读取fp32权重
+            config = BertConfig.from_json_file(os.path.join(self.model_path, CONFIG_NAME))
+            model = quantize_model(BertForTokenClassification(config, num_labels=num_labels))
+            return load_quantized_state_dict(model, cache_file)
+        
+        model = quantize_model(BertForTokenClassification.from_pretrained(
+            self.model_path,
+            num_labels=num_labels
+        ))
+        
+        if self.cache_quantized:
+            try:
+                save_quantized_state_dict(model, cache_file)
+            except OSError as e:
+                print(f"警告: 无法缓存量化权重到 {cache_file}: {e}")
+        
+        return model
+    
+    def _load_mmap_model(self, num_labels: int) -> torch.nn.Module:
+        """
+        以内存映射方式加载平铺权重，平铺文件不存在或比原始权重旧时先转换
+        
+        Args:
+            num_labels: 标签数量
+            
+        Returns:
+            torch.nn.Module: 参数指向映射内存的模型
+        """
+        flat_file = os.path.join(self.model_path, FLAT_WEIGHTS_NAME)
+        weights_file = os.path.join(self.model_path, WEIGHTS_NAME)
+        
+        flat_valid = (
+            os.path.exists(flat_file) and 
+            (not os.path.exists(weights_file) or 
+             os.path.getmtime(flat_file) >= os.path.getmtime(weights_file))
+        )
+        
+        if not flat_valid:
+            model = BertForTokenClassification.from_pretrained(
+                self.model_path,
+                num_labels=num_labels
+            )
+            try:
+                save_flat_state_dict(model.state_dict(), flat_file)
+            except OSError as e:
+                print(f"警告: 无法写入平铺权重 {flat_file}: {e}")
+                return model
+            del model
+        
+        config = BertConfig.from_json_file(os.path.join(self.model_path, CONFIG_NAME))
+        return build_model_from_state_dict(
+            BertForTokenClassification, config, load_flat_state_dict(flat_file), 
+            num_labels=num_labels
+        )
+    
+    def get_model_identity(self) -> str:
+        """
+        获取模型标识，用于区分不同模型权重和加载方式产生的结果
+        
+        Returns:
+            str: 由权重文件路径、大小、修改时间、量化设置、模型格式和推理后端组成的标识
+        """
+        weights_file = os.path.abspath(os.path.join(self.model_path, WEIGHTS_NAME))
+        
+        try:
+            stat = os.stat(weights_file)
+            weights_info = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            weights_info = "missing"
+        
+        identity = f"{weights_file}|{weights_info}|int8={self.quantize}"
+        if self.torchscript:
+            identity += "|torchscript"
+        if self.backend != 'torch':
+            identity += f"|{self.backend}"
+        
+        return identity
+    
     def get_model(self) -> Optional[BertForTokenClassification]:
         """
         获取已加载的模型
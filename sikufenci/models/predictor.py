@@ -1,9 +1,41 @@
 import torch
 import numpy as np
-from typing import List, Tuple
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Iterable, Generator
 from tqdm import tqdm
 from .tokenizer import SikuTokenizer
 from .model_loader import ModelLoader
+from .result_cache import SegmentationCache
+
+try:
+    from ..utils.text_utils import split_line, stitch_boundaries, segments_from_boundaries
+    from ..utils.metrics import PipelineMetrics, measure
+except ImportError:
+    # 通过core模块的sys.path方式导入时models是顶层包
+    from utils.text_utils import split_line, stitch_boundaries, segments_from_boundaries
+    from utils.metrics import PipelineMetrics, measure
+
+
+def is_out_of_memory(error: BaseException) -> bool:
+    """
+    判断异常是否为内存（或显存）不足
+    
+    Args:
+        error: 异常
+        
+    Returns:
+        bool: 是否为内存不足
+    """
+    if isinstance(error, MemoryError):
+        return True
+    
+    cuda_oom = getattr(torch.cuda, 'OutOfMemoryError', None)
+    if cuda_oom is not None and isinstance(error, cuda_oom):
+        return True
+    
+    # CPU分配失败和onnxruntime的分配失败以RuntimeError等形式抛出
+    message = str(error).lower()
+    return any(text in message for text in ('out of memory', "can't allocate memory", 'failed to allocate'))
 
 
 class Predictor:
@@ -11,17 +43,35 @@ class Predictor:
     分词预测器
     """
     
-    def __init__(self, model_loader: ModelLoader, tokenizer: SikuTokenizer):
+    def __init__(self, model_loader: ModelLoader, tokenizer: SikuTokenizer, 
+                 cache: SegmentationCache = None, dedup_memory: int = 100000, 
+                 pack_sequences: bool = False, metrics: PipelineMetrics = None):
         """
         初始化预测器
         
         Args:
             model_loader: 模型加载器
             tokenizer: 分词器
+            cache: 分词结果缓存，None表示不使用缓存
+            dedup_memory: 跨批次记住的最近序列数，用于跨文件去重，0表示只在批内去重
+            pack_sequences: 是否将多个短序列以[SEP]分隔拼接为一个模型序列推理
+            metrics: 计时器，记录编码、推理和解码阶段，None表示不计时
         """
         self.model_loader = model_loader
         self.tokenizer = tokenizer
+        self.cache = cache
+        self.dedup_memory = dedup_memory
+        self.pack_sequences = pack_sequences
+        self.metrics = metrics
         self.model = None
+        
+        # 内存不足时把一批拆成两半重试的次数，以及之后每次前向计算的序列数上限
+        self.oom_retries = 0
+        self._batch_limit = None
+        
+        # 本次运行中最近处理过的序列，键为(最大序列长度, 序列)
+        self._recent_results = OrderedDict()
+        self.dedup_stats = {'sequences': 0, 'inferred': 0}
     
     def load_model(self) -> None:
         """
@@ -32,25 +82,339 @@ class Predictor:
         else:
             self.model = self.model_loader.get_model()
     
-    def predict_batch(self, texts: List[str], max_seq_length: int = 128) -> List[List[str]]:
+    def predict_batch(self, texts: List[str], max_seq_length: int = 128, 
+                      dynamic_padding: bool = True) -> List[List[str]]:
         """
-        批量预测
+        批量预测，整批文本只进行一次前向计算
         
         Args:
             texts: 文本列表
             max_seq_length: 最大序列长度
+            dynamic_padding: 是否只填充到本批最长序列
             
         Returns:
             List[List[str]]: 分词结果列表
         """
+        if not texts:
+            return []
+        
+        # 编码整批文本，同时记录每个token在原文中的位置
+        encoded_list = self._encode_texts(texts, max_seq_length)
+        
+        return self._predict_segments(texts, encoded_list, 
+                                      [[idx] for idx in range(len(texts))], 
+                                      None if dynamic_padding else max_seq_length)
+    
+    def _predict_segments(self, texts: List[str], encoded_list: List[Dict[str, List]], 
+                          rows: List[List[int]], pad_length: int = None) -> List[List[str]]:
+        """
+        执行一次前向计算，按预测的词边界切分原文
+        
+        Args:
+            texts: 文本列表
+            encoded_list: 与texts对应的encode_with_offsets编码结果
+            rows: 每个模型序列依次包含的文本下标，拼接推理时包含多个
+            pad_length: 填充长度，None表示填充到本批最长序列
+            
+        Returns:
+            List[List[str]]: 按rows展开顺序排列的分词结果
+        """
+        if self._batch_limit is not None and len(rows) > self._batch_limit:
+            # 之前出现过内存不足，直接按较小的批推理
+            return [result for i in range(0, len(rows), self._batch_limit) 
+                    for result in self._predict_segments(texts, encoded_list, 
+                                                         rows[i:i + self._batch_limit], pad_length)]
+        
+        try:
+            padded = self._pad_sequences(encoded_list, rows, pad_length)
+            predicted_labels = self._forward_padded(padded)
+        except Exception as e:
+            if len(rows) == 1 or not is_out_of_memory(e):
+                raise
+            # 内存不足时拆成两半分别推理，结果顺序不变
+            half = self._split_after_oom(rows)
+            return (self._predict_segments(texts, encoded_list, rows[:half], pad_length) + 
+                    self._predict_segments(texts, encoded_list, rows[half:], pad_length))
+        
+        with measure(self.metrics, 'decode', len(predicted_labels)):
+            return self.decode_segments(texts, encoded_list, rows, predicted_labels, padded)
+    
+    def _predict_offsets(self, encoded_list: List[Dict[str, List]], rows: List[List[int]], 
+                         pad_length: int = None) -> List[np.ndarray]:
+        """
+        执行一次前向计算，取出每个文本的词结束偏移
+        
+        Args:
+            encoded_list: encode_with_offsets的编码结果列表
+            rows: 每个模型序列依次包含的编码结果下标
+            pad_length: 填充长度，None表示填充到本批最长序列
+            
+        Returns:
+            List[np.ndarray]: 按rows展开顺序排列的词结束字符偏移，升序
+        """
+        if self._batch_limit is not None and len(rows) > self._batch_limit:
+            return [ends for i in range(0, len(rows), self._batch_limit) 
+                    for ends in self._predict_offsets(encoded_list, rows[i:i + self._batch_limit], 
+                                                      pad_length)]
+        
+        try:
+            padded = self._pad_sequences(encoded_list, rows, pad_length)
+            predicted_labels = self._forward_padded(padded)
+        except Exception as e:
+            if len(rows) == 1 or not is_out_of_memory(e):
+                raise
+            half = self._split_after_oom(rows)
+            return (self._predict_offsets(encoded_list, rows[:half], pad_length) + 
+                    self._predict_offsets(encoded_list, rows[half:], pad_length))
+        
+        with measure(self.metrics, 'decode', len(predicted_labels)):
+            return self.decode_offsets(encoded_list, rows, predicted_labels, padded)
+    
+    def _split_after_oom(self, rows: List[List[int]]) -> int:
+        """
+        内存不足后释放缓存，降低之后每次前向计算的序列数上限，并返回拆分位置
+        
+        Args:
+            rows: 推理失败的一批模型序列
+            
+        Returns:
+            int: 前一半的序列数
+        """
+        half = len(rows) // 2
+        self.oom_retries += 1
+        
+        if self._batch_limit is None or half < self._batch_limit:
+            self._batch_limit = half
+            print(f"警告: 内存不足，每批序列数降为 {half} 后重试")
+        
+        if self.model_loader.device.type == 'cuda':
+            torch.cuda.empty_cache()
+        
+        return half
+    
+    def _encode_texts(self, texts: List[str], max_seq_length: int) -> List[Dict[str, List]]:
+        """
+        编码文本，同时记录每个token在原文中的位置
+        
+        Args:
+            texts: 文本列表
+            max_seq_length: 最大序列长度
+            
+        Returns:
+            List[Dict[str, List]]: encode_with_offsets的编码结果列表
+        """
+        with measure(self.metrics, 'encode', len(texts)):
+            return [self.tokenizer.encode_with_offsets(text, max_seq_length) for text in texts]
+    
+    def _build_sequences(self, encoded_list: List[Dict[str, List]], 
+                         rows: List[List[int]]) -> List[Dict[str, List[int]]]:
+        """
+        组装模型序列：每个模型序列由[CLS]和rows中各文本的token及其后的[SEP]依次组成
+        
+        Args:
+            encoded_list: encode_with_offsets的编码结果列表
+            rows: 每个模型序列依次包含的编码结果下标
+            
+        Returns:
+            List[Dict[str, List[int]]]: 未填充的模型序列
+        """
+        sequences = []
+        for row in rows:
+            if len(row) == 1:
+                sequences.append(encoded_list[row[0]])
+            else:
+                input_ids = encoded_list[row[0]]['input_ids'][:1] + [
+                    token_id for idx in row for token_id in encoded_list[idx]['input_ids'][1:]
+                ]
+                ends = np.concatenate([encoded_list[row[0]]['ends'][:1]] + 
+                                      [encoded_list[idx]['ends'][1:] for idx in row])
+                sequences.append({'input_ids': input_ids, 'attention_mask': [1] * len(input_ids), 
+                                  'ends': ends})
+        
+        return sequences
+    
+    def _pad_sequences(self, encoded_list: List[Dict[str, List]], rows: List[List[int]], 
+                       pad_length: int = None) -> Dict[str, np.ndarray]:
+        """
+        组装模型序列并填充为矩阵，解码所需的结束偏移和所属文本矩阵一并生成
+        
+        Args:
+            encoded_list: encode_with_offsets的编码结果列表
+            rows: 每个模型序列依次包含的编码结果下标
+            pad_length: 填充长度，None表示填充到本批最长序列
+            
+        Returns:
+            Dict[str, np.ndarray]: pad_batch_array的结果
+        """
+        with measure(self.metrics, 'encode'):
+            return self.tokenizer.pad_batch_array(self._build_sequences(encoded_list, rows), pad_length)
+    
+    def decode_segments(self, texts: List[str], encoded_list: List[Dict[str, List]], 
+                        rows: List[List[int]], predicted_labels: np.ndarray, 
+                        padded: Dict[str, np.ndarray] = None) -> List[List[str]]:
+        """
+        根据一批预测标签切分原文
+        
+        Args:
+            texts: 文本列表
+            encoded_list: 与texts对应的encode_with_offsets编码结果
+            rows: 每个模型序列依次包含的文本下标
+            predicted_labels: [B, L] 的预测标签
+            padded: 推理时_pad_sequences的结果，None时重新生成
+            
+        Returns:
+            List[List[str]]: 按rows展开顺序排列的分词结果
+        """
+        indices = [idx for row in rows for idx in row]
+        boundaries = self.decode_offsets(encoded_list, rows, predicted_labels, padded)
+        
+        results = []
+        for idx, ends in zip(indices, boundaries):
+            offsets = encoded_list[idx]['offsets']
+            # 超出最大长度被截断的部分不参与输出
+            text_end = offsets[-2][1] if len(offsets) > 2 else 0
+            results.append(segments_from_boundaries(texts[idx][:text_end], ends.tolist()))
+        
+        return results
+    
+    def decode_offsets(self, encoded_list: List[Dict[str, List]], rows: List[List[int]], 
+                       predicted_labels: np.ndarray, 
+                       padded: Dict[str, np.ndarray] = None) -> List[np.ndarray]:
+        """
+        以矩阵运算从一批预测标签中取出每个文本的词结束偏移
+        
+        Args:
+            encoded_list: encode_with_offsets的编码结果列表
+            rows: 每个模型序列依次包含的编码结果下标
+            predicted_labels: [B, L] 的预测标签
+            padded: 推理时_pad_sequences的结果，None时重新生成
+            
+        Returns:
+            List[np.ndarray]: 按rows展开顺序排列的词结束字符偏移，升序
+        """
+        if padded is None:
+            padded = self._pad_sequences(encoded_list, rows, predicted_labels.shape[1])
+        
+        # owners为位置属于本行第几个文本，加上之前各行的文本数即为整批中的序号
+        row_sizes = np.array([len(row) for row in rows], dtype=np.int64)
+        first_owner = np.cumsum(row_sizes) - row_sizes
+        owners = padded['owners']
+        
+        is_boundary = (predicted_labels == 1) & (owners >= 0)
+        # 布尔索引按行优先展开，所属文本的序号不减，同一文本的边界保持升序
+        boundary_owners = (owners + first_owner[:, None])[is_boundary]
+        boundary_ends = padded['ends'][is_boundary]
+        counts = np.bincount(boundary_owners, minlength=int(row_sizes.sum()))
+        
+        return np.split(boundary_ends, np.cumsum(counts)[:-1])
+    
+    def _forward_encoded(self, encoded_list: List[Dict[str, List[int]]], 
+                         pad_length: int = None) -> np.ndarray:
+        """
+        将一批未填充的编码结果堆叠为tensor并执行一次前向计算
+        
+        Args:
+            encoded_list: 未填充的编码结果列表
+            pad_length: 填充长度，None表示填充到本批最长序列
+            
+        Returns:
+            np.ndarray: [B, L] 的预测标签
+        """
+        return self._forward_padded(self.tokenizer.pad_batch_array(encoded_list, pad_length))
+    
+    def _forward_padded(self, encoded: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        对pad_batch_array填充好的一批输入执行一次前向计算
+        
+        Args:
+            encoded: [B, L] 的input_ids和attention_mask矩阵
+            
+        Returns:
+            np.ndarray: [B, L] 的预测标签
+        """
         if self.model is None:
             self.load_model()
         
-        results = []
+        with measure(self.metrics, 'infer', len(encoded['input_ids'])):
+            if self.model_loader.backend != 'torch':
+                # 其他后端直接接收NumPy矩阵
+                return self.model.predict_labels(encoded['input_ids'], encoded['attention_mask'])
+            
+            # [B, L] 的矩阵直接转为tensor，不再逐元素复制
+            device = self.model_loader.device
+            input_ids = torch.from_numpy(encoded['input_ids']).to(device)
+            attention_mask = torch.from_numpy(encoded['attention_mask']).to(device)
+            
+            # 预测
+            return self._predict_labels(input_ids, attention_mask)
+    
+    def predict_boundaries(self, texts: List[str], max_seq_length: int = 128, 
+                           eval_batch_size: int = 8) -> List[List[int]]:
+        """
+        批量预测词边界在原文中的字符偏移
+        
+        Args:
+            texts: 文本列表
+            max_seq_length: 最大序列长度
+            eval_batch_size: 批处理大小
+            
+        Returns:
+            List[List[int]]: 每个文本中模型判定为词结束位置的字符偏移
+        """
+        encoded_list = self._encode_texts(texts, max_seq_length)
+        order = sorted(range(len(texts)), key=lambda idx: len(encoded_list[idx]['input_ids']))
+        boundaries = [None] * len(texts)
+        
+        for i in range(0, len(order), eval_batch_size):
+            bucket = order[i:i + eval_batch_size]
+            bucket_boundaries = self._predict_offsets(encoded_list, [[idx] for idx in bucket])
+            
+            for idx, ends in zip(bucket, bucket_boundaries):
+                boundaries[idx] = ends.tolist()
         
-        for text in tqdm(texts, desc="分词处理"):
-            segmented_text = self.predict_single(text, max_seq_length)
-            results.append(segmented_text)
+        return boundaries
+    
+    def process_lines(self, lines: List[str], max_seq_length: int = 128, 
+                      eval_batch_size: int = 8, overlap: int = 16, 
+                      show_progress: bool = True) -> List[str]:
+        """
+        按行分词，超长的行在标点处或以重叠窗口切分，预测后再拼接为完整的一行
+        
+        Args:
+            lines: 文本行列表（未切分）
+            max_seq_length: 最大序列长度
+            eval_batch_size: 批处理大小
+            overlap: 没有标点可断时相邻窗口的重叠字符数
+            show_progress: 是否显示进度条
+            
+        Returns:
+            List[str]: 每行的分词结果
+        """
+        if max_seq_length <= 2:
+            raise ValueError(f"最大序列长度需大于2，为[CLS]和[SEP]留出位置: {max_seq_length}")
+        
+        # 序列长度需要为[CLS]和[SEP]留出位置
+        max_chars = max_seq_length - 2
+        results = [None] * len(lines)
+        
+        short_indices = [i for i, line in enumerate(lines) if len(line) <= max_chars]
+        long_indices = [i for i, line in enumerate(lines) if len(line) > max_chars]
+        
+        short_results = self.process_text_batch([lines[i] for i in short_indices], max_seq_length, 
+                                                eval_batch_size, show_progress=show_progress)
+        for i, result in zip(short_indices, short_results):
+            results[i] = result
+        
+        if long_indices:
+            line_windows = [split_line(lines[i], max_chars, overlap) for i in long_indices]
+            window_texts = [window for windows in line_windows for _, window in windows]
+            window_boundaries = self.predict_boundaries(window_texts, max_seq_length, eval_batch_size)
+            
+            offset = 0
+            for i, windows in zip(long_indices, line_windows):
+                boundaries = stitch_boundaries(windows, window_boundaries[offset:offset + len(windows)])
+                results[i] = '/'.join(segments_from_boundaries(lines[i], boundaries))
+                offset += len(windows)
         
         return results
     
@@ -65,84 +429,349 @@ class Predictor:
         Returns:
             List[str]: 分词结果
         """
-        # 编码文本
-        encoded = self.tokenizer.encode(text, max_seq_length)
-        
-        # 转换为tensor
-        input_ids = torch.tensor([encoded['input_ids']], device=self.model_loader.device)
-        attention_mask = torch.tensor([encoded['attention_mask']], device=self.model_loader.device)
+        return self.predict_batch([text], max_seq_length)[0]
+    
+    def _predict_labels(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> np.ndarray:
+        """
+        对一批输入执行前向计算并取得每个位置的标签
         
-        # 预测
+        Args:
+            input_ids: [B, L] 的输入ID
+            attention_mask: [B, L] 的注意力掩码
+            
+        Returns:
+            np.ndarray: [B, L] 的预测标签
+        """
         with torch.no_grad():
             outputs = self.model(input_ids, attention_mask=attention_mask)
-            logits = outputs[0]
+            # pytorch_pretrained_bert直接返回logits，其他实现可能返回tuple
+            logits = outputs[0] if isinstance(outputs, (tuple, list)) else outputs
             predictions = torch.argmax(logits, dim=-1)
         
-        # 解码结果
-        predicted_labels = predictions[0].cpu().numpy()
-        tokens = self.tokenizer.convert_ids_to_tokens(encoded['input_ids'])
+        return predictions.cpu().numpy()
+    
+    def process_text_batch(self, texts: List[str], max_seq_length: int = 128, 
+                          eval_batch_size: int = 8, bucket_by_length: bool = True, 
+                          show_progress: bool = True) -> List[str]:
+        """
+        批量处理文本
         
-        # 根据预测结果进行分词
-        segmented_tokens = self._segment_tokens(tokens, predicted_labels)
+        相同的序列只推理一次：先在批内去重，再查询本次运行中最近处理过的序列，
+        设置了缓存时再查询缓存，只对剩余的序列进行推理，结果按输入顺序展开。
+        开启bucket_by_length时按token长度排序后分桶，每批只填充到本批最长序列。
         
-        return segmented_tokens
+        Args:
+            texts: 文本列表
+            max_seq_length: 最大序列长度
+            eval_batch_size: 批处理大小
+            bucket_by_length: 是否按长度分桶并动态填充
+            show_progress: 是否显示进度条
+            
+        Returns:
+            List[str]: 分词结果列表
+        """
+        results = {}
+        pending = []
+        
+        # 批内去重，并查询最近处理过的序列
+        for text in dict.fromkeys(texts):
+            key = (max_seq_length, text)
+            if key in self._recent_results:
+                self._recent_results.move_to_end(key)
+                results[text] = self._recent_results[key]
+            else:
+                pending.append(text)
+        
+        resolved = []
+        
+        if pending and self.cache is not None:
+            namespace = f"{self.model_loader.get_model_identity()}|{max_seq_length}"
+            if self.pack_sequences:
+                # 拼接推理时各序列互相可见，结果与逐条推理分开缓存
+                namespace += "|packed"
+            cached = self.cache.get_many(pending, namespace)
+            resolved.extend(cached.items())
+            pending = [text for text in pending if text not in cached]
+        
+        if pending:
+            computed = self._infer_text_batch(pending, max_seq_length, eval_batch_size, 
+                                              bucket_by_length, show_progress)
+            if self.cache is not None:
+                self.cache.put_many(zip(pending, computed), namespace)
+            resolved.extend(zip(pending, computed))
+        
+        for text, result in resolved:
+            results[text] = result
+            self._remember(max_seq_length, text, result)
+        
+        self.dedup_stats['sequences'] += len(texts)
+        self.dedup_stats['inferred'] += len(pending)
+        
+        return [results[text] for text in texts]
     
-    def _segment_tokens(self, tokens: List[str], labels: List[int]) -> List[str]:
+    def _remember(self, max_seq_length: int, text: str, result: str) -> None:
         """
-        根据标签对token进行分词
+        记住最近处理过的序列，超过dedup_memory时丢弃最久未用的
         
         Args:
-            tokens: token列表
-            labels: 标签列表
-            
+            max_seq_length: 最大序列长度
+            text: 序列
+            result: 分词结果
+        """
+        if self.dedup_memory <= 0:
+            return
+        
+        self._recent_results[(max_seq_length, text)] = result
+        if len(self._recent_results) > self.dedup_memory:
+            self._recent_results.popitem(last=False)
+    
+    def get_dedup_stats(self) -> Dict:
+        """
+        获取去重统计
+        
         Returns:
-            List[str]: 分词结果
+            Dict: 序列总数、实际推理的序列数以及去重减少的比例
+        """
+        sequences = self.dedup_stats['sequences']
+        inferred = self.dedup_stats['inferred']
+        
+        return {
+            'sequences': sequences,
+            'inferred': inferred,
+            'dedup_ratio': 1 - inferred / sequences if sequences else 0.0
+        }
+    
+    def _infer_text_batch(self, texts: List[str], max_seq_length: int, eval_batch_size: int, 
+                          bucket_by_length: bool, show_progress: bool) -> List[str]:
+        """
+        对文本执行模型推理，参数含义同process_text_batch
+        
+        Returns:
+            List[str]: 分词结果列表
         """
-        segments = []
-        current_segment = []
+        if self.pack_sequences:
+            return self._infer_packed(texts, max_seq_length, eval_batch_size, show_progress)
         
-        for i, (token, label) in enumerate(zip(tokens, labels)):
-            # 跳过特殊token
-            if token in ['[CLS]', '[SEP]', '[PAD]']:
-                continue
+        if bucket_by_length:
+            # 先统一编码，再按token长度排序分桶
+            encoded_list = self._encode_texts(texts, max_seq_length)
+            order = sorted(range(len(texts)), key=lambda idx: len(encoded_list[idx]['input_ids']))
             
-            # 处理subword token
-            if token.startswith('##'):
-                token = token[2:]
+            segmented = [None] * len(texts)
+            for i in tqdm(range(0, len(order), eval_batch_size), desc="分词处理", 
+                          disable=not show_progress):
+                bucket = order[i:i + eval_batch_size]
+                bucket_results = self._predict_segments(texts, encoded_list, [[idx] for idx in bucket])
+                
+                # 恢复原始顺序
+                for idx, segmented_tokens in zip(bucket, bucket_results):
+                    segmented[idx] = segmented_tokens
+        else:
+            segmented = []
             
-            current_segment.append(token)
+            # 分批处理，每批一次前向计算
+            for i in tqdm(range(0, len(texts), eval_batch_size), desc="分词处理", 
+                          disable=not show_progress):
+                batch_texts = texts[i:i + eval_batch_size]
+                segmented.extend(self.predict_batch(batch_texts, max_seq_length, dynamic_padding=False))
+        
+        # 将分词结果转换为字符串
+        return ['/'.join(segmented_tokens) for segmented_tokens in segmented]
+    
+    def _infer_packed(self, texts: List[str], max_seq_length: int, eval_batch_size: int, 
+                      show_progress: bool) -> List[str]:
+        """
+        将多个短序列以[SEP]分隔拼接为一个不超过max_seq_length的模型序列进行推理，
+        再按序列拆分标签，分别解码
+        
+        拼接后的各序列在自注意力中互相可见，结果可能与逐条推理略有差异。
+        
+        Args:
+            texts: 文本列表
+            max_seq_length: 最大序列长度
+            eval_batch_size: 每次前向计算的拼接序列数量
+            show_progress: 是否显示进度条
             
-            # 如果标签为1（分词边界）或者是最后一个token，则结束当前segment
-            if label == 1 or i == len(tokens) - 1:
-                if current_segment:
-                    segments.append(''.join(current_segment))
-                    current_segment = []
+        Returns:
+            List[str]: 分词结果列表
+        """
+        encoded_list = self._encode_texts(texts, max_seq_length)
+        packs = self._pack_rows(encoded_list, max_seq_length)
         
-        return segments
+        segmented = [None] * len(texts)
+        
+        for i in tqdm(range(0, len(packs), eval_batch_size), desc="分词处理", 
+                      disable=not show_progress):
+            batch_packs = packs[i:i + eval_batch_size]
+            batch_results = self._predict_segments(texts, encoded_list, batch_packs)
+            
+            # 按[SEP]位置拆回的结果与拼接顺序一致
+            for idx, segmented_tokens in zip((idx for pack in batch_packs for idx in pack), 
+                                             batch_results):
+                segmented[idx] = segmented_tokens
+        
+        return ['/'.join(segmented_tokens) for segmented_tokens in segmented]
     
-    def process_text_batch(self, texts: List[str], max_seq_length: int = 128, 
-                          eval_batch_size: int = 8) -> List[str]:
+    def _pack_rows(self, encoded_list: List[Dict[str, List]], max_seq_length: int) -> List[List[int]]:
         """
-        批量处理文本
+        按token长度顺序依次装入拼接序列，当前拼接序列放不下时另起一个
+        
+        Args:
+            encoded_list: encode_with_offsets的编码结果列表
+            max_seq_length: 最大序列长度
+            
+        Returns:
+            List[List[int]]: 每个拼接序列依次包含的编码结果下标
+        """
+        order = sorted(range(len(encoded_list)), key=lambda idx: len(encoded_list[idx]['input_ids']))
+        
+        packs = []
+        current = []
+        current_length = 1  # [CLS]
+        for idx in order:
+            # 每个序列占用自身的token和结尾的[SEP]
+            length = len(encoded_list[idx]['input_ids']) - 1
+            if current and current_length + length > max_seq_length:
+                packs.append(current)
+                current = []
+                current_length = 1
+            current.append(idx)
+            current_length += length
+        if current:
+            packs.append(current)
+        
+        return packs
+    
+    def segment_offsets(self, texts: List[str], max_seq_length: int = 128, 
+                        eval_batch_size: int = 8, overlap: int = None, 
+                        show_progress: bool = True) -> List[Tuple[str, List[int]]]:
+        """
+        分词并返回原文和词结束位置，不经过以/拼接的字符串
+        
+        按词边界切分原文并去除空白，即与process_text_batch（overlap不为None时与process_lines）
+        相同的分词结果；原文中的/和空白原样保留。只在批内去重，不使用结果缓存。
         
         Args:
             texts: 文本列表
             max_seq_length: 最大序列长度
             eval_batch_size: 批处理大小
+            overlap: 不为None时输入为未切分的行，超长的行按process_lines切分窗口后拼接
+            show_progress: 是否显示进度条
             
         Returns:
-            List[str]: 分词结果列表
+            List[Tuple[str, List[int]]]: 每个文本参与分词的原文（超出最大长度被截断的部分不包括在内）
+                及其中词结束位置的字符偏移，升序
         """
-        results = []
+        results = {}
+        pending = list(dict.fromkeys(texts))
+        inferred = len(pending)
+        
+        if overlap is not None:
+            if max_seq_length <= 2:
+                raise ValueError(f"最大序列长度需大于2，为[CLS]和[SEP]留出位置: {max_seq_length}")
+            
+            max_chars = max_seq_length - 2
+            long_texts = [text for text in pending if len(text) > max_chars]
+            pending = [text for text in pending if len(text) <= max_chars]
+            
+            if long_texts:
+                line_windows = [split_line(text, max_chars, overlap) for text in long_texts]
+                window_texts = [window for windows in line_windows for _, window in windows]
+                window_boundaries = self.predict_boundaries(window_texts, max_seq_length, eval_batch_size)
+                
+                offset = 0
+                for text, windows in zip(long_texts, line_windows):
+                    results[text] = (text, stitch_boundaries(windows, 
+                                                             window_boundaries[offset:offset + len(windows)]))
+                    offset += len(windows)
         
-        # 分批处理
-        for i in range(0, len(texts), eval_batch_size):
-            batch_texts = texts[i:i + eval_batch_size]
-            batch_results = self.predict_batch(batch_texts, max_seq_length)
+        if pending:
+            located = self._infer_offsets(pending, max_seq_length, eval_batch_size, show_progress)
+            results.update(zip(pending, located))
+        
+        self.dedup_stats['sequences'] += len(texts)
+        self.dedup_stats['inferred'] += inferred
+        
+        return [results[text] for text in texts]
+    
+    def _infer_offsets(self, texts: List[str], max_seq_length: int, eval_batch_size: int, 
+                       show_progress: bool) -> List[Tuple[str, List[int]]]:
+        """
+        对文本执行模型推理，按长度分桶（开启pack_sequences时拼接）后取出词结束偏移，
+        参数含义同segment_offsets
+        
+        Returns:
+            List[Tuple[str, List[int]]]: 每个文本参与分词的原文及词结束字符偏移
+        """
+        encoded_list = self._encode_texts(texts, max_seq_length)
+        if self.pack_sequences:
+            rows = self._pack_rows(encoded_list, max_seq_length)
+        else:
+            order = sorted(range(len(texts)), key=lambda idx: len(encoded_list[idx]['input_ids']))
+            rows = [[idx] for idx in order]
+        
+        located = [None] * len(texts)
+        
+        for i in tqdm(range(0, len(rows), eval_batch_size), desc="分词处理", 
+                      disable=not show_progress):
+            batch_rows = rows[i:i + eval_batch_size]
+            batch_ends = self._predict_offsets(encoded_list, batch_rows)
             
-            # 将分词结果转换为字符串
-            for segmented_tokens in batch_results:
-                result_text = '/'.join(segmented_tokens)
-                results.append(result_text)
+            for idx, ends in zip((idx for row in batch_rows for idx in row), batch_ends):
+                offsets = encoded_list[idx]['offsets']
+                # 超出最大长度被截断的部分不参与输出，与decode_segments一致
+                text_end = offsets[-2][1] if len(offsets) > 2 else 0
+                located[idx] = (texts[idx][:text_end], ends.tolist())
+        
+        return located
+    
+    def process_text_stream(self, sequences: Iterable[str], max_seq_length: int = 128, 
+                            eval_batch_size: int = 8, window_size: int = 1024, 
+                            overlap: int = None, 
+                            with_offsets: bool = False) -> Generator[str, None, None]:
+        """
+        流式处理文本，每次只在内存中保留一个窗口的序列
+        
+        Args:
+            sequences: 序列迭代器，例如iter_sequences的输出
+            max_seq_length: 最大序列长度
+            eval_batch_size: 批处理大小
+            window_size: 每个窗口包含的序列数，窗口内按长度分桶
+            overlap: 不为None时输入为未切分的行，按process_lines切分并拼接
+            with_offsets: 是否按segment_offsets产生 (原文, 词结束字符偏移)，而不是以/分隔的字符串
+            
+        Yields:
+            str: 分词结果，顺序与输入一致；with_offsets时为 (原文, 词结束字符偏移)
+        """
+        window = []
+        
+        for sequence in sequences:
+            window.append(sequence)
+            
+            if len(window) >= window_size:
+                yield from self._process_window(window, max_seq_length, eval_batch_size, overlap, 
+                                                with_offsets)
+                window = []
+        
+        if window:
+            yield from self._process_window(window, max_seq_length, eval_batch_size, overlap, 
+                                            with_offsets)
+    
+    def _process_window(self, window: List[str], max_seq_length: int, eval_batch_size: int, 
+                        overlap: int = None, with_offsets: bool = False) -> List[str]:
+        """
+        处理流式输入中的一个窗口，参数含义同process_text_stream
+        
+        Returns:
+            List[str]: 分词结果列表
+        """
+        if with_offsets:
+            return self.segment_offsets(window, max_seq_length, eval_batch_size, overlap, 
+                                        show_progress=False)
+        
+        if overlap is None:
+            return self.process_text_batch(window, max_seq_length, eval_batch_size, 
+                                           show_progress=False)
         
-        return results
\ No newline at end of file
+        return self.process_lines(window, max_seq_length, eval_batch_size, overlap, 
+                                  show_progress=False)
\ No newline at end of file
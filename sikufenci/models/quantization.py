@@ -0,0 +1,162 @@
+import os
+import torch
+from typing import List, Dict, Set
+
+try:
+    from ..utils.file_utils import replace_file
+except ImportError:
+    # 通过core模块的sys.path方式导入时models是顶层包
+    from utils.file_utils import replace_file
+
+
+# 量化权重缓存文件名，与pytorch_model.bin放在同一目录
+QUANTIZED_WEIGHTS_NAME = 'pytorch_model.int8.bin'
+
+
+def quantize_model(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    对模型中的Linear层做动态int8量化
+    
+    Args:
+        model: fp32模型
+        
+    Returns:
+        torch.nn.Module: 量化后的模型
+    """
+    # 量化算子只支持CPU，且需要当前平台可用的量化引擎
+    engines = torch.backends.quantized.supported_engines
+    if torch.backends.quantized.engine not in engines or torch.backends.quantized.engine == 'none':
+        for engine in ('x86', 'fbgemm', 'qnnpack'):
+            if engine in engines:
+                torch.backends.quantized.engine = engine
+                break
+    
+    model.to(torch.device('cpu'))
+    model.eval()
+    
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized_state_dict(model: torch.nn.Module, cache_file: str) -> None:
+    """
+    缓存量化后的state dict，先写临时文件再重命名，避免留下不完整的缓存
+    
+    Args:
+        model: 量化后的模型
+        cache_file: 缓存文件路径
+    """
+    # 多个工作进程可能同时写缓存，临时文件名带上进程号
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    torch.save(model.state_dict(), tmp_file)
+    replace_file(tmp_file, cache_file)
+
+
+def load_quantized_state_dict(model: torch.nn.Module, cache_file: str) -> torch.nn.Module:
+    """
+    将缓存的量化state dict加载到已量化结构的模型中
+    
+    Args:
+        model: 已经过quantize_model的模型（权重可以是随机初始化）
+        cache_file: 缓存文件路径
+        
+    Returns:
+        torch.nn.Module: 加载了缓存权重的模型
+    """
+    try:
+        # 量化的packed参数不是纯tensor，新版torch需要关闭weights_only
+        state_dict = torch.load(cache_file, map_location='cpu', weights_only=False)
+    except TypeError:
+        state_dict = torch.load(cache_file, map_location='cpu')
+    
+    model.load_state_dict(state_dict)
+    
+    return model
+
+
+def segment_boundaries(segments: List[str]) -> Set[int]:
+    """
+    将分词结果转换为词边界的字符偏移集合
+    
+    Args:
+        segments: 分词结果
+        
+    Returns:
+        Set[int]: 每个词结束位置的字符偏移
+    """
+    boundaries = set()
+    offset = 0
+    
+    for segment in segments:
+        offset += len(segment)
+        boundaries.add(offset)
+    
+    return boundaries
+
+
+def compare_segmentations(reference: List[List[str]], candidate: List[List[str]]) -> Dict:
+    """
+    比较两组分词结果的词边界
+    
+    Args:
+        reference: 参照分词结果（通常为fp32模型）
+        candidate: 待检验的分词结果（通常为量化模型）
+        
+    Returns:
+        Dict: 边界的precision/recall/f1以及整行一致率
+    """
+    if len(reference) != len(candidate):
+        raise ValueError("两组分词结果的数量不一致")
+    
+    matched = 0
+    reference_total = 0
+    candidate_total = 0
+    identical_lines = 0
+    
+    for ref_segments, cand_segments in zip(reference, candidate):
+        ref_boundaries = segment_boundaries(ref_segments)
+        cand_boundaries = segment_boundaries(cand_segments)
+        
+        matched += len(ref_boundaries & cand_boundaries)
+        reference_total += len(ref_boundaries)
+        candidate_total += len(cand_boundaries)
+        
+        if ref_segments == cand_segments:
+            identical_lines += 1
+    
+    precision = matched / candidate_total if candidate_total else 1.0
+    recall = matched / reference_total if reference_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    
+    return {
+        'num_lines': len(reference),
+        'boundary_precision': precision,
+        'boundary_recall': recall,
+        'boundary_f1': f1,
+        'line_agreement': identical_lines / len(reference) if reference else 1.0
+    }
+
+
+def check_quantized_accuracy(reference_predictor, quantized_predictor, texts: List[str], 
+                             max_seq_length: int = 128, eval_batch_size: int = 8) -> Dict:
+    """
+    在样本文本上比较fp32模型与量化模型的分词边界
+    
+    Args:
+        reference_predictor: 使用fp32模型的Predictor
+        quantized_predictor: 使用量化模型的Predictor
+        texts: 样本文本
+        max_seq_length: 最大序列长度
+        eval_batch_size: 批处理大小
+        
+    Returns:
+        Dict: compare_segmentations的比较结果
+    """
+    reference = []
+    candidate = []
+    
+    for i in range(0, len(texts), eval_batch_size):
+        batch_texts = texts[i:i + eval_batch_size]
+        reference.extend(reference_predictor.predict_batch(batch_texts, max_seq_length))
+        candidate.extend(quantized_predictor.predict_batch(batch_texts, max_seq_length))
+    
+    return compare_segmentations(reference, candidate)
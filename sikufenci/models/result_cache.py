@@ -0,0 +1,199 @@
+import os
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Iterable, Tuple
+
+
+class SegmentationCache:
+    """
+    持久化的分词结果缓存
+    
+    以"模型标识 + 最大序列长度 + 序列文本"的哈希为键，保存在SQLite文件中，
+    超过容量上限时按最近访问时间淘汰（LRU）。
+    """
+    
+    def __init__(self, db_path: str, max_entries: int = 1000000):
+        """
+        初始化缓存
+        
+        Args:
+            db_path: SQLite缓存文件路径
+            max_entries: 最多保存的条目数
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        
+        self._conn = None
+        self._pid = None
+        self._inserts_since_check = 0
+    
+    @staticmethod
+    def make_key(sequence: str, namespace: str) -> str:
+        """
+        生成缓存键
+        
+        Args:
+            sequence: 待分词的序列
+            namespace: 模型标识与最大序列长度组成的命名空间
+            
+        Returns:
+            str: 缓存键
+        """
+        # 序列首尾空白不影响分词结果
+        data = f"{namespace}\0{sequence.strip()}".encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+    
+    def get_many(self, sequences: Iterable[str], namespace: str) -> Dict[str, str]:
+        """
+        批量查询缓存
+        
+        Args:
+            sequences: 序列列表
+            namespace: 命名空间
+            
+        Returns:
+            Dict[str, str]: 命中的序列到分词结果的映射
+        """
+        keys = {}
+        for sequence in sequences:
+            keys.setdefault(self.make_key(sequence, namespace), sequence)
+        
+        conn = self._connect()
+        found = {}
+        key_list = list(keys)
+        
+        # SQLite对单条语句的参数数量有限制，分段查询
+        for i in range(0, len(key_list), 500):
+            chunk = key_list[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, result FROM segments WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, result in rows:
+                found[key] = result
+        
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany(
+                    "UPDATE segments SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+        
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        
+        return {keys[key]: result for key, result in found.items()}
+    
+    def put_many(self, items: Iterable[Tuple[str, str]], namespace: str) -> None:
+        """
+        批量写入缓存
+        
+        Args:
+            items: (序列, 分词结果) 列表
+            namespace: 命名空间
+        """
+        now = time.time()
+        rows = [(self.make_key(sequence, namespace), result, now) for sequence, result in items]
+        if not rows:
+            return
+        
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO segments (key, result, last_access) VALUES (?, ?, ?)",
+                rows
+            )
+        
+        # 统计条目数需要扫描全表，累计一定写入量后再检查容量
+        self._inserts_since_check += len(rows)
+        if self._inserts_since_check >= max(1, min(10000, self.max_entries // 10)):
+            self._inserts_since_check = 0
+            self.evict()
+    
+    def evict(self) -> int:
+        """
+        超过容量上限时淘汰最久未访问的条目，淘汰到上限的90%
+        
+        Returns:
+            int: 淘汰的条目数
+        """
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        
+        num_evict = count - int(self.max_entries * 0.9)
+        with conn:
+            conn.execute(
+                "DELETE FROM segments WHERE key IN "
+                "(SELECT key FROM segments ORDER BY last_access LIMIT ?)",
+                (num_evict,)
+            )
+        
+        return num_evict
+    
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+    
+    def get_stats(self) -> Dict:
+        """
+        获取本进程的缓存命中统计
+        
+        Returns:
+            Dict: 命中数、未命中数和命中率
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+    
+    def close(self) -> None:
+        """
+        关闭数据库连接
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        获取本进程的数据库连接，fork出的工作进程会重新建立连接
+        
+        Returns:
+            sqlite3.Connection: 数据库连接
+        """
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        # 多个工作进程可能同时读写，使用WAL模式并等待锁
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_last_access ON segments (last_access)")
+        conn.commit()
+        
+        self._conn = conn
+        self._pid = os.getpid()
+        
+        return conn
+    
+    def __getstate__(self):
+        # 数据库连接不能跨进程传递
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_pid'] = None
+        return state
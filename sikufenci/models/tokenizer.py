@@ -1,6 +1,36 @@
 import os
-from typing import List, Dict
+import unicodedata
+import numpy as np
+from typing import List, Dict, Tuple, Optional
 from pytorch_pretrained_bert import BertTokenizer
+from pytorch_pretrained_bert.tokenization import _is_punctuation, _is_whitespace, _is_control
+
+
+# 字符查找表中的特殊值：空白等被BERT丢弃的字符，以及需要完整分词流程的字符
+_SKIP_CHAR = -1
+_SLOW_CHAR = -2
+
+
+def _is_removed(char: str) -> bool:
+    """
+    BERT基础分词清理文本时直接删除、不起分隔作用的字符
+    """
+    cp = ord(char)
+    return cp == 0 or cp == 0xfffd or _is_control(char)
+
+
+def _is_separator(char: str) -> bool:
+    """
+    BERT基础分词中分隔单词的空白字符
+    """
+    return not _is_removed(char) and (_is_whitespace(char) or char.isspace())
+
+
+def _is_ignored(char: str) -> bool:
+    """
+    不属于任何token的字符
+    """
+    return _is_removed(char) or _is_separator(char)
 
 
 class SikuTokenizer:
@@ -8,12 +38,13 @@ class SikuTokenizer:
     SikuBERT分词器
     """
     
-    def __init__(self, vocab_file: str = None):
+    def __init__(self, vocab_file: str = None, fast_encoding: bool = True):
         """
         初始化分词器
         
         Args:
             vocab_file: 词汇表文件路径
+            fast_encoding: 是否对只含汉字、标点和空白的文本逐字查表编码，结果与完整分词流程一致
         """
         if vocab_file is None:
             # 使用默认的模型目录
@@ -27,6 +58,92 @@ class SikuTokenizer:
         
         self.tokenizer = BertTokenizer.from_pretrained(vocab_file)
         self.vocab_size = len(self.tokenizer.vocab)
+        self.fast_encoding = fast_encoding
+        
+        self.cls_id, self.sep_id = self.convert_tokens_to_ids(['[CLS]', '[SEP]'])
+        self._char_ids = self._build_char_table()
+    
+    def _build_char_table(self) -> Dict[str, int]:
+        """
+        由词汇表中的单字token建立字符到ID的查找表
+        
+        只收录BERT基础分词会单独切开、且不受小写和去重音影响的汉字与标点，
+        这些字符逐字查表的结果与完整分词流程相同；其余字符在首次出现时由_resolve_char确定。
+        
+        Returns:
+            Dict[str, int]: 字符到ID的映射
+        """
+        basic = self.tokenizer.basic_tokenizer
+        table = {}
+        
+        for token, token_id in self.tokenizer.vocab.items():
+            if len(token) != 1:
+                continue
+            if not (basic._is_chinese_char(ord(token)) or _is_punctuation(token)):
+                continue
+            if token.lower() != token or unicodedata.normalize('NFD', token) != token:
+                continue
+            table[token] = token_id
+        
+        return table
+    
+    def _resolve_char(self, char: str) -> int:
+        """
+        用完整分词流程确定单个字符的查表结果
+        
+        Args:
+            char: 字符
+            
+        Returns:
+            int: 字符的ID，被丢弃的字符为_SKIP_CHAR，依赖上下文的字符为_SLOW_CHAR
+        """
+        tokens = self.tokenize(char)
+        cp = ord(char)
+        
+        # 汉字和标点总是单独成词，与前后文无关
+        if self.tokenizer.basic_tokenizer._is_chinese_char(cp) or _is_punctuation(char):
+            if len(tokens) == 1:
+                return self.convert_tokens_to_ids(tokens)[0]
+            return _SLOW_CHAR
+        
+        # 空白和控制字符只起分隔作用或被删除
+        if not tokens and (cp == 0 or cp == 0xfffd or _is_whitespace(char) or _is_control(char)):
+            return _SKIP_CHAR
+        
+        # 字母、数字等会与相邻字符组成词，需要完整分词
+        return _SLOW_CHAR
+    
+    def _encode_chars(self, text: str) -> Optional[Tuple[List[int], List[int]]]:
+        """
+        逐字查表编码文本
+        
+        Args:
+            text: 输入文本
+            
+        Returns:
+            Optional[Tuple[List[int], List[int]]]: token ID列表及每个token所在的字符位置，
+                文本含有需要完整分词的字符时返回None
+        """
+        table = self._char_ids
+        
+        try:
+            ids = [table[char] for char in text]
+        except KeyError:
+            for char in set(text):
+                if char not in table:
+                    table[char] = self._resolve_char(char)
+            ids = [table[char] for char in text]
+        
+        if _SLOW_CHAR in ids:
+            return None
+        
+        if _SKIP_CHAR in ids:
+            positions = [pos for pos, token_id in enumerate(ids) if token_id != _SKIP_CHAR]
+            ids = [ids[pos] for pos in positions]
+        else:
+            positions = list(range(len(ids)))
+        
+        return ids, positions
     
     def tokenize(self, text: str) -> List[str]:
         """
@@ -40,6 +157,132 @@ class SikuTokenizer:
         """
         return self.tokenizer.tokenize(text)
     
+    def tokenize_with_offsets(self, text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """
+        对文本进行分词，并给出每个token在原文中的字符区间
+        
+        Args:
+            text: 输入文本
+            
+        Returns:
+            Tuple[List[str], List[Tuple[int, int]]]: token列表和对应的[起始, 结束)字符区间
+        """
+        tokens = self.tokenize(text)
+        spans = [None] * len(tokens)
+        # 在规范化后的文本中查找token，区间再换算回原文位置
+        normalized, to_original, to_normalized = self._normalize_with_map(text)
+        cursor = 0
+        pending_unk = []
+        
+        for i, token in enumerate(tokens):
+            if token == '[UNK]':
+                # [UNK]无法在原文中查找，等下一个token定位后再分配区间
+                pending_unk.append(i)
+                continue
+            
+            piece = token[2:] if token.startswith('##') else token
+            found = normalized.find(piece, to_normalized[cursor])
+            if found < 0:
+                # 无法精确匹配时，按长度顺序分配
+                start = self._skip_whitespace(text, cursor)
+                end = min(len(text), start + len(piece))
+            else:
+                start = to_original[found]
+                end = to_original[found + len(piece) - 1] + 1 if piece else start
+            
+            self._assign_unk_spans(text, pending_unk, spans, cursor, start)
+            pending_unk = []
+            
+            spans[i] = (start, end)
+            cursor = end
+        
+        self._assign_unk_spans(text, pending_unk, spans, cursor, len(text))
+        
+        return tokens, spans
+    
+    def _normalize_with_map(self, text: str) -> Tuple[str, List[int], List[int]]:
+        """
+        按BERT基础分词的方式逐字小写并去除重音，同时记录规范化文本与原文的位置对应关系
+        
+        小写和去重音可能改变字符数（例如'İ'.lower()为两个字符），逐字处理才能换算回原文位置。
+        
+        Args:
+            text: 原文
+            
+        Returns:
+            Tuple[str, List[int], List[int]]: 规范化文本；规范化文本每个位置对应的原文位置；
+                原文每个位置（含末尾）对应的规范化文本起始位置
+        """
+        lower_case = getattr(self.tokenizer.basic_tokenizer, 'do_lower_case', True)
+        chars = []
+        to_original = []
+        to_normalized = []
+        
+        for pos, char in enumerate(text):
+            to_normalized.append(len(chars))
+            if lower_case:
+                char = unicodedata.normalize('NFD', char.lower())
+                char = ''.join(c for c in char if unicodedata.category(c) != 'Mn')
+            chars.extend(char)
+            to_original.extend([pos] * len(char))
+        to_normalized.append(len(chars))
+        
+        return ''.join(chars), to_original, to_normalized
+    
+    def _skip_whitespace(self, text: str, pos: int) -> int:
+        while pos < len(text) and _is_ignored(text[pos]):
+            pos += 1
+        return pos
+    
+    def _assign_unk_spans(self, text: str, indices: List[int], spans: List[Tuple[int, int]], 
+                          start: int, stop: int) -> None:
+        """
+        为连续的[UNK] token分配[start, stop)范围内的字符区间
+        
+        Args:
+            text: 原文
+            indices: [UNK] token的下标
+            spans: 待填充的区间列表
+            start: 可分配范围的起点
+            stop: 可分配范围的终点
+        """
+        if not indices:
+            return
+        
+        # 与BERT的基础分词一致：空白分隔，控制字符删除，汉字和标点单独成词
+        basic = self.tokenizer.basic_tokenizer
+        units = []
+        pos = start
+        while pos < stop:
+            char = text[pos]
+            if _is_ignored(char):
+                pos += 1
+            elif basic._is_chinese_char(ord(char)) or _is_punctuation(char):
+                units.append((pos, pos + 1))
+                pos += 1
+            else:
+                # 被删除的字符不分隔单词，也不计入单词的区间
+                end = word_end = pos
+                while end < stop and not (_is_separator(text[end]) or 
+                                          basic._is_chinese_char(ord(text[end])) or 
+                                          _is_punctuation(text[end])):
+                    end += 1
+                    if not _is_removed(text[end - 1]):
+                        word_end = end
+                units.append((pos, word_end))
+                pos = end
+        
+        if len(units) == len(indices):
+            for i, span in zip(indices, units):
+                spans[i] = span
+            return
+        
+        # 无法一一对应时，第一个[UNK]覆盖整个范围
+        first = self._skip_whitespace(text, start)
+        spans[indices[0]] = (min(first, stop), stop)
+        for i in indices[1:]:
+            spans[i] = (stop, stop)
+    
     def convert_tokens_to_ids(self, tokens: List[str]) -> List[int]:
         """
         将token转换为ID
@@ -64,38 +307,192 @@ class SikuTokenizer:
         """
         return self.tokenizer.convert_ids_to_tokens(ids)
     
-    def encode(self, text: str, max_length: int = 512) -> Dict[str, List[int]]:
+    def encode(self, text: str, max_length: int = 512, 
+               pad_to_max_length: bool = True) -> Dict[str, List[int]]:
         """
         编码文本
         
         Args:
             text: 输入文本
             max_length: 最大长度
+            pad_to_max_length: 是否填充到max_length，False时只截断不填充
             
         Returns:
             Dict[str, List[int]]: 编码结果
         """
-        tokens = self.tokenize(text)
+        chars = self._encode_chars(text) if self.fast_encoding else None
+        
+        if chars is not None:
+            # 逐字查表，截断到最大长度并添加特殊token
+            input_ids = [self.cls_id] + chars[0][:max_length - 2] + [self.sep_id]
+        else:
+            tokens = self.tokenize(text)
+            
+            # 截断到最大长度
+            if len(tokens) > max_length - 2:  # 减2是为了[CLS]和[SEP]
+                tokens = tokens[:max_length - 2]
+            
+            # 添加特殊token
+            tokens = ['[CLS]'] + tokens + ['[SEP]']
+            
+            # 转换为ID
+            input_ids = self.convert_tokens_to_ids(tokens)
+        
+        # 生成attention mask
+        attention_mask = [1] * len(input_ids)
+        
+        encoded = {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask
+        }
+        
+        # 填充到最大长度
+        if pad_to_max_length:
+            encoded = self.pad(encoded, max_length)
+        
+        return encoded
+    
+    def encode_with_offsets(self, text: str, max_length: int = 512) -> Dict[str, List]:
+        """
+        编码文本（不填充），同时返回每个位置在原文中的字符区间
+        
+        Args:
+            text: 输入文本
+            max_length: 最大长度
+            
+        Returns:
+            Dict[str, List]: 编码结果，offsets中[CLS]和[SEP]的区间为(0, 0)；
+                ends为每个位置的结束字符偏移（np.ndarray），[CLS]和[SEP]为-1
+        """
+        chars = self._encode_chars(text) if self.fast_encoding else None
+        
+        if chars is not None:
+            # 逐字查表时每个token对应一个字符
+            ids, positions = chars[0][:max_length - 2], chars[1][:max_length - 2]
+            input_ids = [self.cls_id] + ids + [self.sep_id]
+            
+            ends = np.full(len(input_ids), -1, dtype=np.int64)
+            ends[1:-1] = positions
+            ends[1:-1] += 1
+            
+            return {
+                'input_ids': input_ids,
+                'attention_mask': [1] * len(input_ids),
+                'offsets': [(0, 0)] + [(pos, pos + 1) for pos in positions] + [(0, 0)],
+                'ends': ends
+            }
+        
+        tokens, spans = self.tokenize_with_offsets(text)
         
         # 截断到最大长度
         if len(tokens) > max_length - 2:  # 减2是为了[CLS]和[SEP]
             tokens = tokens[:max_length - 2]
+            spans = spans[:max_length - 2]
         
-        # 添加特殊token
-        tokens = ['[CLS]'] + tokens + ['[SEP]']
+        input_ids = self.convert_tokens_to_ids(['[CLS]'] + tokens + ['[SEP]'])
         
-        # 转换为ID
-        input_ids = self.convert_tokens_to_ids(tokens)
+        ends = np.full(len(input_ids), -1, dtype=np.int64)
+        ends[1:-1] = [end for _, end in spans]
         
-        # 生成attention mask
-        attention_mask = [1] * len(input_ids)
+        return {
+            'input_ids': input_ids,
+            'attention_mask': [1] * len(input_ids),
+            'offsets': [(0, 0)] + spans + [(0, 0)],
+            'ends': ends
+        }
+    
+    def pad(self, encoded: Dict[str, List[int]], length: int) -> Dict[str, List[int]]:
+        """
+        将编码结果填充到指定长度
         
-        # 填充到最大长度
-        while len(input_ids) < max_length:
-            input_ids.append(0)
-            attention_mask.append(0)
+        Args:
+            encoded: encode返回的编码结果
+            length: 目标长度
+            
+        Returns:
+            Dict[str, List[int]]: 填充后的编码结果
+        """
+        padding = length - len(encoded['input_ids'])
+        if padding <= 0:
+            return encoded
         
         return {
+            'input_ids': encoded['input_ids'] + [0] * padding,
+            'attention_mask': encoded['attention_mask'] + [0] * padding
+        }
+    
+    def pad_batch_array(self, encoded_list: List[Dict[str, List[int]]], 
+                        length: int = None) -> Dict[str, np.ndarray]:
+        """
+        将一组未填充的编码结果写入预先分配的矩阵
+        
+        编码结果带有encode_with_offsets的ends时，另外生成同样大小的ends和owners矩阵：
+        ends为每个位置的结束字符偏移，owners为该位置属于本行第几个文本
+        （以[SEP]分隔拼接的行包含多个文本），特殊token和填充位置均为-1。
+        
+        Args:
+            encoded_list: 未填充的编码结果列表
+            length: 目标长度，None表示填充到本批最长序列
+            
+        Returns:
+            Dict[str, np.ndarray]: [B, L] 的input_ids和attention_mask矩阵（以及ends和owners矩阵）
+        """
+        if length is None:
+            length = max((len(e['input_ids']) for e in encoded_list), default=0)
+        
+        input_ids = np.zeros((len(encoded_list), length), dtype=np.int64)
+        attention_mask = np.zeros((len(encoded_list), length), dtype=np.int64)
+        with_ends = bool(encoded_list) and 'ends' in encoded_list[0]
+        if with_ends:
+            ends = np.full((len(encoded_list), length), -1, dtype=np.int64)
+        
+        for row, encoded in enumerate(encoded_list):
+            ids = encoded['input_ids'][:length]
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+            if with_ends:
+                ends[row, :len(ids)] = encoded['ends'][:length]
+        
+        padded = {
             'input_ids': input_ids,
             'attention_mask': attention_mask
-        }
\ No newline at end of file
+        }
+        
+        if with_ends:
+            # 每行的[CLS]和每个[SEP]都开始下一个文本，token之前的特殊位置数减一即为文本序号
+            special = ends < 0
+            owners = np.cumsum(special, axis=1) - 1
+            owners[special] = -1
+            padded['ends'] = ends
+            padded['owners'] = owners
+        
+        return padded
+    
+    def validate_fast_encoding(self, texts: List[str], max_length: int = 512) -> List[int]:
+        """
+        在验证语料上比较逐字查表编码与完整分词流程的结果
+        
+        Args:
+            texts: 验证文本列表
+            max_length: 最大长度
+            
+        Returns:
+            List[int]: 两种编码的ID或token结束位置不一致的文本下标，为空表示完全一致
+        """
+        fast_encoding = self.fast_encoding
+        mismatches = []
+        
+        try:
+            for i, text in enumerate(texts):
+                self.fast_encoding = True
+                fast = self.encode_with_offsets(text, max_length)
+                self.fast_encoding = False
+                reference = self.encode_with_offsets(text, max_length)
+                
+                if (fast['input_ids'] != reference['input_ids'] or 
+                        not np.array_equal(fast['ends'], reference['ends'])):
+                    mismatches.append(i)
+        finally:
+            self.fast_encoding = fast_encoding
+        
+        return mismatches
\ No newline at end of file
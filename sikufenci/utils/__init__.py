@@ -1,11 +1,22 @@
-from .file_utils import read_files, write_files
-from .text_utils import preprocess_text, postprocess_text
-from .json_utils import read_json_file, extract_text_from_json, json_to_txt_files, get_json_stats
-from .device_utils import get_device, check_gpu_available
+from .file_utils import read_files, write_files, list_txt_files, read_file, iter_file_lines, write_lines
+from .text_utils import preprocess_text, postprocess_text, iter_sequences
+from .json_utils import (
+    read_json_file, iter_json_items, collect_json_stats, extract_text_from_json, json_to_txt_files, get_json_stats
+)
+from .device_utils import get_device, check_gpu_available, get_available_cores, get_thread_budget, configure_threads
+from .metrics import PipelineMetrics, STAGES
+from .manifest import RunManifest
+from .run_report import RunReport
+from .pipeline import PipelineExecutor, prefetch_iter
+from .mmap_reader import iter_mmap_sequences
+from .segment_store import write_segmented, SegmentedText
 
 __all__ = [
-    'read_files', 'write_files',
-    'preprocess_text', 'postprocess_text',
-    'get_device', 'check_gpu_available',
-    'read_json_file', 'extract_text_from_json', 'json_to_txt_files', 'get_json_stats'
+    'read_files', 'write_files', 'list_txt_files', 'read_file', 'iter_file_lines', 'write_lines',
+    'preprocess_text', 'postprocess_text', 'iter_sequences',
+    'get_device', 'check_gpu_available', 'get_available_cores', 'get_thread_budget', 'configure_threads',
+    'read_json_file', 'iter_json_items', 'collect_json_stats', 'extract_text_from_json',
+    'json_to_txt_files', 'get_json_stats',
+    'PipelineMetrics', 'STAGES', 'RunManifest', 'RunReport', 'PipelineExecutor', 'prefetch_iter',
+    'iter_mmap_sequences', 'write_segmented', 'SegmentedText'
 ]
\ No newline at end of file
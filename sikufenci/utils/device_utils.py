@@ -1,6 +1,8 @@
+import os
+import math
 import torch
 import multiprocessing
-from typing import Tuple
+from typing import Tuple, Optional
 
 
 def check_gpu_available() -> bool:
@@ -21,7 +23,7 @@ def get_device() -> Tuple[torch.device, int]:
         Tuple[torch.device, int]: 设备对象和可用核心数
     """
     device = torch.device("cpu")  # 强制使用CPU
-    num_cores = multiprocessing.cpu_count()  # CPU模式下使用所有核心
+    num_cores = get_available_cores()  # CPU模式下使用本进程可用的全部核心
     
     return device, num_cores
 
@@ -38,7 +40,107 @@ def get_device_info() -> dict:
     info = {
         'device': device,
         'num_cores': num_cores,
+        'host_cores': multiprocessing.cpu_count(),
+        'num_threads': torch.get_num_threads(),
         'device_type': 'CPU'  # 强制CPU类型
     }
     
-    return info
\ No newline at end of file
+    return info
+
+
+def get_available_cores() -> int:
+    """
+    获取本进程实际可用的CPU核心数
+    
+    同时考虑CPU亲和性（os.sched_getaffinity）和cgroup的CPU配额，
+    容器内得到的是分配给容器的核心数而不是宿主机核心数。
+    
+    Returns:
+        int: 可用核心数
+    """
+    try:
+        num_cores = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        # 非Linux平台没有sched_getaffinity
+        num_cores = multiprocessing.cpu_count()
+    
+    cpu_limit = _get_cgroup_cpu_limit()
+    if cpu_limit is not None:
+        num_cores = min(num_cores, max(1, math.ceil(cpu_limit)))
+    
+    return max(1, num_cores)
+
+
+def _get_cgroup_cpu_limit() -> Optional[float]:
+    """
+    读取cgroup的CPU配额
+    
+    Returns:
+        Optional[float]: 配额对应的CPU数量，未设置配额时返回None
+    """
+    # cgroup v2: "<quota> <period>" 或 "max <period>"
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max' and int(period) > 0:
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    
+    # cgroup v1
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+            quota = int(f.read().strip())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+            period = int(f.read().strip())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    
+    return None
+
+
+def get_thread_budget(num_workers: int = 1) -> int:
+    """
+    计算每个工作进程可使用的线程数
+    
+    Args:
+        num_workers: 同时运行的工作进程数
+        
+    Returns:
+        int: 每个工作进程的线程数
+    """
+    return max(1, get_available_cores() // max(1, num_workers))
+
+
+def configure_threads(num_threads: int = None, num_interop_threads: int = 1) -> int:
+    """
+    配置本进程的torch线程数以及OMP/MKL环境变量，需在第一次前向计算之前调用
+    
+    Args:
+        num_threads: 算子内线程数，None时优先使用OMP_NUM_THREADS，否则使用线程预算
+        num_interop_threads: 算子间线程数
+        
+    Returns:
+        int: 实际使用的算子内线程数
+    """
+    if num_threads is None:
+        env_threads = os.environ.get('OMP_NUM_THREADS', '')
+        num_threads = int(env_threads) if env_threads.isdigit() and int(env_threads) > 0 \
+            else get_thread_budget()
+    
+    # 子进程以及尚未初始化的OpenMP/MKL运行时读取这些环境变量
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[name] = str(num_threads)
+    
+    torch.set_num_threads(num_threads)
+    
+    try:
+        torch.set_num_interop_threads(num_interop_threads)
+    except RuntimeError:
+        # 算子间线程池只能在开始并行计算前设置一次
+        pass
+    
+    return num_threads
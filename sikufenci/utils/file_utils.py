@@ -1,6 +1,11 @@
 import os
-import glob
-from typing import List, Generator
+import fnmatch
+import hashlib
+from typing import List, Generator, Iterable, Sequence, Tuple, Union
+
+
+# 默认只处理txt文件
+DEFAULT_INCLUDE = ('*.txt',)
 
 
 def read_files(raw_path: str) -> Generator[tuple, None, None]:
@@ -13,47 +18,322 @@ def read_files(raw_path: str) -> Generator[tuple, None, None]:
     Yields:
         tuple: (文件名, 文件内容)
     """
+    for file_path in list_txt_files(raw_path):
+        try:
+            content = read_file(file_path)
+            filename = os.path.basename(file_path)
+            yield filename, content
+        except UnicodeDecodeError:
+            print(f"警告: 文件 {file_path} 编码不是UTF-8，跳过处理")
+            continue
+
+
+def list_txt_files(raw_path: str, recursive: bool = False, include: Sequence[str] = None, 
+                   exclude: Sequence[str] = None, shard: Union[str, Tuple[int, int]] = None) -> List[str]:
+    """
+    列出指定文件夹中的所有txt文件路径
+    
+    Args:
+        raw_path: 待分词语料的文件夹路径
+        recursive: 是否递归查找子文件夹
+        include: 文件匹配模式，按相对于raw_path的路径（以/分隔）匹配，默认为*.txt
+        exclude: 排除模式，匹配的文件不处理，匹配的子文件夹整个跳过
+        shard: 分片，格式为"i/N"或 (i, N)，只返回第i片（从0开始），None表示不分片；
+            文件按相对路径的哈希分配，增删文件不会改变其他文件所在的分片
+        
+    Returns:
+        List[str]: txt文件路径列表，按相对路径（以/分隔）的字符串顺序排序，多台机器上分片结果一致
+    """
     if not os.path.exists(raw_path):
         raise FileNotFoundError(f"路径不存在: {raw_path}")
     
-    txt_files = glob.glob(os.path.join(raw_path, "*.txt"))
+    txt_files = list(scan_txt_files(raw_path, recursive, include, exclude))
     if not txt_files:
         raise ValueError(f"在路径 {raw_path} 中没有找到txt文件")
     
-    for file_path in txt_files:
+    # 遍历时同一文件夹的文件先于子文件夹，这里改为按相对路径的字符串顺序
+    txt_files.sort(key=lambda file_path: os.path.relpath(file_path, raw_path).replace(os.sep, '/'))
+    
+    if shard is not None:
+        shard_index, num_shards = parse_shard(shard)
+        txt_files = [file_path for file_path in txt_files 
+                     if shard_of(os.path.relpath(file_path, raw_path), num_shards) == shard_index]
+    
+    return txt_files
+
+
+def scan_txt_files(raw_path: str, recursive: bool = False, include: Sequence[str] = None, 
+                   exclude: Sequence[str] = None) -> Generator[str, None, None]:
+    """
+    用os.scandir逐个查找匹配的文件，不一次性列出整个目录树
+    
+    同一文件夹中的文件先于子文件夹产生，各层均按名称排序；不进入指向文件夹的符号链接，
+    避免循环。子文件夹无法读取时输出警告并跳过。
+    
+    Args:
+        raw_path: 待分词语料的文件夹路径
+        recursive: 是否递归查找子文件夹
+        include: 文件匹配模式，按相对于raw_path的路径（以/分隔）匹配，默认为*.txt
+        exclude: 排除模式，匹配的文件不处理，匹配的子文件夹整个跳过
+        
+    Yields:
+        str: 文件路径
+    """
+    include = DEFAULT_INCLUDE if include is None else tuple(include)
+    exclude = tuple(exclude or ())
+    
+    # (文件夹路径, 相对路径)，以栈实现深度优先遍历
+    pending = [(raw_path, '')]
+    while pending:
+        directory, rel_dir = pending.pop()
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                filename = os.path.basename(file_path)
-                yield filename, content
-        except UnicodeDecodeError:
-            print(f"警告: 文件 {file_path} 编码不是UTF-8，跳过处理")
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            if not rel_dir:
+                raise
+            print(f"警告: 无法读取文件夹 {directory}，跳过: {e}")
             continue
+        
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if _match_any(rel_path, exclude):
+                continue
+            
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirs.append((entry.path, rel_path))
+            elif entry.is_file() and _match_any(rel_path, include):
+                yield entry.path
+        
+        # 反向入栈，按名称顺序进入子文件夹
+        pending.extend(reversed(subdirs))
+
+
+def parse_shard(shard: Union[str, Tuple[int, int]]) -> Tuple[int, int]:
+    """
+    解析分片参数
+    
+    Args:
+        shard: "i/N"或 (i, N)，0 <= i < N
+        
+    Returns:
+        Tuple[int, int]: (分片序号, 分片数)
+    """
+    if isinstance(shard, str):
+        try:
+            shard_index, num_shards = (int(part) for part in shard.split('/'))
+        except ValueError:
+            raise ValueError(f"分片格式应为 i/N，例如 0/4: {shard}")
+    else:
+        shard_index, num_shards = shard
+    
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f"分片序号应满足 0 <= i < N: {shard_index}/{num_shards}")
+    
+    return shard_index, num_shards
+
+
+def shard_of(rel_path: str, num_shards: int) -> int:
+    """
+    按相对路径的SHA-1确定文件所在的分片，与平台和文件列表无关
+    
+    Args:
+        rel_path: 相对于输入文件夹的路径
+        num_shards: 分片数
+        
+    Returns:
+        int: 分片序号
+    """
+    key = rel_path.replace(os.sep, '/').encode('utf-8')
+    return int(hashlib.sha1(key).hexdigest(), 16) % num_shards
+
+
+def shard_suffix(shard: Tuple[int, int] = None) -> str:
+    """
+    分片运行时结果目录中清单等文件名的后缀，各分片写入同一结果目录时互不覆盖
+    
+    Args:
+        shard: (分片序号, 分片数)，None表示不分片
+        
+    Returns:
+        str: 例如'.shard-0-of-4'，不分片时为空
+    """
+    if shard is None:
+        return ''
+    return f".shard-{shard[0]}-of-{shard[1]}"
+
+
+def result_dir_for(raw_path: str, file_path: str, result_path: str) -> str:
+    """
+    结果文件所在的文件夹，在结果路径下保持与输入相同的目录结构
+    
+    Args:
+        raw_path: 待分词语料的文件夹路径
+        file_path: 输入文件路径
+        result_path: 结果文件夹路径
+        
+    Returns:
+        str: 结果文件夹路径
+    """
+    rel_dir = os.path.dirname(os.path.relpath(file_path, raw_path))
+    return os.path.join(result_path, rel_dir) if rel_dir else result_path
+
+
+def _match_any(rel_path: str, patterns: Tuple[str, ...]) -> bool:
+    """
+    相对路径是否匹配任一模式
+    """
+    return any(fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+
+
+def read_file(file_path: str) -> str:
+    """
+    读取单个UTF-8文本文件
+    
+    Args:
+        file_path: 文件路径
+        
+    Returns:
+        str: 文件内容
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def replace_file(tmp_file: str, path: str) -> None:
+    """
+    将已写完的临时文件刷新到磁盘后重命名为目标文件，并刷新所在文件夹
+    
+    只重命名不刷新时，断电或进程被强制结束后可能出现目标文件存在但内容为空的情况；
+    断点续跑清单据此跳过文件会丢失结果。
+    
+    Args:
+        tmp_file: 临时文件路径，需已关闭或已flush
+        path: 目标文件路径
+    """
+    fd = os.open(tmp_file, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    
+    os.replace(tmp_file, path)
+    fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def fsync_directory(directory: str) -> None:
+    """
+    刷新文件夹，使其中的新建和重命名持久化；不支持打开文件夹的平台（Windows）上不做任何事
+    
+    Args:
+        directory: 文件夹路径
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 def write_files(result_path: str, filename: str, content: str) -> None:
     """
-    将分词结果写入文件
+    将分词结果写入文件，先写临时文件再重命名，中断时不会留下写了一半的结果
     
     Args:
         result_path: 结果文件夹路径
         filename: 文件名
         content: 分词后的内容
     """
-    if not os.path.exists(result_path):
-        os.makedirs(result_path)
+    os.makedirs(result_path, exist_ok=True)
     
     output_file = os.path.join(result_path, filename)
-    with open(output_file, 'w', encoding='utf-8') as f:
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
         f.write(content)
+    replace_file(tmp_file, output_file)
+
+
+def iter_file_lines(file_path: str) -> Generator[str, None, None]:
+    """
+    逐行读取UTF-8文本文件，不把整个文件读入内存
+    
+    Args:
+        file_path: 文件路径
+        
+    Yields:
+        str: 文件中的一行（包含行尾换行符）
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line
+
+
+def write_lines(result_path: str, filename: str, lines: Iterable[str], 
+                flush_every: int = 1024) -> int:
+    """
+    将分词结果逐行写入文件，边生成边写入并定期刷新到磁盘
+    
+    行之间以换行分隔，末尾不加换行，与postprocess_text加write_files的结果一致。
+    没有任何行时不创建文件。先写入临时文件，全部写完后再重命名为结果文件，
+    迭代过程中出错时删除临时文件，不会留下不完整的结果。
+    
+    Args:
+        result_path: 结果文件夹路径
+        filename: 文件名
+        lines: 分词结果行的迭代器
+        flush_every: 每写入多少行刷新一次
+        
+    Returns:
+        int: 写入的行数
+    """
+    output_file = os.path.join(result_path, filename)
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    f = None
+    count = 0
+    
+    try:
+        for line in lines:
+            if f is None:
+                os.makedirs(result_path, exist_ok=True)
+                f = open(tmp_file, 'w', encoding='utf-8')
+            else:
+                f.write('\n')
+            
+            f.write(line)
+            count += 1
+            
+            if count % flush_every == 0:
+                f.flush()
+    except BaseException:
+        if f is not None:
+            f.close()
+            os.remove(tmp_file)
+        raise
+    
+    if f is not None:
+        f.close()
+        replace_file(tmp_file, output_file)
+    
+    return count
 
 
-def validate_file_structure(raw_path: str) -> bool:
+def validate_file_structure(raw_path: str, recursive: bool = False, include: Sequence[str] = None, 
+                            exclude: Sequence[str] = None) -> bool:
     """
     验证文件结构是否符合要求
     
     Args:
         raw_path: 待验证的文件夹路径
+        recursive: 是否递归查找子文件夹
+        include: 文件匹配模式
+        exclude: 排除模式
         
     Returns:
         bool: 是否符合要求
@@ -61,5 +341,5 @@ def validate_file_structure(raw_path: str) -> bool:
     if not os.path.exists(raw_path):
         return False
     
-    txt_files = glob.glob(os.path.join(raw_path, "*.txt"))
-    return len(txt_files) > 0
\ No newline at end of file
+    # 找到第一个文件即可，不遍历整个目录
+    return next(scan_txt_files(raw_path, recursive, include, exclude), None) is not None
\ No newline at end of file
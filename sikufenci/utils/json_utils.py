@@ -1,6 +1,6 @@
 import json
 import os
-from typing import List, Dict, Generator
+from typing import List, Dict, Generator, Iterable, TextIO
 
 
 def read_json_file(json_path: str) -> List[Dict]:
@@ -22,12 +22,161 @@ def read_json_file(json_path: str) -> List[Dict]:
     return data
 
 
-def extract_text_from_json(json_data: List[Dict], text_field: str = 'paragraphs') -> Generator[tuple, None, None]:
+def iter_json_items(json_path: str, chunk_size: int = 1 << 16) -> Generator[Dict, None, None]:
+    """
+    逐条读取JSON数组或JSON Lines文件，不把整个文件解析到内存中
+    
+    文件以'['开头时按JSON数组增量解析，否则按JSON Lines（每行一个JSON对象）处理。
+    
+    Args:
+        json_path: JSON文件路径
+        chunk_size: 每次从文件读取的字符数
+        
+    Yields:
+        Dict: JSON中的一个条目
+    """
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"JSON文件不存在: {json_path}")
+    
+    with open(json_path, 'r', encoding='utf-8') as f:
+        # 读取到第一个非空白字符以判断文件格式
+        head = f.read(chunk_size)
+        while head and not head.strip():
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            head += chunk
+        stripped = head.lstrip()
+        
+        if stripped.startswith('['):
+            yield from _iter_json_array(f, stripped[1:], chunk_size)
+            return
+        
+        # JSON Lines：把已读取的开头与剩余内容拼接后逐行解析
+        pending = ''
+        while head:
+            lines = (pending + head).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            head = f.read(chunk_size)
+        
+        if pending.strip():
+            yield json.loads(pending)
+
+
+def _iter_json_array(f: TextIO, buffer: str, chunk_size: int) -> Generator[Dict, None, None]:
+    """
+    增量解析JSON数组的元素
+    
+    Args:
+        f: 已越过开头'['的文件对象
+        buffer: 已读取但尚未解析的内容
+        chunk_size: 每次从文件读取的字符数
+        
+    Yields:
+        Dict: 数组中的一个元素
+    """
+    decoder = json.JSONDecoder()
+    pos = 0
+    expect_value = True
+    first = True
+    eof = False
+    
+    while True:
+        # 跳过空白，缓冲区用完时继续读取
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer = f.read(chunk_size)
+            pos = 0
+            eof = not buffer
+        
+        if pos >= len(buffer):
+            raise ValueError("JSON数组不完整，缺少结尾的']'")
+        
+        char = buffer[pos]
+        
+        if char == ']' and (first or not expect_value):
+            return
+        
+        if not expect_value:
+            if char != ',':
+                raise ValueError(f"JSON数组格式错误，期望','但得到'{char}'")
+            pos += 1
+            expect_value = True
+            continue
+        
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # 数值等元素可能恰好在缓冲区末尾被截断，需要更多内容确认
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        
+        if not complete:
+            # 丢弃已解析部分，读取至少与剩余内容等长的新内容，避免反复解析大元素
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = f.read(max(chunk_size, len(buffer)))
+            eof = not chunk
+            buffer += chunk
+            continue
+        
+        yield item
+        pos = end
+        expect_value = False
+        first = False
+
+
+def collect_json_stats(json_items: Iterable[Dict], stats: Dict) -> Generator[Dict, None, None]:
+    """
+    在遍历JSON条目的同时累计统计信息，不需要再单独读取一遍文件
+    
+    stats在遍历过程中持续更新，遍历结束后补全unique_authors字段并把authors转换为列表。
+    
+    Args:
+        json_items: JSON条目的迭代器
+        stats: 用于保存统计信息的字典，会被原地更新
+        
+    Yields:
+        Dict: 原样传出的JSON条目
+    """
+    stats.update({
+        'total_items': 0,
+        'sample_keys': [],
+        'authors': set(),
+        'total_chars': 0
+    })
+    
+    for item in json_items:
+        if stats['total_items'] == 0 and isinstance(item, dict):
+            stats['sample_keys'] = list(item.keys())
+        stats['total_items'] += 1
+        
+        if 'author' in item:
+            stats['authors'].add(item['author'])
+        if 'paragraphs' in item:
+            stats['total_chars'] += len(item['paragraphs'])
+        
+        yield item
+    
+    stats['unique_authors'] = len(stats['authors'])
+    stats['authors'] = list(stats['authors'])
+
+
+def extract_text_from_json(json_data: Iterable[Dict], text_field: str = 'paragraphs') -> Generator[tuple, None, None]:
     """
     从JSON数据中提取文本内容
     
     Args:
-        json_data: JSON数据列表
+        json_data: JSON数据列表或iter_json_items返回的迭代器
         text_field: 文本字段名
         
     Yields:
@@ -61,8 +210,8 @@ def json_to_txt_files(json_path: str, output_dir: str, text_field: str = 'paragr
     Returns:
         int: 转换的文件数量
     """
-    # 读取JSON数据
-    json_data = read_json_file(json_path)
+    # 逐条读取JSON数据
+    json_data = iter_json_items(json_path)
     
     # 创建输出目录
     if not os.path.exists(output_dir):
@@ -93,22 +242,10 @@ def get_json_stats(json_path: str) -> Dict:
     Returns:
         Dict: 统计信息
     """
-    json_data = read_json_file(json_path)
-    
-    stats = {
-        'total_items': len(json_data),
-        'sample_keys': list(json_data[0].keys()) if json_data else [],
-        'authors': set(),
-        'total_chars': 0
-    }
-    
-    for item in json_data:
-        if 'author' in item:
-            stats['authors'].add(item['author'])
-        if 'paragraphs' in item:
-            stats['total_chars'] += len(item['paragraphs'])
+    stats = {}
     
-    stats['unique_authors'] = len(stats['authors'])
-    stats['authors'] = list(stats['authors'])
+    # 流式遍历一遍文件，内存占用与文件大小无关
+    for _ in collect_json_stats(iter_json_items(json_path), stats):
+        pass
     
     return stats
\ No newline at end of file
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Tuple
+from .file_utils import replace_file, shard_suffix
+
+
+# 清单文件名，保存在结果目录中
+MANIFEST_NAME = '.sikufenci_manifest.jsonl'
+
+
+def file_sha256(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    分块计算文件的SHA-256，不把整个文件读入内存
+    
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        str: 十六进制哈希值
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """
+    断点续跑清单
+    
+    第一行记录模型和影响分词结果的设置，之后每完成一个输入文件追加一行，
+    记录文件大小、修改时间和内容哈希。每行写入后立即刷新到磁盘，进程被中断时
+    最多丢失正在写入的一行。设置或模型变化时清单作废，所有文件重新处理。
+    """
+    
+    def __init__(self, resultpath: str, settings: Dict, shard: Tuple[int, int] = None):
+        """
+        打开或新建清单
+        
+        Args:
+            resultpath: 分词结果的存储路径
+            settings: 模型标识和影响分词结果的设置，需可序列化为JSON
+            shard: (分片序号, 分片数)，分片运行时每个分片使用单独的清单，
+                多台机器写入同一结果目录时互不覆盖
+        """
+        stem, ext = os.path.splitext(MANIFEST_NAME)
+        self.path = os.path.join(resultpath, stem + shard_suffix(shard) + ext)
+        # 经过一次JSON序列化，与从文件中读出的设置比较时类型一致
+        self.settings = json.loads(json.dumps(settings))
+        self.entries = {}
+        
+        if not self._load():
+            self._reset()
+    
+    def is_done(self, key: str, file_path: str, output_file: str) -> bool:
+        """
+        判断输入文件是否已经处理完成且之后没有修改
+        
+        大小和修改时间都相同时直接认为未修改；只有修改时间变化时再比较内容哈希。
+        
+        Args:
+            key: 文件在清单中的键，通常为相对于输入目录的路径
+            file_path: 输入文件路径
+            output_file: 对应的结果文件路径
+            
+        Returns:
+            bool: 是否可以跳过
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        
+        # 空文件没有结果文件；结果文件缺失或为空说明上次没有真正写完
+        if entry['status'] == 'done':
+            try:
+                if os.path.getsize(output_file) == 0:
+                    return False
+            except OSError:
+                return False
+        
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        
+        return file_sha256(file_path) == entry['sha256']
+    
+    def mark_done(self, key: str, file_path: str, status: str = 'done') -> None:
+        """
+        记录一个已完成的输入文件，结果文件需已写入
+        
+        Args:
+            key: 文件在清单中的键
+            file_path: 输入文件路径
+            status: done或empty
+        """
+        stat = os.stat(file_path)
+        entry = {
+            'file': key,
+            'status': status,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(file_path),
+            'finished': time.time()
+        }
+        
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.entries[key] = entry
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def _load(self) -> bool:
+        """
+        读取已有清单
+        
+        Returns:
+            bool: 清单存在且设置一致时返回True
+        """
+        if not os.path.exists(self.path):
+            return False
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        lines = content.split('\n')
+        
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return False
+        
+        if header.get('settings') != self.settings:
+            print("模型或分词设置与上次运行不同，重新处理所有文件")
+            return False
+        
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 中断时可能留下写了一半的最后一行
+                continue
+            self.entries[entry['file']] = entry
+        
+        if not content.endswith('\n'):
+            # 结束写了一半的行，之后追加的记录另起一行
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+        
+        return True
+    
+    def _reset(self) -> None:
+        """
+        以当前设置新建空清单，先写临时文件再重命名
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'settings': self.settings, 'created': time.time()}, ensure_ascii=False) + '\n')
+        replace_file(tmp_file, self.path)
+        
+        self.entries = {}
@@ -0,0 +1,340 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List
+from .file_utils import replace_file
+
+
+# 分词流程的各个阶段，按处理顺序排列
+STAGES = ('read', 'preprocess', 'encode', 'infer', 'decode', 'postprocess', 'write')
+
+
+class PipelineMetrics:
+    """
+    分词流程的计时器、计数器和回调
+    
+    每个阶段记录调用次数、处理条数和耗时。阶段可以嵌套（例如流式处理时写入阶段
+    驱动推理），耗时按独占时间统计：外层阶段不包含内层阶段的时间，各阶段之和不超过总耗时。
+    """
+    
+    def __init__(self):
+        """
+        初始化计时器
+        """
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._hooks = []
+        self.reset()
+    
+    def reset(self) -> None:
+        """
+        清空所有计时和计数，重新开始计算总耗时
+        """
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.started = time.time()
+            self._start = time.perf_counter()
+    
+    def add_hook(self, hook: Callable[[str, float, int], None]) -> None:
+        """
+        注册回调，每个阶段结束时以 (阶段名称, 独占耗时秒数, 处理条数) 调用
+        
+        Args:
+            hook: 回调函数
+        """
+        self._hooks.append(hook)
+    
+    def remove_hook(self, hook: Callable[[str, float, int], None]) -> None:
+        """
+        移除回调
+        
+        Args:
+            hook: 回调函数
+        """
+        self._hooks.remove(hook)
+    
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        """
+        对一个阶段计时
+        
+        Args:
+            name: 阶段名称，通常为STAGES之一
+            items: 本次处理的条数
+        """
+        stack = self._stack()
+        frame = [0.0]  # 内层阶段的耗时
+        stack.append(frame)
+        start = time.perf_counter()
+        
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            self.record(name, elapsed - frame[0], items)
+    
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        对迭代器每次取出下一项的时间计时，用于读取、预处理等生成器阶段
+        
+        Args:
+            name: 阶段名称
+            iterable: 被计时的迭代器
+            
+        Yields:
+            迭代器中的元素，每个元素计为一条
+        """
+        iterator = iter(iterable)
+        stack = self._stack()
+        
+        while True:
+            frame = [0.0]
+            stack.append(frame)
+            start = time.perf_counter()
+            
+            try:
+                item = next(iterator)
+            except StopIteration:
+                # 迭代结束的最后一次尝试不计入调用次数
+                return
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                if stack:
+                    stack[-1][0] += elapsed
+            
+            self.record(name, elapsed - frame[0], 1)
+            yield item
+    
+    def record(self, name: str, seconds: float, items: int = 0, calls: int = 1) -> None:
+        """
+        直接累计一个阶段的耗时，并调用回调
+        
+        Args:
+            name: 阶段名称
+            seconds: 耗时秒数
+            items: 处理的条数
+            calls: 调用次数
+        """
+        with self._lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'items': 0, 'seconds': 0.0})
+            stats['calls'] += calls
+            stats['items'] += items
+            stats['seconds'] += seconds
+        
+        for hook in self._hooks:
+            hook(name, seconds, items)
+    
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        累加计数器，例如文件数、序列数和字符数
+        
+        Args:
+            name: 计数器名称
+            value: 增加的数量
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def merge(self, snapshot: Dict) -> None:
+        """
+        合并另一个计时器的快照，用于汇总工作进程的统计
+        
+        Args:
+            snapshot: snapshot()的返回值
+        """
+        for name, stats in snapshot['stages'].items():
+            self.record(name, stats['seconds'], stats['items'], stats['calls'])
+        for name, value in snapshot['counters'].items():
+            self.increment(name, value)
+    
+    def snapshot(self) -> Dict:
+        """
+        获取当前统计
+        
+        Returns:
+            Dict: 总耗时、各阶段统计（按STAGES顺序）和计数器；
+                多进程合并后各阶段耗时为所有进程之和，可能超过总耗时
+        """
+        with self._lock:
+            wall_seconds = time.perf_counter() - self._start
+            names = [name for name in STAGES if name in self.stages]
+            names += sorted(name for name in self.stages if name not in STAGES)
+            
+            stages = {}
+            for name in names:
+                stats = dict(self.stages[name])
+                stats['share'] = stats['seconds'] / wall_seconds if wall_seconds else 0.0
+                stages[name] = stats
+            
+            return {
+                'started': self.started,
+                'wall_seconds': wall_seconds,
+                'unaccounted_seconds': max(0.0, wall_seconds - sum(s['seconds'] for s in stages.values())),
+                'stages': stages,
+                'counters': dict(self.counters)
+            }
+    
+    def to_json(self) -> str:
+        """
+        以JSON导出当前统计
+        
+        Returns:
+            str: JSON文本
+        """
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+    
+    def to_prometheus(self, prefix: str = 'sikufenci') -> str:
+        """
+        以Prometheus文本格式导出当前统计，可写入node_exporter的textfile目录
+        
+        Args:
+            prefix: 指标名前缀
+            
+        Returns:
+            str: Prometheus文本格式的指标
+        """
+        snapshot = self.snapshot()
+        lines = []
+        
+        def add_metric(name: str, metric_type: str, help_text: str, samples: List) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+        
+        add_metric('wall_seconds', 'gauge', 'Wall time since the metrics were created or reset.', 
+                   [('', snapshot['wall_seconds'])])
+        
+        stages = snapshot['stages'].items()
+        add_metric('stage_seconds_total', 'counter', 'Exclusive time spent in each pipeline stage.', 
+                   [(f'{{stage="{name}"}}', stats['seconds']) for name, stats in stages])
+        add_metric('stage_calls_total', 'counter', 'Number of times each pipeline stage ran.', 
+                   [(f'{{stage="{name}"}}', stats['calls']) for name, stats in stages])
+        add_metric('stage_items_total', 'counter', 'Number of items processed by each pipeline stage.', 
+                   [(f'{{stage="{name}"}}', stats['items']) for name, stats in stages])
+        
+        for name, value in sorted(snapshot['counters'].items()):
+            add_metric(f'{name}_total', 'counter', f'Total {name} processed.', [('', value)])
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path: str) -> None:
+        """
+        将当前统计写入文件，.prom扩展名写为Prometheus文本格式，否则写为JSON；
+        先写临时文件再重命名，采集程序不会读到写了一半的文件
+        
+        Args:
+            path: 输出文件路径
+        """
+        content = self.to_prometheus() if path.endswith('.prom') else self.to_json()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        replace_file(tmp_file, path)
+    
+    def format_summary(self) -> str:
+        """
+        生成各阶段耗时的简要说明，用于在处理结束时输出
+        
+        Returns:
+            str: 每个阶段一行
+        """
+        snapshot = self.snapshot()
+        lines = [f"总耗时: {snapshot['wall_seconds']:.2f}s"]
+        for name, stats in snapshot['stages'].items():
+            lines.append(f"  - {name}: {stats['seconds']:.2f}s ({stats['share']:.1%})，"
+                         f"{stats['calls']} 次，{stats['items']} 条")
+        
+        return '\n'.join(lines)
+    
+    def _stack(self) -> List[List[float]]:
+        """
+        获取当前线程正在计时的阶段栈
+        
+        Returns:
+            List[List[float]]: 每层为 [内层阶段耗时]
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def __getstate__(self):
+        # 锁、线程局部变量和回调不能跨进程传递
+        state = self.__dict__.copy()
+        del state['_lock'], state['_local']
+        state['_hooks'] = []
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+
+def measure(metrics: PipelineMetrics, name: str, items: int = 0):
+    """
+    metrics不为None时对阶段计时，否则不做任何事
+    
+    Args:
+        metrics: 计时器，可以为None
+        name: 阶段名称
+        items: 本次处理的条数
+        
+    Returns:
+        上下文管理器
+    """
+    return metrics.stage(name, items) if metrics is not None else _no_measure()
+
+
+@contextmanager
+def _no_measure():
+    """
+    不计时的上下文管理器（contextlib.nullcontext需要Python 3.7）
+    """
+    yield
+
+
+def measure_iter(metrics: PipelineMetrics, name: str, iterable: Iterable) -> Iterable:
+    """
+    metrics不为None时对迭代器计时，否则原样返回
+    
+    Args:
+        metrics: 计时器，可以为None
+        name: 阶段名称
+        iterable: 迭代器
+        
+    Returns:
+        Iterable: 计时的迭代器
+    """
+    return metrics.iterate(name, iterable) if metrics is not None else iterable
+
+
+def report_metrics(metrics: PipelineMetrics, metrics_path: str = None) -> None:
+    """
+    输出各阶段耗时，并按需写入统计文件
+    
+    Args:
+        metrics: 计时器，None时不做任何事
+        metrics_path: 统计文件路径，.prom为Prometheus文本格式，其他为JSON
+    """
+    if metrics is None:
+        return
+    
+    print(f"各阶段耗时:\n{metrics.format_summary()}")
+    
+    if metrics_path:
+        metrics.write(metrics_path)
+        print(f"统计已保存到: {metrics_path}")
@@ -0,0 +1,139 @@
+import os
+import mmap
+import codecs
+from typing import Generator, Iterable, Tuple
+
+
+# 超过该字节数的行分块解码，单行再长内存占用也有上限
+MMAP_CHUNK_SIZE = 1 << 20
+
+
+def iter_mmap_sequences(file_path: str, max_seq_length: int = 128, 
+                        chunk_size: int = MMAP_CHUNK_SIZE) -> Generator[Tuple[int, str], None, None]:
+    """
+    以内存映射方式读取UTF-8文本文件，逐行切分为序列，切分结果与
+    preprocess_text(read_file(file_path), max_seq_length) 一致
+    
+    文件内容由操作系统按页换入，不复制为Python字符串；普通行按字节查找换行后单独解码，
+    超过chunk_size字节的行用增量解码器分块解码，块边界落在多字节字符中间时
+    剩余字节留到下一块。内存占用只与chunk_size和max_seq_length有关，与文件大小无关
+    （max_seq_length为None时与最长行有关）。
+    
+    Args:
+        file_path: 文件路径
+        max_seq_length: 最大序列长度，None表示不切分长行
+        chunk_size: 长行每次解码的字节数
+        
+    Yields:
+        Tuple[int, str]: (序列第一个字符在文件中的字节偏移, 序列)
+    """
+    if os.path.getsize(file_path) == 0:
+        return
+    
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos = 0
+            
+            while pos < size:
+                end = mm.find(b'\n', pos)
+                if end == -1:
+                    end = size
+                
+                if end - pos > chunk_size:
+                    yield from _iter_line_sequences(_decode_chunks(mm, pos, end, chunk_size), 
+                                                    pos, max_seq_length)
+                else:
+                    # 换行符不会出现在多字节字符中间，按换行切开的每行可以单独解码
+                    text = mm[pos:end].decode('utf-8')
+                    line = text.strip()
+                    if line and '\r' not in text and (max_seq_length is None or len(line) <= max_seq_length):
+                        lead = len(text) - len(text.lstrip())
+                        yield pos + len(text[:lead].encode('utf-8')), line
+                    elif line:
+                        yield from _iter_line_sequences((text,), pos, max_seq_length)
+                
+                pos = end + 1
+
+
+def _decode_chunks(mm: mmap.mmap, start: int, end: int, chunk_size: int) -> Generator[str, None, None]:
+    """
+    分块解码 [start, end) 范围内的字节
+    
+    Yields:
+        str: 解码后的文本块，不会在字符中间断开
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for pos in range(start, end, chunk_size):
+        stop = min(pos + chunk_size, end)
+        text = decoder.decode(mm[pos:stop], final=stop == end)
+        if text:
+            yield text
+
+
+def _iter_line_sequences(chunks: Iterable[str], offset: int, 
+                         max_seq_length: int = None) -> Generator[Tuple[int, str], None, None]:
+    """
+    将一行文本（可能分成多块，可能包含\\r）切分为序列，与iter_sequences的结果一致
+    
+    以文本模式读取文件时单独的\\r也是换行；空行不产生序列，因此\\r\\n按两个换行处理结果相同。
+    序列只在确定后面还有非空白字符、不会被去除行尾空白影响时才输出。
+    
+    Args:
+        chunks: 文本块
+        offset: 第一块在文件中的字节偏移
+        max_seq_length: 最大序列长度，None表示不切分
+        
+    Yields:
+        Tuple[int, str]: (字节偏移, 序列)
+    """
+    buffer = ''  # 当前行尚未输出的文本，已去除行首空白
+    at_line_start = True
+    
+    for chunk in chunks:
+        parts = chunk.split('\r')
+        for i, part in enumerate(parts):
+            if i > 0:
+                # \r结束当前行
+                stripped = buffer.rstrip()
+                yield from _cut(stripped, offset, max_seq_length)
+                offset += len(buffer.encode('utf-8')) + 1
+                buffer = ''
+                at_line_start = True
+            
+            if at_line_start:
+                text = part.lstrip()
+                offset += len(part[:len(part) - len(text)].encode('utf-8'))
+                part = text
+                at_line_start = not part
+            buffer += part
+        
+        if max_seq_length is not None:
+            # 后面还有非空白字符时，完整的序列可以先输出
+            last = len(buffer.rstrip())
+            emitted = 0
+            while emitted + max_seq_length < last:
+                sequence = buffer[emitted:emitted + max_seq_length]
+                yield offset, sequence
+                offset += len(sequence.encode('utf-8'))
+                emitted += max_seq_length
+            buffer = buffer[emitted:]
+    
+    yield from _cut(buffer.rstrip(), offset, max_seq_length)
+
+
+def _cut(line: str, offset: int, max_seq_length: int = None) -> Generator[Tuple[int, str], None, None]:
+    """
+    按最大序列长度切分已去除首尾空白的一行
+    """
+    if not line:
+        return
+    
+    if max_seq_length is None or len(line) <= max_seq_length:
+        yield offset, line
+        return
+    
+    for i in range(0, len(line), max_seq_length):
+        sequence = line[i:i + max_seq_length]
+        yield offset, sequence
+        offset += len(sequence.encode('utf-8'))
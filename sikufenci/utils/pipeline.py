@@ -0,0 +1,161 @@
+import queue
+import threading
+from typing import Any, Callable, Generator, Iterable, Iterator, Optional, Tuple
+
+
+# 队列中表示上游已结束的标记
+_DONE = object()
+
+
+def _put(q: queue.Queue, entry, stop: threading.Event) -> bool:
+    """
+    向有界队列放入一项，消费者已停止时放弃
+    
+    Returns:
+        bool: 是否已放入
+    """
+    while not stop.is_set():
+        try:
+            q.put(entry, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch_iter(iterable: Iterable, size: int = 2) -> Iterator:
+    """
+    在后台线程中提前取出迭代器的元素，最多缓存size个
+    
+    迭代器抛出的异常在取到对应位置时于调用方线程重新抛出，元素顺序不变。
+    调用方提前结束迭代时后台线程随之停止。
+    
+    Args:
+        iterable: 迭代器，例如逐行读取文件的生成器
+        size: 队列容量
+        
+    Yields:
+        迭代器中的元素
+    """
+    q = queue.Queue(max(1, size))
+    stop = threading.Event()
+    
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(q, (item, None), stop):
+                    return
+        except BaseException as e:
+            _put(q, (None, e), stop)
+        finally:
+            _put(q, _DONE, stop)
+    
+    thread = threading.Thread(target=produce, name='sikufenci-prefetch', daemon=True)
+    thread.start()
+    
+    try:
+        while True:
+            entry = q.get()
+            if entry is _DONE:
+                return
+            item, error = entry
+            if error is not None:
+                raise error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class PipelineExecutor:
+    """
+    三段流水线：后台线程读取并预处理后续输入，主线程推理，后台线程写入已完成的结果
+    
+    各段之间以有界队列连接，读取最多领先prefetch个输入，写入最多积压write_behind个结果，
+    内存占用有上限。每个输入在任一段出错时单独返回错误，不影响其他输入。
+    """
+    
+    def __init__(self, load: Callable[[Any], Any], process: Callable[[Any, Any], Any], 
+                 store: Callable[[Any, Any], Any], prefetch: int = 2, write_behind: int = 2):
+        """
+        初始化流水线
+        
+        Args:
+            load: 读取并预处理一个输入，在读取线程中调用，load(输入) -> 数据
+            process: 推理，在调用run的线程中调用，process(输入, 数据) -> 结果
+            store: 后处理并写入，在写入线程中调用，store(输入, 结果) -> 返回值
+            prefetch: 预先读取的输入数
+            write_behind: 等待写入的结果数
+        """
+        self.load = load
+        self.process = process
+        self.store = store
+        self.prefetch = prefetch
+        self.write_behind = write_behind
+    
+    def run(self, items: Iterable) -> Generator[Tuple[Any, Any, Optional[BaseException]], None, None]:
+        """
+        依次处理所有输入
+        
+        Args:
+            items: 输入，例如文件路径列表
+            
+        Yields:
+            Tuple[Any, Any, Optional[BaseException]]: (输入, store的返回值, 异常)，
+                按完成顺序产生；出错时返回值为None
+        """
+        store_queue = queue.Queue(max(1, self.write_behind))
+        outcomes = queue.Queue()
+        
+        def write():
+            while True:
+                entry = store_queue.get()
+                if entry is _DONE:
+                    return
+                item, result = entry
+                try:
+                    outcomes.put((item, self.store(item, result), None))
+                except Exception as e:
+                    outcomes.put((item, None, e))
+        
+        writer = threading.Thread(target=write, name='sikufenci-writer', daemon=True)
+        writer.start()
+        
+        try:
+            for item, data, error in prefetch_iter(self._load_all(items), self.prefetch):
+                if error is None:
+                    try:
+                        store_queue.put((item, self.process(item, data)))
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    outcomes.put((item, None, error))
+                
+                yield from self._drain(outcomes)
+        finally:
+            # 正常结束或中断时都等待已推理的结果写完
+            store_queue.put(_DONE)
+            writer.join()
+        
+        yield from self._drain(outcomes)
+    
+    def _load_all(self, items: Iterable) -> Generator[Tuple[Any, Any, Optional[BaseException]], None, None]:
+        """
+        逐个读取输入，单个输入出错时记录异常并继续
+        """
+        for item in items:
+            try:
+                yield item, self.load(item), None
+            except Exception as e:
+                yield item, None, e
+    
+    @staticmethod
+    def _drain(outcomes: queue.Queue) -> Generator[Tuple[Any, Any, Optional[BaseException]], None, None]:
+        """
+        取出所有已完成的结果，不等待
+        """
+        while True:
+            try:
+                yield outcomes.get_nowait()
+            except queue.Empty:
+                return
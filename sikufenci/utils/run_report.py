@@ -0,0 +1,101 @@
+import os
+import json
+import time
+from typing import Dict, List, Tuple
+from .file_utils import shard_suffix
+
+
+# 隔离清单文件名，保存在结果目录中，只在有文件失败时创建
+QUARANTINE_NAME = 'quarantine.jsonl'
+
+
+def quarantine_name(shard: Tuple[int, int] = None) -> str:
+    """
+    隔离清单文件名，分片运行时每个分片单独一个文件
+    
+    Args:
+        shard: (分片序号, 分片数)，None表示不分片
+        
+    Returns:
+        str: 例如'quarantine.shard-0-of-4.jsonl'
+    """
+    stem, ext = os.path.splitext(QUARANTINE_NAME)
+    return stem + shard_suffix(shard) + ext
+
+
+class RunReport:
+    """
+    批量分词中失败输入的隔离清单
+    
+    单个文件（或JSON条目）出错时记录后继续处理其余输入，失败记录立即追加到隔离清单，
+    运行中断时已记录的失败也不会丢失；处理结束时输出汇总。
+    """
+    
+    def __init__(self, quarantine_path: str = None):
+        """
+        初始化，清除上次运行留下的隔离清单
+        
+        Args:
+            quarantine_path: 隔离清单文件路径，None表示只在内存中记录
+        """
+        self.quarantine_path = quarantine_path
+        self.failures = []
+        
+        if quarantine_path and os.path.exists(quarantine_path):
+            os.remove(quarantine_path)
+    
+    def fail(self, name: str, error, error_type: str = None) -> None:
+        """
+        记录一个失败的输入
+        
+        Args:
+            name: 输入文件路径或条目名称
+            error: 异常，或工作进程传回的异常信息
+            error_type: 异常类型名称，None表示取error的类型
+        """
+        entry = {
+            'file': name,
+            'error_type': error_type or type(error).__name__,
+            'message': str(error),
+            'time': time.time()
+        }
+        self.failures.append(entry)
+        
+        if self.quarantine_path:
+            directory = os.path.dirname(os.path.abspath(self.quarantine_path))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    
+    def get_failures(self) -> List[Dict]:
+        """
+        获取失败记录
+        
+        Returns:
+            List[Dict]: 每条包含file、error_type、message和time
+        """
+        return list(self.failures)
+    
+    def print_summary(self, max_listed: int = 20) -> None:
+        """
+        输出失败汇总，没有失败时不输出
+        
+        Args:
+            max_listed: 最多列出的失败输入数
+        """
+        if not self.failures:
+            return
+        
+        counts = {}
+        for entry in self.failures:
+            counts[entry['error_type']] = counts.get(entry['error_type'], 0) + 1
+        by_type = '，'.join(f"{error_type} {count} 个" for error_type, count in sorted(counts.items()))
+        
+        print(f"失败 {len(self.failures)} 个输入（{by_type}）:")
+        for entry in self.failures[:max_listed]:
+            print(f"  - {entry['file']}: {entry['error_type']}: {entry['message']}")
+        if len(self.failures) > max_listed:
+            print(f"  ... 另有 {len(self.failures) - max_listed} 个")
+        if self.quarantine_path:
+            print(f"失败列表已保存到: {self.quarantine_path}")
@@ -0,0 +1,299 @@
+import os
+import mmap
+import struct
+import shutil
+import tempfile
+import numpy as np
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from .file_utils import replace_file
+
+
+# 紧凑输出的边界文件扩展名，与文本文件同名并列存放
+SEG_SUFFIX = '.seg'
+
+# 文件头：标识、行数、边界数、保留
+SEG_MAGIC = b'SIKUSEG1'
+_HEADER = struct.Struct('<8sQQQ')
+
+# 边界为词结束位置相对行首的字节偏移；行表每行为 (行首在文本文件中的字节偏移, 第一个边界的下标)
+_BOUND_DTYPE = np.dtype('<u4')
+_LINE_DTYPE = np.dtype('<u8')
+
+
+def write_segmented(result_path: str, filename: str, lines: Iterable[Tuple[str, Sequence[int]]], 
+                    flush_every: int = 1024) -> int:
+    """
+    以紧凑格式逐行写入分词结果：文本文件原样保存原文，词边界以整数数组写入同名的.seg文件
+    
+    lines为Predictor.segment_offsets产生的 (原文, 词结束字符偏移)，原文中的/和空白原样保留，
+    最后一个边界之后的剩余文本作为最后一个词。文本文件的行之间以换行分隔、末尾不加换行，
+    没有任何行时不创建文件。两个文件都先写临时文件，.seg文件先于文本文件重命名，
+    文本文件存在时边界文件一定完整。
+    
+    .seg文件格式（小端）：32字节文件头 (SIKUSEG1, 行数, 边界数, 0)；每个词结束位置
+    相对行首的字节偏移，uint32；补齐到8字节；行表，每行 (行首字节偏移, 第一个边界的下标)，
+    uint64，末尾多一行记录结束位置。
+    
+    Args:
+        result_path: 结果文件夹路径
+        filename: 文件名
+        lines: (原文, 词结束字符偏移) 的迭代器，原文不能包含换行，偏移升序
+        flush_every: 每处理多少行写出一次
+        
+    Returns:
+        int: 写入的行数
+    """
+    output_file = os.path.join(result_path, filename)
+    seg_file = output_file + SEG_SUFFIX
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    tmp_seg_file = f"{seg_file}.{os.getpid()}.tmp"
+    
+    f = seg = table = None
+    count = 0
+    line_start = 0
+    flushed = 0
+    buffered = 0
+    bounds = []
+    starts = []
+    
+    try:
+        for line in lines:
+            if f is None:
+                os.makedirs(result_path, exist_ok=True)
+                f = open(tmp_file, 'wb')
+                seg = open(tmp_seg_file, 'wb')
+                seg.write(_HEADER.pack(SEG_MAGIC, 0, 0, 0))
+                # 行数事先未知，行表先写到临时文件，最后追加到边界之后
+                table = tempfile.TemporaryFile()
+            else:
+                f.write(b'\n')
+                line_start += 1
+            
+            text, ends = line
+            data = text.encode('utf-8')
+            line_bounds = _byte_bounds(text, data, ends)
+            
+            starts.append((line_start, flushed + buffered))
+            bounds.append(line_bounds)
+            buffered += len(line_bounds)
+            f.write(data)
+            
+            line_start += len(data)
+            count += 1
+            
+            if count % flush_every == 0:
+                flushed += _flush(seg, table, bounds, starts)
+                buffered = 0
+        
+        if f is not None:
+            flushed += _flush(seg, table, bounds, starts)
+    except BaseException:
+        for handle, path in ((f, tmp_file), (seg, tmp_seg_file)):
+            if handle is not None:
+                handle.close()
+                os.remove(path)
+        if table is not None:
+            table.close()
+        raise
+    
+    if f is None:
+        return 0
+    
+    try:
+        # 结束位置：假设最后一行之后还有一个换行，下一行开始的位置
+        np.array([line_start + 1, flushed], dtype=_LINE_DTYPE).tofile(table)
+        seg.write(b'\0' * (-seg.tell() % _LINE_DTYPE.itemsize))
+        table.seek(0)
+        shutil.copyfileobj(table, seg)
+        seg.seek(0)
+        seg.write(_HEADER.pack(SEG_MAGIC, count, flushed, 0))
+    finally:
+        table.close()
+        seg.close()
+        f.close()
+    
+    replace_file(tmp_seg_file, seg_file)
+    replace_file(tmp_file, output_file)
+    
+    return count
+
+
+def _byte_bounds(text: str, data: bytes, ends: Sequence[int]) -> np.ndarray:
+    """
+    将一行的词结束字符偏移换算为相对行首的字节偏移，剩余文本补为最后一个词
+    
+    Args:
+        text: 原文
+        data: 原文的UTF-8编码
+        ends: 词结束字符偏移，升序
+        
+    Returns:
+        np.ndarray: 词结束字节偏移，严格升序，最后一个为行的字节长度（空行时为空）
+    """
+    ends = np.asarray(ends, dtype=np.int64)
+    ends = ends[(ends > 0) & (ends < len(text))]
+    if text:
+        ends = np.append(ends, len(text))
+    
+    if len(data) == len(text):
+        return ends
+    
+    # 按码位计算每个字符的UTF-8字节数，前缀和即为每个字符偏移对应的字节偏移
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    widths = 1 + (codepoints >= 0x80) + (codepoints >= 0x800) + (codepoints >= 0x10000)
+    return np.cumsum(widths)[ends - 1]
+
+
+def _flush(seg, table, bounds: List[np.ndarray], starts: List[tuple]) -> int:
+    """
+    写出缓存的边界和行表并清空缓存
+    
+    Returns:
+        int: 写出的边界数
+    """
+    data = np.concatenate(bounds).astype(_BOUND_DTYPE) if bounds else np.empty(0, dtype=_BOUND_DTYPE)
+    data.tofile(seg)
+    np.array(starts, dtype=_LINE_DTYPE).reshape(-1, 2).tofile(table)
+    count = len(data)
+    bounds.clear()
+    starts.clear()
+    return count
+
+
+class SegmentedText:
+    """
+    紧凑格式分词结果的读取器
+    
+    文本文件和.seg文件都以内存映射方式打开，边界和行表是直接指向映射内存的numpy数组，
+    词以文本映射的memoryview切片返回，不复制数据。words去除词中的空白并跳过空白词，
+    与以/分隔的文本输出一致。仍被外部持有的数组和memoryview在关闭后依然有效，
+    对应的映射在它们被回收后释放。
+    """
+    
+    def __init__(self, path: str):
+        """
+        打开紧凑格式的分词结果
+        
+        Args:
+            path: 文本文件路径，边界文件为 path + '.seg'
+        """
+        self.path = path
+        self.text = None
+        self._text_mm = self._seg_mm = None
+        
+        with open(path + SEG_SUFFIX, 'rb') as f:
+            self._seg_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, num_lines, num_bounds, _ = _HEADER.unpack_from(self._seg_mm, 0)
+        if magic != SEG_MAGIC:
+            self.close()
+            raise ValueError(f"不是紧凑格式的边界文件: {path + SEG_SUFFIX}")
+        
+        table_offset = _HEADER.size + num_bounds * _BOUND_DTYPE.itemsize
+        table_offset += -table_offset % _LINE_DTYPE.itemsize
+        self.bounds = np.frombuffer(self._seg_mm, dtype=_BOUND_DTYPE, count=num_bounds, 
+                                    offset=_HEADER.size)
+        self.line_table = np.frombuffer(self._seg_mm, dtype=_LINE_DTYPE, count=2 * (num_lines + 1), 
+                                        offset=table_offset).reshape(-1, 2)
+        
+        # 只有一个空行时文本文件为空，不能映射
+        if os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                self._text_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.text = memoryview(self._text_mm)
+        else:
+            self.text = memoryview(b'')
+    
+    def __len__(self) -> int:
+        return len(self.line_table) - 1
+    
+    def __iter__(self) -> Iterator[List[str]]:
+        for index in range(len(self)):
+            yield self.words(index)
+    
+    def boundaries(self, index: int) -> np.ndarray:
+        """
+        获取一行中每个词结束位置相对行首的字节偏移
+        
+        Args:
+            index: 行号
+            
+        Returns:
+            np.ndarray: uint32数组，指向映射内存，不复制
+        """
+        first = self.line_table[index, 1]
+        last = self.line_table[index + 1, 1]
+        return self.bounds[first:last]
+    
+    def word_views(self, index: int) -> List[memoryview]:
+        """
+        获取一行的词，不复制数据
+        
+        Args:
+            index: 行号
+            
+        Returns:
+            List[memoryview]: 每个词UTF-8编码的memoryview切片，包含原文中的空白
+        """
+        start = int(self.line_table[index, 0])
+        views = []
+        previous = 0
+        for end in self.boundaries(index).tolist():
+            views.append(self.text[start + previous:start + end])
+            previous = end
+        return views
+    
+    def words(self, index: int) -> List[str]:
+        """
+        获取一行的词
+        
+        Args:
+            index: 行号
+            
+        Returns:
+            List[str]: 分词结果，与以/分隔的文本输出相同
+        """
+        words = (''.join(str(view, 'utf-8').split()) for view in self.word_views(index))
+        return [word for word in words if word]
+    
+    def line(self, index: int) -> str:
+        """
+        获取一行的原文
+        
+        Args:
+            index: 行号
+            
+        Returns:
+            str: 原文
+        """
+        start = int(self.line_table[index, 0])
+        end = int(self.line_table[index + 1, 0]) - 1
+        return str(self.text[start:end], 'utf-8')
+    
+    def close(self) -> None:
+        """
+        释放数组并关闭映射，不会抛出异常
+        
+        调用方仍持有取出的数组或memoryview时，对应的映射不能立即关闭，
+        留待这些对象被回收后自动释放，其余映射照常关闭。
+        """
+        text, self.text = self.text, None
+        mms = (self._text_mm, self._seg_mm)
+        self.bounds = self.line_table = None
+        self._text_mm = self._seg_mm = None
+        
+        if text is not None:
+            text.release()
+        for mm in mms:
+            if mm is not None:
+                try:
+                    mm.close()
+                except BufferError:
+                    # 仍有外部的数组或memoryview指向映射内存
+                    pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,5 +1,9 @@
 import re
-from typing import List
+from typing import List, Iterable, Generator, Tuple
+
+
+# 长行切分时优先在这些标点之后断开
+BREAK_PUNCTUATION = set('，。！？：；、,.!?:;」』）》〉】')
 
 
 def preprocess_text(text: str, max_seq_length: int = 128) -> List[str]:
@@ -8,28 +12,151 @@ def preprocess_text(text: str, max_seq_length: int = 128) -> List[str]:
     
     Args:
         text: 原始文本
-        max_seq_length: 最大序列长度
+        max_seq_length: 最大序列长度，None表示不切分长行
         
     Returns:
         List[str]: 切分后的文本序列
     """
     # 按行切分
     lines = text.strip().split('\n')
-    sequences = []
     
+    return list(iter_sequences(lines, max_seq_length))
+
+
+def iter_sequences(lines: Iterable[str], max_seq_length: int = 128) -> Generator[str, None, None]:
+    """
+    逐行预处理文本，按需生成指定长度的序列，与preprocess_text的切分结果一致
+    
+    Args:
+        lines: 文本行，可以是逐行读取文件的迭代器
+        max_seq_length: 最大序列长度，None表示不切分长行
+        
+    Yields:
+        str: 切分后的文本序列
+    """
     for line in lines:
         line = line.strip()
         if not line:
             continue
             
         # 如果行长度超过max_seq_length，进行切分
-        if len(line) > max_seq_length:
+        if max_seq_length is not None and len(line) > max_seq_length:
             for i in range(0, len(line), max_seq_length):
-                sequences.append(line[i:i + max_seq_length])
+                yield line[i:i + max_seq_length]
+        else:
+            yield line
+
+
+def split_line(line: str, max_chars: int, overlap: int = 0) -> List[Tuple[int, str]]:
+    """
+    将长行切分为不超过max_chars的窗口
+    
+    优先在窗口后半段的最后一个标点之后断开；找不到标点时按固定长度切分，
+    并与下一个窗口重叠overlap个字符，以便拼接时保留上下文。
+    
+    Args:
+        line: 一行文本
+        max_chars: 每个窗口的最大字符数
+        overlap: 没有标点可断时相邻窗口的重叠字符数
+        
+    Returns:
+        List[Tuple[int, str]]: (窗口在行中的起始偏移, 窗口文本) 列表
+    """
+    if max_chars < 1:
+        # 窗口为空时切分位置不会前进
+        raise ValueError(f"窗口最大字符数必须大于0: {max_chars}")
+    
+    overlap = max(0, min(overlap, max_chars // 2))
+    windows = []
+    pos = 0
+    
+    while len(line) - pos > max_chars:
+        end = pos + max_chars
+        
+        # 在窗口后半段从后向前查找标点
+        cut = None
+        for i in range(end - 1, pos + max_chars // 2 - 1, -1):
+            if line[i] in BREAK_PUNCTUATION:
+                cut = i + 1
+                break
+        
+        if cut is not None:
+            windows.append((pos, line[pos:cut]))
+            pos = cut
+        else:
+            windows.append((pos, line[pos:end]))
+            pos = end - overlap
+    
+    windows.append((pos, line[pos:]))
+    
+    return windows
+
+
+def stitch_boundaries(windows: List[Tuple[int, str]], 
+                      window_boundaries: List[List[int]]) -> List[int]:
+    """
+    将各窗口预测的词边界拼接为整行的词边界
+    
+    相邻窗口重叠时，以重叠区域的中点为界，中点及之前采用前一个窗口的预测，
+    之后采用后一个窗口的预测，避免使用靠近窗口边缘、缺少上下文的预测。
+    相邻窗口不重叠（在标点处断开）时，断开位置本身就是词边界。
+    
+    Args:
+        windows: split_line返回的窗口列表
+        window_boundaries: 每个窗口内词结束位置的字符偏移（相对窗口起点）
+        
+    Returns:
+        List[int]: 整行内词结束位置的字符偏移，升序排列
+    """
+    boundaries = []
+    lower = 0
+    
+    for i, ((start, window), offsets) in enumerate(zip(windows, window_boundaries)):
+        if i + 1 < len(windows):
+            next_start = windows[i + 1][0]
+            upper = next_start + (start + len(window) - next_start) // 2
         else:
-            sequences.append(line)
+            upper = start + len(window)
+        
+        for offset in offsets:
+            position = start + offset
+            if lower < position <= upper:
+                boundaries.append(position)
+        
+        if i + 1 < len(windows) and next_start == start + len(window):
+            boundaries.append(next_start)
+        
+        lower = upper
+    
+    return sorted(set(boundaries))
+
+
+def segments_from_boundaries(text: str, boundaries: List[int]) -> List[str]:
+    """
+    按词边界切分原文
+    
+    Args:
+        text: 原文
+        boundaries: 词结束位置的字符偏移，升序排列
+        
+    Returns:
+        List[str]: 分词结果；空白不属于任何token，词内部和两端的空白（包括全角空格）都被去除
+    """
+    segments = []
+    start = 0
+    
+    for end in boundaries:
+        segment = ''.join(text[start:end].split())
+        if segment:
+            segments.append(segment)
+        start = end
+    
+    # 最后一个边界之后剩余的文本
+    segment = ''.join(text[start:].split())
+    if segment:
+        segments.append(segment)
     
-    return sequences
+    return segments
 
 
 def postprocess_text(sequences: List[str]) -> str:
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# 与core模块相同，以sikufenci目录为顶层导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sikufenci'))
+
+from utils.text_utils import segments_from_boundaries
+from utils.segment_store import write_segmented, SegmentedText
+
+
+class SegmentsFromBoundariesTest(unittest.TestCase):
+    """
+    按词边界切分原文时去除空白，与按token拼接的结果一致
+    """
+    
+    def test_inner_spaces_removed(self):
+        text = '一 二　三'
+        self.assertEqual(segments_from_boundaries(text, [len(text)]), ['一二三'])
+        self.assertEqual(segments_from_boundaries('abc 一二三', [7]), ['abc一二三'])
+    
+    def test_whitespace_only_segments_skipped(self):
+        text = '天地 　玄黄'
+        self.assertEqual(segments_from_boundaries(text, [2, 4]), ['天地', '玄黄'])
+    
+    def test_compact_words_match_text_output(self):
+        text = '一 二　三 abc 四'
+        ends = [5, 9]
+        with tempfile.TemporaryDirectory() as result_dir:
+            write_segmented(result_dir, 'out.txt', [(text, ends)])
+            with SegmentedText(os.path.join(result_dir, 'out.txt')) as result:
+                self.assertEqual(result.words(0), segments_from_boundaries(text, ends))
+                self.assertEqual(result.line(0), text)
+
+
+if __name__ == '__main__':
+    unittest.main()